@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Query, status
+
+from ..auth.dependencies import require_admin
+from ..core.profiling import sql_profiler
+from ..core.records import UserRecord
+
+router = APIRouter()
+
+
+@router.get("/admin/sql-profile")
+def get_sql_profile(
+    _: UserRecord = Depends(require_admin),
+    limit: int = Query(50, ge=1, le=500),
+):
+    return {
+        "enabled": sql_profiler.enabled,
+        "slow_query_ms": sql_profiler.slow_query_ms,
+        "statements": sql_profiler.snapshot(limit),
+    }
+
+
+@router.delete("/admin/sql-profile", status_code=status.HTTP_204_NO_CONTENT)
+def reset_sql_profile(_: UserRecord = Depends(require_admin)):
+    sql_profiler.reset()
+    return None
@@ -4,47 +4,66 @@ from sqlite3 import Connection
 from fastapi import APIRouter, Depends, status
 from fastapi.security import HTTPAuthorizationCredentials
 
+from ..auth.cache import revocation_list
 from ..auth.dependencies import security
-from ..auth.jwt_handler import create_access_token, get_password_hash, verify_password, verify_token
-from ..core.database import get_db
+from ..auth.jwt_handler import create_access_token, verify_token
+from ..auth.passwords import authenticate_password, get_password_hash
+from ..core.database import get_write_db, read_scope, session_scope
 from ..core.exceptions import APIError
+from ..core.records import UserRecord
 from ..schemas.validation import TokenResponse, UserCreate, UserLogin, UserRead
 
 router = APIRouter()
 
 
+def _user_exists_error() -> APIError:
+    return APIError(
+        status_code=409,
+        code="USER_ALREADY_EXISTS",
+        title="Пользователь уже существует",
+        detail="Пользователь с таким email уже существует",
+        errors={"email": "уже зарегистрирован"},
+    )
+
+
 @router.post("/auth/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, conn: Connection = Depends(get_db)):
-    existing = conn.execute("SELECT id FROM users WHERE email = ?", (user_data.email,)).fetchone()
+def register(user_data: UserCreate):
+    with read_scope() as conn:
+        existing = conn.execute(
+            "SELECT id FROM users WHERE email = ?", (user_data.email,)
+        ).fetchone()
     if existing:
-        raise APIError(
-            status_code=409,
-            code="USER_ALREADY_EXISTS",
-            title="Пользователь уже существует",
-            detail="Пользователь с таким email уже существует",
-            errors={"email": "уже зарегистрирован"},
-        )
+        raise _user_exists_error()
 
+    # bcrypt выполняется без удерживаемых соединений, чтобы не занимать пул и писателя.
     hashed_password = get_password_hash(user_data.password)
-    cursor = conn.execute(
-        "INSERT INTO users (email, full_name, hashed_password, role) VALUES (?, ?, ?, 'user')",
-        (user_data.email, user_data.full_name, hashed_password),
-    )
-    user_id = cursor.lastrowid
-    conn.commit()
-    row = conn.execute(
-        "SELECT id, email, full_name, role FROM users WHERE id = ?", (user_id,)
-    ).fetchone()
-    return dict(row)
+    with session_scope() as writer:
+        row = UserRecord.query(
+            writer,
+            """
+            INSERT INTO users (email, full_name, hashed_password, role) VALUES (?, ?, ?, 'user')
+            ON CONFLICT(email) DO NOTHING
+            RETURNING id, email, full_name, role
+            """,
+            (user_data.email, user_data.full_name, hashed_password),
+        ).fetchone()
+    # Пустой RETURNING: email заняли параллельно, пока считался хеш.
+    if row is None:
+        raise _user_exists_error()
+    return row
 
 
 @router.post("/auth/login", response_model=TokenResponse)
-async def login(credentials: UserLogin, conn: Connection = Depends(get_db)):
-    row = conn.execute(
-        "SELECT id, email, hashed_password FROM users WHERE email = ?",
-        (credentials.email,),
-    ).fetchone()
-    if not row or not verify_password(credentials.password, row["hashed_password"]):
+def login(credentials: UserLogin):
+    with read_scope() as conn:
+        row = conn.execute(
+            "SELECT id, email, hashed_password FROM users WHERE email = ?",
+            (credentials.email,),
+        ).fetchone()
+    valid, new_hash = authenticate_password(
+        credentials.password, row["hashed_password"] if row else None
+    )
+    if not valid:
         raise APIError(
             status_code=401,
             code="INVALID_CREDENTIALS",
@@ -53,14 +72,22 @@ async def login(credentials: UserLogin, conn: Connection = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if new_hash:
+        # Стоимость bcrypt изменилась: сохраняем пересчитанный хеш, если пароль не сменили.
+        with session_scope() as writer:
+            writer.execute(
+                "UPDATE users SET hashed_password = ? WHERE id = ? AND hashed_password = ?",
+                (new_hash, row["id"], row["hashed_password"]),
+            )
+
     access_token = create_access_token(data={"sub": str(row["id"])})
     return TokenResponse(access_token=access_token)
 
 
 @router.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout(
+def logout(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    conn: Connection = Depends(get_db),
+    conn: Connection = Depends(get_write_db),
 ):
     if credentials is None:
         raise APIError(
@@ -89,4 +116,5 @@ async def logout(
         (jti, expires_at),
     )
     conn.commit()
+    revocation_list.revoke(jti, expires_at.timestamp())
     return None
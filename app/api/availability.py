@@ -1,60 +1,266 @@
+import asyncio
+import json
+import os
+import re
+import time
+import weakref
 from datetime import date
 from sqlite3 import Connection
+from typing import AsyncIterator
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
+from app.auth.cache import revocation_list
 from app.auth.dependencies import get_current_user
-from app.core.database import get_db
+from app.auth.jwt_handler import verify_token
+from app.core.database import get_db, read_scope
+from app.core.etag import conditional_response
 from app.core.exceptions import APIError
-from app.core.models import BookingStatus
-from app.schemas.validation import CODE_PATTERN, AvailabilityItem, AvailabilityResponse
+from app.core.occupancy import (
+    availability_events,
+    date_scope,
+    occupancy_index,
+    range_occupancy,
+    read_versions,
+)
+from app.core.profiling import current_profile
+from app.core.pubsub import DROPPED, Subscription
+from app.core.records import UserRecord
+from app.core.serialization import fast_response
+from app.schemas.validation import CODE_PATTERN, AvailabilityRangeResponse, AvailabilityResponse
+
+AVAILABILITY_MAX_RANGE_DAYS = int(os.getenv("AVAILABILITY_MAX_RANGE_DAYS", "62"))
+AVAILABILITY_STREAM_MAX_SUBSCRIBERS = int(os.getenv("AVAILABILITY_STREAM_MAX_SUBSCRIBERS", "1000"))
+# Интервал сверки с data_versions и keep-alive; ловит записи других воркеров и импорта.
+AVAILABILITY_STREAM_RESYNC_SECONDS = float(os.getenv("AVAILABILITY_STREAM_RESYNC_SECONDS", "5"))
+CODE_PREFIX_PATTERN = re.compile(r"^[A-Z0-9]{1,10}$")
 
 router = APIRouter()
 
 
+def _normalize_code(code: str | None) -> str | None:
+    if not code:
+        return None
+    normalized_code = code.strip().upper()
+    if not CODE_PATTERN.match(normalized_code):
+        raise APIError(
+            status_code=422,
+            code="VALIDATION_ERROR",
+            title="Неверный формат кода парковочного места",
+            detail="Код может содержать только символы A-Z и цифры",
+            errors={"query.code": "некорректный формат"},
+        )
+    return normalized_code
+
+
 @router.get("/availability", response_model=AvailabilityResponse)
-async def get_availability(
+def get_availability(
+    request: Request,
+    response: Response,
     target_date: date = Query(..., description="Дата, для которой рассчитывается доступность"),
     code: str | None = Query(None, description="Фильтр по коду парковочного места"),
-    _: dict = Depends(get_current_user),
+    _: UserRecord = Depends(get_current_user),
     conn: Connection = Depends(get_db),
 ):
-    normalized_code = None
-    if code:
-        normalized_code = code.strip().upper()
-        if not CODE_PATTERN.match(normalized_code):
-            raise APIError(
-                status_code=422,
-                code="VALIDATION_ERROR",
-                title="Неверный формат кода парковочного места",
-                detail="Код может содержать только символы A-Z и цифры",
-                errors={"query.code": "некорректный формат"},
-            )
-
-    if normalized_code:
-        slots = conn.execute(
-            "SELECT id, code FROM slots WHERE code = ? ORDER BY code",
-            (normalized_code,),
-        ).fetchall()
-    else:
-        slots = conn.execute("SELECT id, code FROM slots ORDER BY code").fetchall()
-
-    booked_rows = conn.execute(
-        """
-        SELECT slot_id FROM bookings
-        WHERE booking_date = ? AND status != ?
-        """,
-        (target_date, BookingStatus.CANCELLED.value),
-    ).fetchall()
-    booked_slot_ids = {row["slot_id"] for row in booked_rows}
-
-    items = [
-        AvailabilityItem(
-            slot_id=row["id"],
-            code=row["code"],
-            is_available=row["id"] not in booked_slot_ids,
+    normalized_code = _normalize_code(code)
+    scope = date_scope(target_date)
+    versions = read_versions(conn, "slots", scope)
+    # Ответ не зависит от пользователя: ETag общий для всех.
+    not_modified = conditional_response(
+        request, response, target_date, normalized_code, versions["slots"], versions[scope]
+    )
+    if not_modified is not None:
+        return not_modified
+    items = occupancy_index.availability(conn, target_date, normalized_code, versions)
+    # Строки индекса уже в порядке и типах полей AvailabilityItem.
+    return fast_response({"date": target_date.isoformat(), "slots": items}, response)
+
+
+@router.get("/availability/range", response_model=AvailabilityRangeResponse)
+def get_availability_range(
+    date_from: date = Query(..., alias="from", description="Первый день периода"),
+    date_to: date = Query(..., alias="to", description="Последний день периода включительно"),
+    code: str | None = Query(None, description="Фильтр по коду парковочного места"),
+    _: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_db),
+):
+    normalized_code = _normalize_code(code)
+    days = (date_to - date_from).days + 1
+    if days < 1 or days > AVAILABILITY_MAX_RANGE_DAYS:
+        raise APIError(
+            status_code=422,
+            code="VALIDATION_ERROR",
+            title="Некорректный период",
+            detail=f"Период должен содержать от 1 до {AVAILABILITY_MAX_RANGE_DAYS} дней",
+            errors={"query.to": "некорректный период"},
         )
-        for row in slots
+
+    slots = occupancy_index.slot_snapshot(conn)
+    masks = range_occupancy(conn, date_from, date_to)
+    if normalized_code is None:
+        positions = range(len(slots.ids))
+    else:
+        position = slots.positions.get(normalized_code)
+        positions = range(0) if position is None else range(position, position + 1)
+
+    rows = [
+        {
+            "slot_id": slots.ids[pos],
+            "code": slots.codes[pos],
+            "occupied": format(masks.get(slots.ids[pos], 0), "x"),
+        }
+        for pos in positions
+    ]
+    return {"from": date_from, "to": date_to, "days": days, "slots": rows}
+
+
+def _read_day(target_date: date, prefix: str | None) -> tuple[dict[int, dict], dict[str, int]]:
+    scope = date_scope(target_date)
+    with read_scope() as conn:
+        versions = read_versions(conn, "slots", scope)
+        items = occupancy_index.availability(conn, target_date, None, versions)
+    state = {
+        item["slot_id"]: dict(item)
+        for item in items
+        if prefix is None or item["code"].startswith(prefix)
+    }
+    return state, versions
+
+
+def _resync(
+    target_date: date, prefix: str | None, state: dict[int, dict], versions: dict[str, int]
+) -> tuple[str | None, list[dict], dict[str, int]]:
+    """Сверяет состояние подписчика с базой, если счётчики изменились.
+
+    Возвращает тип события (``snapshot`` при изменении набора слотов, ``diff`` при
+    изменении занятости, ``None`` без изменений), строки и новые версии.
+    """
+    with read_scope() as conn:
+        current = read_versions(conn, *versions)
+    if current == versions:
+        return None, [], versions
+    fresh, current = _read_day(target_date, prefix)
+    if fresh.keys() != state.keys() or any(
+        fresh[slot_id]["code"] != state[slot_id]["code"] for slot_id in fresh
+    ):
+        state.clear()
+        state.update(fresh)
+        return "snapshot", list(fresh.values()), current
+    changed = [
+        item
+        for slot_id, item in fresh.items()
+        if item["is_available"] != state[slot_id]["is_available"]
     ]
+    state.update((item["slot_id"], item) for item in changed)
+    return ("diff" if changed else None), changed, current
+
+
+def _sse(event: str, target_date: date, slots: list[dict]) -> bytes:
+    data = json.dumps(
+        {"date": target_date.isoformat(), "slots": slots}, ensure_ascii=False, separators=(",", ":")
+    )
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+def _session_ended(jti: str, expires_at: float) -> str | None:
+    """Причина закрыть поток: токен подписчика отозван или истёк."""
+    if revocation_list.is_revoked(jti):
+        return "token_revoked"
+    if time.time() >= expires_at:
+        return "token_expired"
+    return None
 
-    return AvailabilityResponse(date=target_date, slots=items)
+
+async def _availability_events(
+    subscription: Subscription,
+    target_date: date,
+    prefix: str | None,
+    jti: str,
+    expires_at: float,
+) -> AsyncIterator[bytes]:
+    """Снимок доступности на дату, затем только изменившиеся слоты.
+
+    Сообщения, накопившиеся за время отправки, схлопываются в один ``diff``.
+    Токен проверяется при каждом пробуждении: после logout или ``exp`` поток
+    получает ``event: unauthorized`` и закрывается.
+    """
+    # Поток живёт долго: запросы сверки не копятся в профиле HTTP-запроса.
+    current_profile.set(None)
+    try:
+        state, versions = await run_in_threadpool(_read_day, target_date, prefix)
+        yield b"retry: 3000\n" + _sse("snapshot", target_date, list(state.values()))
+        while True:
+            reason = _session_ended(jti, expires_at)
+            if reason is not None:
+                yield f'event: unauthorized\ndata: {{"reason":"{reason}"}}\n\n'.encode()
+                return
+            # Ожидание не дольше срока токена, чтобы закрыть поток ровно по exp.
+            timeout = min(AVAILABILITY_STREAM_RESYNC_SECONDS, max(expires_at - time.time(), 0))
+            try:
+                first = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                if _session_ended(jti, expires_at) is not None:
+                    continue
+                event, slots, versions = await run_in_threadpool(
+                    _resync, target_date, prefix, state, versions
+                )
+                yield _sse(event, target_date, slots) if event else b": keep-alive\n\n"
+                continue
+            messages = [first, *subscription.drain()]
+            if DROPPED in messages:
+                yield b'event: dropped\ndata: {"reason":"slow_consumer"}\n\n'
+                return
+            changed: dict[int, dict] = {}
+            for slot_id, is_available in messages:
+                item = state.get(slot_id)
+                if item is not None and item["is_available"] != is_available:
+                    item = state[slot_id] = {**item, "is_available": is_available}
+                    changed[slot_id] = item
+            if changed:
+                yield _sse("diff", target_date, list(changed.values()))
+    finally:
+        availability_events.unsubscribe(subscription)
+
+
+@router.get("/availability/stream")
+async def stream_availability(
+    request: Request,
+    target_date: date = Query(..., description="Дата, изменения которой нужно получать"),
+    code_prefix: str | None = Query(None, description="Только слоты с кодом на этот префикс"),
+    _: UserRecord = Depends(get_current_user),
+):
+    prefix = code_prefix.strip().upper() if code_prefix else None
+    if prefix is not None and not CODE_PREFIX_PATTERN.match(prefix):
+        raise APIError(
+            status_code=422,
+            code="VALIDATION_ERROR",
+            title="Неверный формат префикса кода",
+            detail="Префикс может содержать только символы A-Z и цифры",
+            errors={"query.code_prefix": "некорректный формат"},
+        )
+    subscription = availability_events.subscribe(
+        target_date.isoformat(), limit=AVAILABILITY_STREAM_MAX_SUBSCRIBERS
+    )
+    if subscription is None:
+        raise APIError(
+            status_code=503,
+            code="STREAM_LIMIT_REACHED",
+            title="Слишком много подписчиков",
+            detail="Достигнут лимит потоковых подписок, используйте GET /availability",
+            headers={"Retry-After": "5"},
+        )
+    # get_current_user уже проверил токен; claims берутся из кэша проверенных JWT.
+    claims = verify_token(request.state.raw_token)
+    stream = _availability_events(
+        subscription, target_date, prefix, request.state.token_jti, float(claims["exp"])
+    )
+    # Если клиент уйдёт до первого байта, генератор не стартует и его finally не
+    # выполнится; тогда подписку снимет финализатор (unsubscribe идемпотентен).
+    weakref.finalize(stream, availability_events.unsubscribe, subscription)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
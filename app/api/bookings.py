@@ -1,79 +1,252 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import date
 from sqlite3 import Connection
+from typing import Iterator, Literal
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from app.auth.dependencies import get_current_user
-from app.core.database import get_db
+from app.auth.dependencies import get_current_user, require_admin
+from app.core.database import (
+    connect,
+    get_db,
+    get_write_db,
+    is_foreign_key_violation,
+    is_unique_violation,
+)
+from app.core.etag import conditional_response
 from app.core.exceptions import APIError
 from app.core.models import BookingStatus
-from app.schemas.validation import BookingCreate, BookingRead, BookingUpdate
+from app.core.occupancy import publish_occupancy, read_versions
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.records import BookingAccessRecord, BookingRecord, OwnedBookingRecord, UserRecord
+from app.core.serialization import RowEncoder, fast_response
+from app.schemas.validation import (
+    BookingBatchCreate,
+    BookingBatchResponse,
+    BookingCreate,
+    BookingRead,
+    BookingUpdate,
+)
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+# Размер страницы, если клиент передал курсор без limit.
+BOOKINGS_PAGE_SIZE = 100
+EXPORT_COLUMNS = (
+    "id",
+    "slot_id",
+    "user_id",
+    "booking_date",
+    "status",
+    "created_at",
+    "updated_at",
+)
 
 router = APIRouter()
+booking_encoder = RowEncoder(BookingRead, record=BookingRecord)
 
 
 @router.get("/bookings", response_model=list[BookingRead])
-async def list_bookings(
-    current_user: dict = Depends(get_current_user),
+def list_bookings(
+    request: Request,
+    response: Response,
+    current_user: UserRecord = Depends(get_current_user),
     conn: Connection = Depends(get_db),
     slot_id: int | None = None,
+    limit: int | None = Query(
+        None, ge=1, le=1000, description="Размер страницы; без limit и after — весь список"
+    ),
+    after: str | None = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    with_total: bool = Query(False, description="Вернуть общее число в X-Total-Count"),
 ):
+    # Видимость зависит от владельца слота, поэтому в ETag входит и версия slots.
+    versions = read_versions(conn, "slots", "bookings")
+    not_modified = conditional_response(
+        request,
+        response,
+        current_user["id"],
+        current_user["role"],
+        slot_id,
+        limit,
+        after,
+        with_total,
+        versions["slots"],
+        versions["bookings"],
+    )
+    if not_modified is not None:
+        return not_modified
+
     if current_user["role"] == "admin":
-        query = [
-            "SELECT b.id, b.slot_id, b.user_id, b.booking_date, b.status",
-            "FROM bookings b",
-        ]
-        params: list[int] = []
-        if slot_id is not None:
-            query.append("WHERE b.slot_id = ?")
-            params.append(slot_id)
+        source = "FROM bookings b"
+        conditions: list[str] = []
+        params: list = []
     else:
-        query = [
-            "SELECT b.id, b.slot_id, b.user_id, b.booking_date, b.status",
-            "FROM bookings b",
-            "JOIN slots s ON s.id = b.slot_id",
-            "WHERE (b.user_id = ? OR s.owner_id = ?)",
-        ]
+        source = "FROM bookings b JOIN slots s ON s.id = b.slot_id"
+        conditions = ["(b.user_id = ? OR s.owner_id = ?)"]
         params = [current_user["id"], current_user["id"]]
-        if slot_id is not None:
-            query.append("AND b.slot_id = ?")
-            params.append(slot_id)
+    if slot_id is not None:
+        conditions.append("b.slot_id = ?")
+        params.append(slot_id)
+
+    if with_total:
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        total = conn.execute(f"SELECT COUNT(1) {source} {where_clause}", tuple(params)).fetchone()
+        response.headers["X-Total-Count"] = str(total[0])
+
+    if after is not None:
+        after_date, after_id = decode_cursor(after, date, int)
+        conditions.append("(b.booking_date, b.id) > (?, ?)")
+        params.extend([after_date, after_id])
+
+    query = [
+        "SELECT b.id, b.slot_id, b.user_id, b.booking_date, b.status",
+        source,
+    ]
+    if conditions:
+        query.append("WHERE " + " AND ".join(conditions))
     query.append("ORDER BY b.booking_date ASC, b.id ASC")
-    rows = conn.execute("\n".join(query), tuple(params)).fetchall()
-    return [dict(row) for row in rows]
+    # Без limit и курсора список отдаётся целиком, как до пагинации: клиенты, не
+    # читающие X-Next-Cursor, не теряют бронирования молча.
+    page_size = limit if limit is not None or after is None else BOOKINGS_PAGE_SIZE
+    if page_size is not None:
+        query.append("LIMIT ?")
+        params.append(page_size + 1)
+    rows = BookingRecord.query(conn, "\n".join(query), tuple(params)).fetchall()
+
+    bookings = booking_encoder.prepare(rows[:page_size])
+    if page_size is not None and len(rows) > page_size:
+        last = bookings[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["booking_date"], last["id"])
+    return fast_response(bookings, response)
+
+
+def _export_rows(conditions: list[str], params: list) -> Iterator[list[tuple]]:
+    """Читает выгрузку порциями по ключу (booking_date, id).
+
+    Скачивание длится столько, сколько клиент читает, поэтому у выгрузки своё
+    соединение вне пула: медленные выгрузки не отнимают соединения у остальных
+    чтений. Каждая порция — отдельный завершённый запрос, так что между порциями
+    не остаётся открытого снимка WAL и checkpoint не блокируется.
+    """
+    # CAST обходит конвертер DATE: строки уходят клиенту без промежуточных объектов.
+    columns = (
+        "SELECT id, slot_id, user_id, CAST(booking_date AS TEXT), status,"
+        " CAST(created_at AS TEXT), CAST(updated_at AS TEXT) FROM bookings"
+    )
+    after: tuple = ()
+    with closing(connect()) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        while True:
+            where = conditions + ["(booking_date, id) > (?, ?)"] if after else conditions
+            where_clause = f" WHERE {' AND '.join(where)}" if where else ""
+            chunk = cursor.execute(
+                f"{columns}{where_clause} ORDER BY booking_date, id LIMIT ?",
+                (*params, *after, EXPORT_CHUNK_SIZE),
+            ).fetchall()
+            if chunk:
+                yield chunk
+            if len(chunk) < EXPORT_CHUNK_SIZE:
+                break
+            after = (chunk[-1][3], chunk[-1][0])
+
+
+def _export_ndjson(chunks: Iterator[list[tuple]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in chunk
+        ).encode("utf-8")
+
+
+def _export_csv(chunks: Iterator[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+@router.get("/bookings/export")
+def export_bookings(
+    _: UserRecord = Depends(require_admin),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    slot_id: int | None = None,
+    booking_status: BookingStatus | None = Query(None, alias="status"),
+):
+    conditions: list[str] = []
+    params: list = []
+    if date_from is not None:
+        conditions.append("booking_date >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("booking_date <= ?")
+        params.append(date_to)
+    if slot_id is not None:
+        conditions.append("slot_id = ?")
+        params.append(slot_id)
+    if booking_status is not None:
+        conditions.append("status = ?")
+        params.append(booking_status.value)
+
+    chunks = _export_rows(conditions, params)
+    if export_format == "csv":
+        body, media_type = _export_csv(chunks), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _export_ndjson(chunks), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="bookings.{export_format}"'},
+    )
 
 
 @router.post("/bookings", response_model=BookingRead, status_code=status.HTTP_201_CREATED)
-async def create_booking(
+def create_booking(
     booking_data: BookingCreate,
-    current_user: dict = Depends(get_current_user),
-    conn: Connection = Depends(get_db),
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
 ):
-    slot = conn.execute(
-        "SELECT id FROM slots WHERE id = ?",
-        (booking_data.slot_id,),
-    ).fetchone()
-    if slot is None:
-        raise APIError(
-            status_code=404,
-            code="ITEM_NOT_FOUND",
-            title="Парковочное место не найдено",
-            detail="Указанный слот отсутствует или был удален",
-            errors={"slot_id": "не существует"},
-        )
-
-    conflict = conn.execute(
-        """
-        SELECT id FROM bookings
-        WHERE slot_id = ? AND booking_date = ? AND status != ?
-        LIMIT 1
-        """,
-        (
-            booking_data.slot_id,
-            booking_data.booking_date,
-            BookingStatus.CANCELLED.value,
-        ),
-    ).fetchone()
-    if conflict:
+    # Существование слота проверяет внешний ключ, занятость — уникальный индекс,
+    # а RETURNING отдаёт строку без повторного чтения.
+    try:
+        row = BookingRecord.query(
+            conn,
+            """
+            INSERT INTO bookings (slot_id, user_id, booking_date, status)
+            VALUES (?, ?, ?, ?)
+            RETURNING id, slot_id, user_id, booking_date, status
+            """,
+            (
+                booking_data.slot_id,
+                current_user["id"],
+                booking_data.booking_date,
+                BookingStatus.PENDING.value,
+            ),
+        ).fetchone()
+    except sqlite3.IntegrityError as exc:
+        if is_foreign_key_violation(exc):
+            raise APIError(
+                status_code=404,
+                code="ITEM_NOT_FOUND",
+                title="Парковочное место не найдено",
+                detail="Указанный слот отсутствует или был удален",
+                errors={"slot_id": "не существует"},
+            )
+        # Активное бронирование слота на дату уникально (ux_bookings_active_slot_date).
+        if not is_unique_violation(exc):
+            raise
         raise APIError(
             status_code=409,
             code="BOOKING_CONFLICT",
@@ -85,33 +258,112 @@ async def create_booking(
             },
         )
 
-    cursor = conn.execute(
-        """
-        INSERT INTO bookings (slot_id, user_id, booking_date, status)
-        VALUES (?, ?, ?, ?)
-        """,
-        (
-            booking_data.slot_id,
-            current_user["id"],
-            booking_data.booking_date,
-            BookingStatus.PENDING.value,
-        ),
-    )
     conn.commit()
-    row = conn.execute(
-        "SELECT id, slot_id, user_id, booking_date, status FROM bookings WHERE id = ?",
-        (cursor.lastrowid,),
-    ).fetchone()
-    return dict(row)
+    publish_occupancy(row.booking_date, row.slot_id, row.status)
+    return row
+
+
+def _pairs_cte(pairs: list[tuple[int, date]]) -> tuple[str, tuple]:
+    values = ", ".join("(?, ?)" for _ in pairs)
+    params = tuple(value for pair in pairs for value in pair)
+    return f"WITH requested(slot_id, booking_date) AS (VALUES {values})", params
+
+
+@router.post("/bookings/batch", response_model=BookingBatchResponse)
+def create_bookings_batch(
+    batch: BookingBatchCreate,
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
+):
+    requested = [(item.slot_id, item.booking_date) for item in batch.items]
+    unique_pairs = list(dict.fromkeys(requested))
+    slot_ids = sorted({slot_id for slot_id, _ in unique_pairs})
+    cte, cte_params = _pairs_cte(unique_pairs)
+
+    # Проверки и вставка в одной IMMEDIATE-транзакции: между ними никто не запишет.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        existing_slots = {
+            row[0]
+            for row in conn.execute(
+                f"SELECT id FROM slots WHERE id IN ({', '.join('?' for _ in slot_ids)})",
+                tuple(slot_ids),
+            )
+        }
+        taken = {
+            (row[0], row[1])
+            for row in conn.execute(
+                f"""
+                {cte}
+                SELECT b.slot_id, b.booking_date
+                FROM requested r
+                JOIN bookings b ON b.slot_id = r.slot_id AND b.booking_date = r.booking_date
+                WHERE b.status != ?
+                """,
+                cte_params + (BookingStatus.CANCELLED.value,),
+            )
+        }
+        to_insert = [
+            pair for pair in unique_pairs if pair[0] in existing_slots and pair not in taken
+        ]
+        # Созданные строки возвращает сам INSERT внутри транзакции: повторный SELECT
+        # после commit мог бы найти чужое бронирование той же пары или не найти своё.
+        created: dict[tuple[int, date], BookingRecord] = {}
+        if to_insert:
+            values = ", ".join("(?, ?, ?, ?)" for _ in to_insert)
+            for row in BookingRecord.query(
+                conn,
+                f"""
+                INSERT INTO bookings (slot_id, user_id, booking_date, status)
+                VALUES {values}
+                RETURNING id, slot_id, user_id, booking_date, status
+                """,
+                tuple(
+                    value
+                    for slot_id, booking_date in to_insert
+                    for value in (
+                        slot_id,
+                        current_user["id"],
+                        booking_date,
+                        BookingStatus.PENDING.value,
+                    )
+                ),
+            ):
+                created[(row.slot_id, row.booking_date)] = row
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    for slot_id, booking_date in to_insert:
+        publish_occupancy(booking_date, slot_id, BookingStatus.PENDING.value)
+
+    results = []
+    for slot_id, booking_date in requested:
+        result = {"slot_id": slot_id, "booking_date": booking_date}
+        booking = created.pop((slot_id, booking_date), None)
+        if booking is not None:
+            result.update(result="created", booking=booking)
+        elif slot_id not in existing_slots:
+            result["result"] = "not_found"
+        else:
+            # Повтор пары внутри запроса тоже конфликт: слот уже занят первой копией.
+            result["result"] = "conflict"
+        results.append(result)
+    return {"created": len(to_insert), "results": results}
 
 
 @router.get("/bookings/{booking_id}", response_model=BookingRead)
-async def get_booking(
+def get_booking(
     booking_id: int,
-    current_user: dict = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: UserRecord = Depends(get_current_user),
     conn: Connection = Depends(get_db),
 ):
-    record = conn.execute(
+    # Как и в get_item: версии до строки, If-None-Match — после проверок 404 и 403.
+    versions = read_versions(conn, "slots", "bookings")
+    record = OwnedBookingRecord.query(
+        conn,
         """
         SELECT b.id, b.slot_id, b.user_id, b.booking_date, b.status, s.owner_id
         FROM bookings b
@@ -138,19 +390,28 @@ async def get_booking(
             title="Недостаточно прав",
             detail="Недостаточно прав для просмотра бронирования",
         )
-    return {key: record[key] for key in ("id", "slot_id", "user_id", "booking_date", "status")}
+    not_modified = conditional_response(
+        request,
+        response,
+        booking_id,
+        current_user["id"],
+        current_user["role"],
+        versions["slots"],
+        versions["bookings"],
+    )
+    if not_modified is not None:
+        return not_modified
+    return record
 
 
-@router.put("/bookings/{booking_id}", response_model=BookingRead)
-async def update_booking(
-    booking_id: int,
-    payload: BookingUpdate,
-    current_user: dict = Depends(get_current_user),
-    conn: Connection = Depends(get_db),
-):
-    record = conn.execute(
+def _status_change_error(
+    conn: Connection, booking_id: int, new_status: BookingStatus, current_user: UserRecord
+) -> APIError:
+    """Объясняет, почему условный UPDATE статуса не затронул бронирование."""
+    record = BookingAccessRecord.query(
+        conn,
         """
-        SELECT b.id, b.slot_id, b.user_id, b.booking_date, b.status, s.owner_id
+        SELECT b.user_id, b.slot_id, b.booking_date, s.owner_id
         FROM bookings b
         JOIN slots s ON s.id = b.slot_id
         WHERE b.id = ?
@@ -158,7 +419,7 @@ async def update_booking(
         (booking_id,),
     ).fetchone()
     if record is None:
-        raise APIError(
+        return APIError(
             status_code=404,
             code="BOOKING_NOT_FOUND",
             title="Бронирование не найдено",
@@ -170,78 +431,142 @@ async def update_booking(
     is_booking_owner = record["user_id"] == current_user["id"]
     is_admin = current_user["role"] == "admin"
 
-    if payload.status == BookingStatus.CONFIRMED and not (is_slot_owner or is_admin):
-        raise APIError(
+    if new_status == BookingStatus.CONFIRMED and not (is_slot_owner or is_admin):
+        return APIError(
             status_code=403,
             code="FORBIDDEN",
             title="Недостаточно прав",
             detail="Только владелец слота или администратор может подтверждать",
         )
 
-    if payload.status == BookingStatus.PENDING and not (is_slot_owner or is_admin):
-        raise APIError(
+    if new_status == BookingStatus.PENDING and not (is_slot_owner or is_admin):
+        return APIError(
             status_code=403,
             code="FORBIDDEN",
             title="Недостаточно прав",
             detail="Только владелец слота или администратор может изменять статус",
         )
 
-    if payload.status == BookingStatus.CANCELLED and not (
+    if new_status == BookingStatus.CANCELLED and not (
         is_slot_owner or is_booking_owner or is_admin
     ):
-        raise APIError(
+        return APIError(
             status_code=403,
             code="FORBIDDEN",
             title="Недостаточно прав",
             detail="Недостаточно прав для отмены",
         )
 
-    if payload.status != BookingStatus.CANCELLED:
-        conflict = conn.execute(
+    return APIError(
+        status_code=409,
+        code="BOOKING_CONFLICT",
+        title="Бронирование изменилось",
+        detail="Бронирование было изменено параллельным запросом",
+        errors={"booking_id": "конфликт"},
+    )
+
+
+@router.put("/bookings/{booking_id}", response_model=BookingRead)
+def update_booking(
+    booking_id: int,
+    payload: BookingUpdate,
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
+):
+    # Права проверяются в WHERE: подтверждать и возвращать в pending может владелец
+    # слота или admin, отменять — ещё и автор бронирования.
+    try:
+        row = BookingRecord.query(
+            conn,
             """
-            SELECT id FROM bookings
-            WHERE id != ? AND slot_id = ? AND booking_date = ? AND status != ?
-            LIMIT 1
+            UPDATE bookings SET status = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND (
+                ?
+                OR EXISTS (SELECT 1 FROM slots s WHERE s.id = bookings.slot_id AND s.owner_id = ?)
+                OR (? AND user_id = ?)
+            )
+            RETURNING id, slot_id, user_id, booking_date, status
             """,
             (
+                payload.status.value,
                 booking_id,
-                record["slot_id"],
-                record["booking_date"],
-                BookingStatus.CANCELLED.value,
+                current_user["role"] == "admin",
+                current_user["id"],
+                payload.status == BookingStatus.CANCELLED,
+                current_user["id"],
             ),
         ).fetchone()
-        if conflict:
-            raise APIError(
-                status_code=409,
-                code="BOOKING_CONFLICT",
-                title="Слот уже занят",
-                detail="Слот уже забронирован на выбранную дату",
-                errors={"booking_id": "конфликт"},
-            )
+    except sqlite3.IntegrityError as exc:
+        if not is_unique_violation(exc):
+            raise
+        raise APIError(
+            status_code=409,
+            code="BOOKING_CONFLICT",
+            title="Слот уже занят",
+            detail="Слот уже забронирован на выбранную дату",
+            errors={"booking_id": "конфликт"},
+        )
+    if row is None:
+        raise _status_change_error(conn, booking_id, payload.status, current_user)
 
-    conn.execute(
-        """
-        UPDATE bookings SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
-        """,
-        (payload.status.value, booking_id),
+    # Повторная отмена уже отменённого бронирования занятость не меняет: если слот
+    # на дату держит другое бронирование, сообщение «свободен» было бы ложным.
+    republish = row.status != BookingStatus.CANCELLED.value or not _slot_taken(
+        conn, row.slot_id, row.booking_date
     )
     conn.commit()
-    updated = conn.execute(
-        "SELECT id, slot_id, user_id, booking_date, status FROM bookings WHERE id = ?",
-        (booking_id,),
-    ).fetchone()
-    return dict(updated)
+    if republish:
+        publish_occupancy(row.booking_date, row.slot_id, row.status)
+    return row
+
+
+def _slot_taken(conn: Connection, slot_id: int, booking_date: date) -> bool:
+    return (
+        conn.execute(
+            "SELECT 1 FROM bookings WHERE slot_id = ? AND booking_date = ? AND status != ?",
+            (slot_id, booking_date, BookingStatus.CANCELLED.value),
+        ).fetchone()
+        is not None
+    )
 
 
 @router.delete("/bookings/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def cancel_booking(
+def cancel_booking(
     booking_id: int,
-    current_user: dict = Depends(get_current_user),
-    conn: Connection = Depends(get_db),
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
 ):
-    record = conn.execute(
+    # Права и текущий статус проверяются в WHERE того же UPDATE: публикуется только
+    # настоящий переход из активного статуса в отменённый.
+    row = conn.execute(
+        """
+        UPDATE bookings SET status = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status != ? AND (
+            ?
+            OR user_id = ?
+            OR EXISTS (SELECT 1 FROM slots s WHERE s.id = bookings.slot_id AND s.owner_id = ?)
+        )
+        RETURNING slot_id, booking_date
+        """,
+        (
+            BookingStatus.CANCELLED.value,
+            booking_id,
+            BookingStatus.CANCELLED.value,
+            current_user["role"] == "admin",
+            current_user["id"],
+            current_user["id"],
+        ),
+    ).fetchone()
+    conn.commit()
+    if row is not None:
+        publish_occupancy(row["booking_date"], row["slot_id"], BookingStatus.CANCELLED.value)
+        return None
+
+    # Ничего не изменилось: бронирования нет, нет прав или оно уже отменено.
+    record = BookingAccessRecord.query(
+        conn,
         """
-        SELECT b.user_id, s.owner_id
+        SELECT b.user_id, b.slot_id, b.booking_date, s.owner_id
         FROM bookings b
         JOIN slots s ON s.id = b.slot_id
         WHERE b.id = ?
@@ -266,10 +591,4 @@ async def cancel_booking(
             title="Недостаточно прав",
             detail="Недостаточно прав для отмены",
         )
-
-    conn.execute(
-        "UPDATE bookings SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (BookingStatus.CANCELLED.value, booking_id),
-    )
-    conn.commit()
     return None
@@ -1,51 +1,119 @@
 from sqlite3 import Connection
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 
 from ..auth.dependencies import get_current_user
-from ..core.database import get_db
+from ..core.database import get_db, get_write_db, get_writer_pool
+from ..core.etag import conditional_response
 from ..core.exceptions import APIError
-from ..schemas.validation import ItemCreate, ItemRead, ItemsPage, ItemUpdate
+from ..core.occupancy import read_versions
+from ..core.pagination import decode_cursor, encode_cursor
+from ..core.records import SlotRecord, UserRecord
+from ..core.serialization import RowEncoder, fast_response
+from ..core.slot_import import SLOT_IMPORT_MAX_BYTES, SlotImportError, import_slots, parse_payload
+from ..schemas.validation import ItemCreate, ItemImportReport, ItemRead, ItemsPage, ItemUpdate
+
+IMPORT_MEDIA_TYPES = {"application/json": "json", "text/csv": "csv"}
 
 router = APIRouter()
+item_encoder = RowEncoder(ItemRead, record=SlotRecord)
+
+
+def _item_access_error(conn: Connection, item_id: int, forbidden_detail: str) -> APIError:
+    """Объясняет, почему условная запись не затронула строку: её нет или нет прав."""
+    if conn.execute("SELECT 1 FROM slots WHERE id = ?", (item_id,)).fetchone() is None:
+        return APIError(
+            status_code=404,
+            code="ITEM_NOT_FOUND",
+            title="Предмет не найден",
+            detail="Запрошенный предмет отсутствует или удален",
+            errors={"item_id": "не существует"},
+        )
+    return APIError(
+        status_code=403,
+        code="FORBIDDEN",
+        title="Недостаточно прав",
+        detail=forbidden_detail,
+    )
 
 
 @router.get("/items", response_model=ItemsPage)
-async def list_items(
-    current_user: dict = Depends(get_current_user),
+def list_items(
+    current_user: UserRecord = Depends(get_current_user),
     conn: Connection = Depends(get_db),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    after: str | None = Query(None, description="Курсор next_cursor из предыдущей страницы"),
+    with_total: bool = Query(True, description="Считать общее число записей"),
 ):
-    base_params: list[int] = []
-    where_clause = ""
+    conditions: list[str] = []
+    base_params: list = []
     if current_user["role"] != "admin":
-        where_clause = " WHERE owner_id = ?"
+        conditions.append("owner_id = ?")
         base_params.append(current_user["id"])
+    where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
 
-    total = conn.execute(
-        f"SELECT COUNT(1) FROM slots{where_clause}",
-        tuple(base_params),
-    ).fetchone()[0]
+    total = None
+    if with_total:
+        total = conn.execute(
+            f"SELECT COUNT(1) FROM slots{where_clause}",
+            tuple(base_params),
+        ).fetchone()[0]
 
-    rows = conn.execute(
-        f"SELECT id, code, description, owner_id FROM slots{where_clause}"
+    page_params = list(base_params)
+    if after is not None:
+        if offset:
+            raise APIError(
+                status_code=422,
+                code="VALIDATION_ERROR",
+                title="Несовместимые параметры пагинации",
+                detail="Параметры after и offset нельзя использовать одновременно",
+                errors={"query.offset": "несовместим с after"},
+            )
+        (after_code,) = decode_cursor(after, str)
+        conditions.append("code > ?")
+        page_params.append(after_code)
+    page_where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница.
+    rows = SlotRecord.query(
+        conn,
+        f"SELECT id, code, description, owner_id FROM slots{page_where}"
         " ORDER BY code LIMIT ? OFFSET ?",
-        tuple(base_params + [limit, offset]),
+        tuple(page_params + [limit + 1, offset]),
     ).fetchall()
 
-    items = [dict(row) for row in rows]
-    return {"items": items, "total": total, "limit": limit, "offset": offset}
+    items = item_encoder.prepare(rows[:limit])
+    next_cursor = encode_cursor(items[-1]["code"]) if len(rows) > limit else None
+    return fast_response(
+        {
+            "items": items,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @router.post("/items", response_model=ItemRead, status_code=status.HTTP_201_CREATED)
-async def create_item(
+def create_item(
     item_data: ItemCreate,
-    current_user: dict = Depends(get_current_user),
-    conn: Connection = Depends(get_db),
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
 ):
-    existing = conn.execute("SELECT id FROM slots WHERE code = ?", (item_data.code,)).fetchone()
-    if existing:
+    # ON CONFLICT DO NOTHING вместо предварительного SELECT: пустой RETURNING — код занят.
+    row = SlotRecord.query(
+        conn,
+        """
+        INSERT INTO slots (code, description, owner_id) VALUES (?, ?, ?)
+        ON CONFLICT(code) DO NOTHING
+        RETURNING id, code, description, owner_id
+        """,
+        (item_data.code, item_data.description, current_user["id"]),
+    ).fetchone()
+    if row is None:
         raise APIError(
             status_code=409,
             code="ITEM_ALREADY_EXISTS",
@@ -53,26 +121,84 @@ async def create_item(
             detail="Предмет с таким кодом уже существует",
             errors={"code": "уже занят"},
         )
+    conn.commit()
+    return row
 
-    cursor = conn.execute(
-        "INSERT INTO slots (code, description, owner_id) VALUES (?, ?, ?)",
-        (item_data.code, item_data.description, current_user["id"]),
+
+def _run_import(rows: list, current_user: UserRecord) -> dict:
+    with get_writer_pool().connection() as conn:
+        return import_slots(
+            conn,
+            rows,
+            owner_id=current_user["id"],
+            is_admin=current_user["role"] == "admin",
+        )
+
+
+def _payload_too_large_error() -> APIError:
+    return APIError(
+        status_code=413,
+        code="PAYLOAD_TOO_LARGE",
+        title="Файл импорта слишком большой",
+        detail=f"Размер файла импорта не должен превышать {SLOT_IMPORT_MAX_BYTES} байт",
+        errors={"body": f"не больше {SLOT_IMPORT_MAX_BYTES} байт"},
     )
-    conn.commit()
-    row = conn.execute(
-        "SELECT id, code, description, owner_id FROM slots WHERE id = ?",
-        (cursor.lastrowid,),
-    ).fetchone()
-    return dict(row)
+
+
+async def _read_import_body(request: Request) -> bytes:
+    """Читает тело не больше ``SLOT_IMPORT_MAX_BYTES``: заведомо большой файл
+    отклоняется по Content-Length, а без него — как только превысит предел."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > SLOT_IMPORT_MAX_BYTES:
+        raise _payload_too_large_error()
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > SLOT_IMPORT_MAX_BYTES:
+            raise _payload_too_large_error()
+    return bytes(body)
+
+
+@router.post("/items/import", response_model=ItemImportReport)
+async def import_items(request: Request, current_user: UserRecord = Depends(get_current_user)):
+    media_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    fmt = IMPORT_MEDIA_TYPES.get(media_type)
+    if fmt is None:
+        raise APIError(
+            status_code=415,
+            code="UNSUPPORTED_MEDIA_TYPE",
+            title="Неподдерживаемый формат",
+            detail="Импорт принимает application/json или text/csv",
+            errors={"content-type": "ожидается application/json или text/csv"},
+        )
+    try:
+        rows = parse_payload(await _read_import_body(request), fmt)
+    except SlotImportError as exc:
+        raise APIError(
+            status_code=422,
+            code="VALIDATION_ERROR",
+            title="Некорректный файл импорта",
+            detail=str(exc),
+            errors={"body": str(exc)},
+        ) from exc
+    # Соединение писателя берётся только после чтения тела, чтобы медленный
+    # клиент не держал очередь записи.
+    return await run_in_threadpool(_run_import, rows, current_user)
 
 
 @router.get("/items/{item_id}", response_model=ItemRead)
-async def get_item(
+def get_item(
     item_id: int,
-    current_user: dict = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: UserRecord = Depends(get_current_user),
     conn: Connection = Depends(get_db),
 ):
-    row = conn.execute(
+    # Версия читается до строки, а If-None-Match проверяется после проверок
+    # существования и прав: иначе «*» отвечал бы 304 на чужие и несуществующие id.
+    version = read_versions(conn, "slots")["slots"]
+    row = SlotRecord.query(
+        conn,
         "SELECT id, code, description, owner_id FROM slots WHERE id = ?",
         (item_id,),
     ).fetchone()
@@ -91,76 +217,57 @@ async def get_item(
             title="Недостаточно прав",
             detail="Недостаточно прав для доступа к предмету",
         )
-    return dict(row)
+    not_modified = conditional_response(
+        request, response, item_id, current_user["id"], current_user["role"], version
+    )
+    if not_modified is not None:
+        return not_modified
+    return row
 
 
 @router.patch("/items/{item_id}", response_model=ItemRead)
-async def update_item(
+def update_item(
     item_id: int,
     item_update: ItemUpdate,
-    current_user: dict = Depends(get_current_user),
-    conn: Connection = Depends(get_db),
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
 ):
-    row = conn.execute(
-        "SELECT id, owner_id FROM slots WHERE id = ?",
-        (item_id,),
-    ).fetchone()
-    if row is None:
-        raise APIError(
-            status_code=404,
-            code="ITEM_NOT_FOUND",
-            title="Предмет не найден",
-            detail="Запрошенный предмет отсутствует или удален",
-            errors={"item_id": "не существует"},
-        )
-    if row["owner_id"] != current_user["id"] and current_user["role"] != "admin":
-        raise APIError(
-            status_code=403,
-            code="FORBIDDEN",
-            title="Недостаточно прав",
-            detail="Недостаточно прав для изменения предмета",
-        )
-
+    is_admin = current_user["role"] == "admin"
     if item_update.description is not None:
-        conn.execute(
-            "UPDATE slots SET description = ? WHERE id = ?",
-            (item_update.description, item_id),
-        )
-        conn.commit()
-
-    updated = conn.execute(
-        "SELECT id, code, description, owner_id FROM slots WHERE id = ?",
-        (item_id,),
-    ).fetchone()
-    return dict(updated)
+        row = SlotRecord.query(
+            conn,
+            """
+            UPDATE slots SET description = ?
+            WHERE id = ? AND (owner_id = ? OR ?)
+            RETURNING id, code, description, owner_id
+            """,
+            (item_update.description, item_id, current_user["id"], is_admin),
+        ).fetchone()
+    else:
+        row = SlotRecord.query(
+            conn,
+            "SELECT id, code, description, owner_id FROM slots"
+            " WHERE id = ? AND (owner_id = ? OR ?)",
+            (item_id, current_user["id"], is_admin),
+        ).fetchone()
+    if row is None:
+        raise _item_access_error(conn, item_id, "Недостаточно прав для изменения предмета")
+    conn.commit()
+    return row
 
 
 @router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_item(
+def delete_item(
     item_id: int,
-    current_user: dict = Depends(get_current_user),
-    conn: Connection = Depends(get_db),
+    current_user: UserRecord = Depends(get_current_user),
+    conn: Connection = Depends(get_write_db),
 ):
+    # Права проверяются в WHERE самого DELETE: отдельный SELECT шёл бы вне транзакции.
     row = conn.execute(
-        "SELECT owner_id FROM slots WHERE id = ?",
-        (item_id,),
+        "DELETE FROM slots WHERE id = ? AND (owner_id = ? OR ?) RETURNING id",
+        (item_id, current_user["id"], current_user["role"] == "admin"),
     ).fetchone()
     if row is None:
-        raise APIError(
-            status_code=404,
-            code="ITEM_NOT_FOUND",
-            title="Предмет не найден",
-            detail="Запрошенный предмет отсутствует или удален",
-            errors={"item_id": "не существует"},
-        )
-    if row["owner_id"] != current_user["id"] and current_user["role"] != "admin":
-        raise APIError(
-            status_code=403,
-            code="FORBIDDEN",
-            title="Недостаточно прав",
-            detail="Недостаточно прав для удаления предмета",
-        )
-
-    conn.execute("DELETE FROM slots WHERE id = ?", (item_id,))
+        raise _item_access_error(conn, item_id, "Недостаточно прав для удаления предмета")
     conn.commit()
     return None
@@ -1,5 +1,6 @@
 import os
 
+from app.auth.cache import user_cache
 from app.auth.jwt_handler import get_password_hash
 from app.core.database import session_scope
 
@@ -19,6 +20,7 @@ def ensure_default_admin() -> None:
         ).fetchone()
         if existing:
             conn.execute("UPDATE users SET role = 'admin' WHERE email = ?", (email,))
+            user_cache.invalidate(existing["id"])
             return
 
         hashed = get_password_hash(password)
@@ -0,0 +1,201 @@
+"""Кэши горячего пути аутентификации: отозванные токены, проверенные JWT и профили."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.database import read_scope, session_scope
+from app.core.records import UserRecord
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "2"))
+REVOCATION_CLEANUP_SECONDS = float(os.getenv("REVOCATION_CLEANUP_SECONDS", "300"))
+
+
+class RevocationList:
+    """Множество отозванных jti в памяти процесса.
+
+    Локальный logout обновляет его сразу; записи, сделанные другими воркерами,
+    подтягиваются инкрементально по rowid фоновой задачей.
+    """
+
+    def __init__(self) -> None:
+        self._expires: dict[str, float] = {}
+        self._last_rowid = 0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        expires_at = self._expires.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._expires[jti] = expires_at
+
+    def sync(self, conn: sqlite3.Connection) -> int:
+        rows = conn.execute(
+            """
+            SELECT rowid, jti, CAST(strftime('%s', expires_at) AS INTEGER) AS expires_ts
+            FROM revoked_tokens
+            WHERE rowid > ?
+            ORDER BY rowid
+            """,
+            (self._last_rowid,),
+        ).fetchall()
+        with self._lock:
+            for row in rows:
+                self._expires[row["jti"]] = float(row["expires_ts"] or 0)
+                self._last_rowid = max(self._last_rowid, row["rowid"])
+        return len(rows)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, expires_at in self._expires.items() if expires_at <= now]
+            for jti in expired:
+                del self._expires[jti]
+        return len(expired)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires.clear()
+            self._last_rowid = 0
+
+
+class UserCache:
+    """LRU-кэш строк пользователей по ``sub`` с ограничением времени жизни.
+
+    Записи неизменяемы, поэтому отдаются без копирования.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, UserRecord]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> UserRecord | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user: UserRecord) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenCache:
+    """LRU-кэш claims проверенных JWT.
+
+    Ключ — SHA-256 токена: сами токены в памяти не хранятся. Запись действительна до
+    ``exp`` токена; токены без ``exp`` не кэшируются. Отзыв проверяется отдельно по
+    ``jti``, поэтому кэш не продлевает жизнь отозванным токенам.
+    """
+
+    def __init__(self, max_size: int = JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(claims)
+
+    def put(self, token: str, claims: dict) -> None:
+        expires_at = claims.get("exp")
+        if self.max_size <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+revocation_list = RevocationList()
+token_cache = TokenCache()
+user_cache = UserCache()
+
+
+def load_revocations() -> None:
+    with read_scope() as conn:
+        revocation_list.sync(conn)
+
+
+def cleanup_revoked_tokens() -> int:
+    # Строку с максимальным rowid не трогаем: иначе SQLite может переиспользовать
+    # её rowid, и инкрементальная синхронизация других воркеров пропустит запись.
+    with session_scope() as conn:
+        deleted = conn.execute(
+            """
+            DELETE FROM revoked_tokens
+            WHERE expires_at <= CURRENT_TIMESTAMP
+              AND rowid < (SELECT MAX(rowid) FROM revoked_tokens)
+            """
+        ).rowcount
+    revocation_list.purge_expired()
+    return deleted
+
+
+async def run_token_maintenance() -> None:
+    last_cleanup = time.monotonic()
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        try:
+            await run_in_threadpool(load_revocations)
+            if time.monotonic() - last_cleanup >= REVOCATION_CLEANUP_SECONDS:
+                await run_in_threadpool(cleanup_revoked_tokens)
+                last_cleanup = time.monotonic()
+        except Exception:
+            logger.exception("Token maintenance iteration failed")
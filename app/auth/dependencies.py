@@ -1,11 +1,11 @@
-from sqlite3 import Connection
-
 from fastapi import Depends, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app.auth.cache import revocation_list, user_cache
 from app.auth.jwt_handler import verify_token
-from app.core.database import get_db
+from app.core.database import read_scope
 from app.core.exceptions import APIError
+from app.core.records import UserRecord
 
 security = HTTPBearer(auto_error=False)
 
@@ -20,11 +20,10 @@ def _auth_error(title: str, detail: str) -> APIError:
     )
 
 
-async def get_current_user(
+def get_current_user(
     request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    conn: Connection = Depends(get_db),
-):
+) -> UserRecord:
     if credentials is None:
         raise _auth_error("Требуется аутентификация", "Для доступа необходим Bearer токен")
 
@@ -38,33 +37,30 @@ async def get_current_user(
             "В токене отсутствуют обязательные поля",
         )
 
-    conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= CURRENT_TIMESTAMP")
-    revoked = conn.execute(
-        "SELECT 1 FROM revoked_tokens WHERE jti = ?",
-        (jti,),
-    ).fetchone()
-    if revoked:
+    if revocation_list.is_revoked(jti):
         raise _auth_error("Токен отозван", "Необходимо выполнить повторный вход")
 
-    row = conn.execute(
-        "SELECT id, email, full_name, role FROM users WHERE id = ?",
-        (int(user_id),),
-    ).fetchone()
-    if row is None:
-        raise _auth_error("Пользователь не найден", "Учетная запись была удалена или не существует")
+    user = user_cache.get(int(user_id))
+    if user is None:
+        with read_scope() as conn:
+            user = UserRecord.query(
+                conn,
+                "SELECT id, email, full_name, role FROM users WHERE id = ?",
+                (int(user_id),),
+            ).fetchone()
+        if user is None:
+            raise _auth_error(
+                "Пользователь не найден", "Учетная запись была удалена или не существует"
+            )
+        user_cache.put(user)
 
-    user = dict(row)
-    request.state.user = {
-        "id": user["id"],
-        "email": user["email"],
-        "role": user["role"],
-    }
+    request.state.user = {"id": user.id, "email": user.email, "role": user.role}
     request.state.token_jti = jti
     request.state.raw_token = token
     return user
 
 
-async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+def require_admin(current_user: UserRecord = Depends(get_current_user)) -> UserRecord:
     if current_user["role"] != "admin":
         raise APIError(
             status_code=403,
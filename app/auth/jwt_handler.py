@@ -1,28 +1,23 @@
+import os
 import uuid
 from datetime import datetime, timedelta, timezone
 
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-
+from app.auth.cache import token_cache
+from app.auth.passwords import get_password_hash, pwd_context, verify_password  # noqa: F401
+from app.auth.signers import ALGORITHM, InvalidTokenError, create_signer  # noqa: F401
 from app.core.exceptions import APIError
+from app.core.metrics import JWT_CACHE_LOOKUPS
 from app.core.settings import ensure_settings_loaded, get_required_setting
 
 ensure_settings_loaded()
 SECRET_KEY = get_required_setting("JWT_SECRET_KEY")
 if len(SECRET_KEY) < 32:
     raise RuntimeError("JWT_SECRET_KEY must be at least 32 characters long")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+# jose — python-jose; hmac — HS256 на стандартной библиотеке (быстрее, токены совместимы).
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+signer = create_signer(JWT_BACKEND, SECRET_KEY)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -31,16 +26,23 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     expire_delta = expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     expire = datetime.now(tz=timezone.utc) + expire_delta
     to_encode.update({"exp": expire, "jti": str(uuid.uuid4())})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return signer.encode(to_encode)
 
 
 def verify_token(token: str) -> dict:
-    """Проверяет и декодирует JWT токен"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    """Проверяет и декодирует JWT токен.
+
+    Успешно проверенные claims кэшируются до ``exp``: повторные проверки того же
+    токена (middleware и зависимость, следующие запросы клиента) не считают HMAC.
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        JWT_CACHE_LOOKUPS.inc("hit")
         return payload
-    except JWTError:
+    JWT_CACHE_LOOKUPS.inc("miss")
+    try:
+        payload = signer.decode(token)
+    except InvalidTokenError:
         raise APIError(
             status_code=401,
             code="INVALID_TOKEN",
@@ -48,3 +50,5 @@ def verify_token(token: str) -> dict:
             detail="Не удалось подтвердить подпись или срок действия токена",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    token_cache.put(token, payload)
+    return payload
@@ -0,0 +1,77 @@
+"""Хэширование паролей: bcrypt с настраиваемой стоимостью в отдельном пуле."""
+
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+
+from passlib.context import CryptContext
+
+from app.core.concurrency import run_hashing
+from app.core.metrics import PASSWORD_REHASHES
+
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+
+# Минимум и максимум равны стоимости по умолчанию: хеш с другим числом раундов
+# считается устаревшим и пересчитывается при следующем успешном входе.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=PASSWORD_HASH_ROUNDS,
+    bcrypt__min_rounds=PASSWORD_HASH_ROUNDS,
+    bcrypt__max_rounds=PASSWORD_HASH_ROUNDS,
+)
+
+_dummy_hash: str | None = None
+_dummy_lock = threading.Lock()
+
+
+# Функции уровня модуля выполняются в пуле и должны сериализоваться для процессов.
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def dummy_hash() -> str:
+    """Хеш случайного пароля с текущей стоимостью для проверки неизвестных email."""
+    global _dummy_hash
+    with _dummy_lock:
+        if _dummy_hash is None:
+            _dummy_hash = pwd_context.hash(secrets.token_urlsafe(16))
+        return _dummy_hash
+
+
+def get_password_hash(password: str) -> str:
+    return run_hashing(_hash, password, operation="hash")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return run_hashing(_verify, plain_password, hashed_password, operation="verify")
+
+
+def authenticate_password(
+    plain_password: str, hashed_password: str | None
+) -> tuple[bool, str | None]:
+    """Проверяет пароль и возвращает новый хеш, если стоимость bcrypt изменилась.
+
+    Для неизвестного пользователя (``hashed_password is None``) пароль всё равно
+    сверяется с заранее вычисленным хешем: ответ занимает столько же времени, и по
+    нему нельзя понять, зарегистрирован ли email.
+    """
+    if hashed_password is None:
+        run_hashing(_verify, plain_password, dummy_hash(), operation="verify")
+        return False, None
+    valid, new_hash = run_hashing(
+        _verify_and_update, plain_password, hashed_password, operation="verify"
+    )
+    if valid and new_hash:
+        PASSWORD_REHASHES.inc()
+    return valid, new_hash
@@ -0,0 +1,127 @@
+"""Бэкенды подписи JWT (HS256): python-jose и реализация на стандартной библиотеке.
+
+Оба бэкенда выпускают и принимают одинаковые токены, поэтому переключение
+``JWT_BACKEND`` не разлогинивает пользователей.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime
+from typing import Protocol
+
+from jose import JWTError, jwt
+
+ALGORITHM = "HS256"
+
+
+class InvalidTokenError(Exception):
+    """Подпись, формат или срок действия токена не прошли проверку."""
+
+
+class TokenSigner(Protocol):
+    def encode(self, claims: dict) -> str: ...
+
+    def decode(self, token: str) -> dict: ...
+
+
+class JoseSigner:
+    def __init__(self, secret: str) -> None:
+        self._secret = secret
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self._secret, algorithm=ALGORITHM)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jwt.decode(token, self._secret, algorithms=[ALGORITHM])
+        except JWTError as exc:
+            raise InvalidTokenError(str(exc)) from exc
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+class HMACSigner:
+    """HS256 на hmac/hashlib без разбора JWK и обобщённой проверки claims из jose.
+
+    Проверяет то же, что jose для наших токенов: алгоритм из заголовка, подпись,
+    ``exp``, ``nbf`` и типы стандартных claims.
+    """
+
+    _HEADER = _b64encode(b'{"alg":"HS256","typ":"JWT"}')
+
+    def __init__(self, secret: str) -> None:
+        self._key = secret.encode("utf-8")
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return hmac.new(self._key, signing_input, hashlib.sha256).digest()
+
+    def encode(self, claims: dict) -> str:
+        payload = {
+            key: int(value.timestamp()) if isinstance(value, datetime) else value
+            for key, value in claims.items()
+        }
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        signing_input = self._HEADER + b"." + body
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode("ascii")
+
+    def decode(self, token: str) -> dict:
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(_b64decode(header_segment))
+            signature = _b64decode(signature_segment)
+        except (ValueError, binascii.Error) as exc:
+            raise InvalidTokenError("malformed token") from exc
+        if not isinstance(header, dict) or header.get("alg") != ALGORITHM:
+            raise InvalidTokenError("unexpected algorithm")
+        signing_input = f"{header_segment}.{payload_segment}".encode("ascii", "replace")
+        if not hmac.compare_digest(signature, self._sign(signing_input)):
+            raise InvalidTokenError("signature verification failed")
+        try:
+            claims = json.loads(_b64decode(payload_segment))
+        except (ValueError, binascii.Error) as exc:
+            raise InvalidTokenError("malformed payload") from exc
+        if not isinstance(claims, dict):
+            raise InvalidTokenError("malformed payload")
+        self._validate_claims(claims)
+        return claims
+
+    @staticmethod
+    def _validate_claims(claims: dict) -> None:
+        now = time.time()
+        for name in ("exp", "nbf", "iat"):
+            value = claims.get(name)
+            if value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))
+            ):
+                raise InvalidTokenError(f"{name} must be a number")
+        for name in ("sub", "jti"):
+            if name in claims and not isinstance(claims[name], str):
+                raise InvalidTokenError(f"{name} must be a string")
+        if "exp" in claims and claims["exp"] < now:
+            raise InvalidTokenError("token has expired")
+        if "nbf" in claims and claims["nbf"] > now:
+            raise InvalidTokenError("token is not yet valid")
+
+
+SIGNERS: dict[str, type] = {"jose": JoseSigner, "hmac": HMACSigner}
+
+
+def create_signer(backend: str, secret: str) -> TokenSigner:
+    try:
+        return SIGNERS[backend](secret)
+    except KeyError:
+        raise RuntimeError(
+            f"Unknown JWT_BACKEND {backend!r}; expected one of {', '.join(SIGNERS)}"
+        ) from None
@@ -0,0 +1,110 @@
+"""Пулы для блокирующей работы: доступ к SQLite и хэширование паролей."""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import anyio.to_thread
+
+from app.core.exceptions import APIError
+from app.core.metrics import (
+    PASSWORD_HASH_DURATION,
+    PASSWORD_HASH_PENDING,
+    PASSWORD_HASH_QUEUE_WAIT,
+    PASSWORD_HASH_REJECTIONS,
+)
+
+T = TypeVar("T")
+
+# Синхронные обработчики FastAPI выполняются в пуле потоков anyio; его размер
+# ограничивает число одновременно выполняемых запросов к базе данных.
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", "40"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# thread — bcrypt отпускает GIL, потоки загружают все ядра без пересылки данных;
+# process — отдельные процессы, если хэширование не должно делить процесс с API.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+# Сколько операций может ждать или выполняться одновременно; остальные сразу получают 503.
+PASSWORD_HASH_MAX_PENDING = int(
+    os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(PASSWORD_HASH_WORKERS, 1) * 16))
+)
+
+_hash_executor: Executor | None = None
+_hash_lock = threading.Lock()
+_hash_pending = 0
+
+
+async def configure_threadpool() -> None:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(DB_THREADPOOL_SIZE, 1)
+
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        workers = max(PASSWORD_HASH_WORKERS, 1)
+        if PASSWORD_HASH_EXECUTOR == "process":
+            # spawn, а не fork: родитель уже держит потоки и соединения SQLite.
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="password-hash"
+            )
+    return _hash_executor
+
+
+def _hashing_overloaded_error() -> APIError:
+    return APIError(
+        status_code=503,
+        code="HASHING_OVERLOADED",
+        title="Сервис аутентификации перегружен",
+        detail="Слишком много одновременных операций с паролями, повторите запрос позже",
+        headers={"Retry-After": "1"},
+    )
+
+
+def run_hashing(func: Callable[..., T], *args, operation: str | None = None) -> T:
+    """Выполняет CPU-ёмкую операцию bcrypt в ограниченном пуле и ждёт результат.
+
+    Если очередь уже заполнена, запрос отклоняется сразу, а не ждёт секундами.
+    """
+    global _hash_pending
+    label = operation or func.__name__
+    with _hash_lock:
+        if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+            PASSWORD_HASH_REJECTIONS.inc(label)
+            raise _hashing_overloaded_error()
+        _hash_pending += 1
+        executor = _get_hash_executor()
+    PASSWORD_HASH_PENDING.inc()
+    submitted = time.perf_counter()
+    try:
+        result, duration = executor.submit(_timed, func, *args).result()
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+        PASSWORD_HASH_PENDING.dec()
+    # Метрики пишет родитель: у процессов пула свой реестр, который никто не выгружает.
+    PASSWORD_HASH_DURATION.observe(duration, label)
+    PASSWORD_HASH_QUEUE_WAIT.observe(max(time.perf_counter() - submitted - duration, 0.0), label)
+    return result
+
+
+def _timed(func: Callable[..., T], *args) -> tuple[T, float]:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def shutdown_hashing() -> None:
+    global _hash_executor
+    with _hash_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
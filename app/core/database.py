@@ -1,13 +1,37 @@
 import os
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from datetime import date
 from pathlib import Path
-from typing import Generator, Iterator
+from typing import Callable, Generator, Iterator
 
+from app.core.exceptions import APIError
+from app.core.metrics import CallbackMetric, registry
+from app.core.migrations import migrate
+from app.core.profiling import connection_factory
 from app.core.settings import ensure_settings_loaded
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./parking.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "10"))
+
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL").upper()
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-20000"))
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+if DB_JOURNAL_MODE not in _JOURNAL_MODES:
+    raise ValueError(f"Unsupported DB_JOURNAL_MODE: {DB_JOURNAL_MODE}")
+if DB_SYNCHRONOUS not in _SYNCHRONOUS_MODES:
+    raise ValueError(f"Unsupported DB_SYNCHRONOUS: {DB_SYNCHRONOUS}")
 
 
 def _resolve_path(database_url: str) -> str:
@@ -37,8 +61,10 @@ _INITIALIZED = False
 def _raw_connect() -> sqlite3.Connection:
     conn = sqlite3.connect(
         DB_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
         check_same_thread=False,
         detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        factory=connection_factory(),
     )
     conn.row_factory = sqlite3.Row
     return conn
@@ -52,81 +78,272 @@ def _ensure_initialized() -> None:
     _INITIALIZED = True
 
 
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    # Значения профиля провалидированы при импорте, PRAGMA не принимает параметры.
+    conn.executescript(
+        f"""
+        PRAGMA foreign_keys = ON;
+        PRAGMA synchronous = {DB_SYNCHRONOUS};
+        PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS:d};
+        PRAGMA mmap_size = {DB_MMAP_SIZE:d};
+        PRAGMA cache_size = {DB_CACHE_SIZE:d};
+        """
+    )
+    return conn
+
+
 def connect() -> sqlite3.Connection:
     ensure_settings_loaded()
     _ensure_initialized()
-    conn = _raw_connect()
-    conn.execute("PRAGMA foreign_keys = ON;")
+    return _configure(_raw_connect())
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений SQLite с проверкой живости и метриками ожидания."""
+
+    def __init__(
+        self,
+        factory: Callable[[], sqlite3.Connection],
+        *,
+        max_size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        ping_interval: float = DB_POOL_PING_INTERVAL,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("Connection pool size must be positive")
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle: list[tuple[sqlite3.Connection, float]] = []
+        self._cond = threading.Condition()
+        self._size = 0
+        self._closed = False
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, timeout: float | None = None) -> sqlite3.Connection:
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        while True:
+            conn, idle_since = self._checkout(deadline)
+            if idle_since is None or self._is_healthy(conn, idle_since):
+                break
+            self._discard(conn)
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_seconds_total": self._wait_total,
+                "wait_seconds_max": self._wait_max,
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _checkout(self, deadline: float) -> tuple[sqlite3.Connection, float | None]:
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    self._timeouts += 1
+                    raise _pool_timeout_error()
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+        try:
+            return self._factory(), None
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _is_healthy(self, conn: sqlite3.Connection, idle_since: float) -> bool:
+        if time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+
+def _pool_timeout_error() -> APIError:
+    return APIError(
+        status_code=503,
+        code="DATABASE_UNAVAILABLE",
+        title="База данных перегружена",
+        detail="Не удалось получить соединение с базой данных, повторите запрос позже",
+        headers={"Retry-After": "1"},
+    )
+
+
+_POOL: ConnectionPool | None = None
+_WRITER: ConnectionPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def _new_connection() -> sqlite3.Connection:
+    return _configure(_raw_connect())
+
+
+def _new_writer_connection() -> sqlite3.Connection:
+    conn = _new_connection()
+    # Неявный BEGIN перед DML становится IMMEDIATE: блокировка записи берётся уже на
+    # первом INSERT/UPDATE/DELETE, а не при фиксации. SELECT до него выполняется вне
+    # транзакции, поэтому проверки либо входят в WHERE самого изменяющего запроса,
+    # либо идут после явного BEGIN IMMEDIATE.
+    conn.isolation_level = "IMMEDIATE"
     return conn
 
 
+def get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                ensure_settings_loaded()
+                _ensure_initialized()
+                _POOL = ConnectionPool(_new_connection)
+    return _POOL
+
+
+def get_writer_pool() -> ConnectionPool:
+    """Единственное соединение-писатель: ожидающие записи выстраиваются в FIFO-очередь."""
+    global _WRITER
+    if _WRITER is None:
+        with _POOL_LOCK:
+            if _WRITER is None:
+                ensure_settings_loaded()
+                _ensure_initialized()
+                _WRITER = ConnectionPool(
+                    _new_writer_connection, max_size=1, timeout=DB_WRITE_TIMEOUT
+                )
+    return _WRITER
+
+
+def close_pool() -> None:
+    global _POOL, _WRITER
+    with _POOL_LOCK:
+        for pool in (_POOL, _WRITER):
+            if pool is not None:
+                pool.close()
+        _POOL = None
+        _WRITER = None
+
+
+def _pool_metric(key: str) -> Callable[[], dict[tuple[str, ...], float]]:
+    def collect() -> dict[tuple[str, ...], float]:
+        pools = (("reader", _POOL), ("writer", _WRITER))
+        return {(name,): float(pool.stats()[key]) for name, pool in pools if pool is not None}
+
+    return collect
+
+
+for _name, _key, _type, _help in (
+    ("db_pool_in_use", "in_use", "gauge", "Соединения, выданные из пула"),
+    ("db_pool_idle", "idle", "gauge", "Свободные соединения в пуле"),
+    ("db_pool_checkouts_total", "checkouts", "counter", "Выдачи соединений из пула"),
+    ("db_pool_timeouts_total", "timeouts", "counter", "Отказы пула по таймауту ожидания"),
+    ("db_pool_wait_seconds_total", "wait_seconds_total", "counter", "Ожидание соединения"),
+):
+    registry.register(CallbackMetric(_name, _help, ("pool",), _pool_metric(_key), type=_type))
+
+
 def init_db() -> None:
     ensure_settings_loaded()
-    with _raw_connect() as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT NOT NULL UNIQUE,
-                full_name TEXT NOT NULL,
-                hashed_password TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-
-            CREATE TABLE IF NOT EXISTS slots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code TEXT NOT NULL UNIQUE,
-                description TEXT,
-                owner_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(owner_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                slot_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                booking_date DATE NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(slot_id) REFERENCES slots(id) ON DELETE CASCADE,
-                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-            );
-
-            CREATE TABLE IF NOT EXISTS revoked_tokens (
-                jti TEXT PRIMARY KEY,
-                expires_at TIMESTAMP NOT NULL
-            );
-            """
-        )
-        _ensure_role_column(conn)
+    conn = _raw_connect()
+    try:
+        if DB_PATH != ":memory:":
+            conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+def is_unique_violation(exc: sqlite3.IntegrityError) -> bool:
+    return "UNIQUE constraint failed" in str(exc)
+
+
+def is_foreign_key_violation(exc: sqlite3.IntegrityError) -> bool:
+    return "FOREIGN KEY constraint failed" in str(exc)
 
 
 @contextmanager
 def session_scope() -> Iterator[sqlite3.Connection]:
-    conn = connect()
-    try:
+    with get_writer_pool().connection() as conn:
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+@contextmanager
+def read_scope() -> Iterator[sqlite3.Connection]:
+    with get_pool().connection() as conn:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
 
 
 def get_db() -> Generator[sqlite3.Connection, None, None]:
-    conn = connect()
-    try:
+    with get_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
-def _ensure_role_column(conn: sqlite3.Connection) -> None:
-    columns = {row["name"] for row in conn.execute("PRAGMA table_info(users)")}
-    if "role" not in columns:
-        conn.execute("ALTER TABLE users ADD COLUMN role TEXT NOT NULL DEFAULT 'user'")
-        conn.commit()
+def get_write_db() -> Generator[sqlite3.Connection, None, None]:
+    with get_writer_pool().connection() as conn:
+        yield conn
@@ -0,0 +1,50 @@
+"""Условные GET: ETag из счётчиков ``data_versions`` и ответ 304 без сериализации.
+
+Тело ответа однозначно определяется версиями затронутых данных, пользователем
+(фильтры по владельцу и роли) и параметрами запроса, поэтому ETag — хеш этих
+значений. Версии нужно читать до строк: иначе старые строки могут получить
+новую версию, и клиент застрянет на устаревших данных.
+
+Для отдельного ресурса ``conditional_response`` вызывается только после проверок
+существования и прав: ``If-None-Match: *`` совпадает с любым текущим представлением
+(RFC 9110), и раньше этих проверок он раскрывал бы существование чужих id.
+Списки существуют всегда, поэтому для них проверка идёт до чтения строк.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(*parts: Any) -> str:
+    raw = "\x1f".join(map(str, parts)).encode("utf-8")
+    return '"' + hashlib.blake2b(raw, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Слабое сравнение из RFC 9110 для If-None-Match: префикс ``W/`` не учитывается.
+
+    ``*`` совпадает всегда: вызывающий отвечает за то, что представление существует.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(",")
+    )
+
+
+def conditional_response(request: Request, response: Response, *parts: Any) -> Response | None:
+    """Проставляет ETag; если клиент прислал его в If-None-Match, возвращает готовый 304."""
+    etag = compute_etag(request.scope["route"].path, *parts)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
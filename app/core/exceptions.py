@@ -9,6 +9,8 @@ from fastapi import HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from app.core.metrics import AUTH_FAILURES
+
 PROBLEM_BASE_URI = "https://parking-slots.local/problems"
 
 
@@ -72,6 +74,8 @@ def _build_problem(
 
 
 async def api_error_handler(request: Request, exc: APIError):
+    if exc.status_code in (401, 403):
+        AUTH_FAILURES.inc(exc.code)
     body = _build_problem(
         request,
         status_code=exc.status_code,
@@ -0,0 +1,380 @@
+"""Метрики в формате Prometheus без внешних зависимостей.
+
+Значения пишутся в шарды отдельных потоков (``threading.local``): на горячем пути нет
+блокировок, а при выгрузке шарды суммируются. Шард завершившегося потока сливается в
+общий базовый накопитель, поэтому пересоздаваемые потоки пула не копят шарды. Для
+``uvicorn --workers N`` каждый процесс периодически сохраняет снимок в ``METRICS_DIR``,
+и ``/metrics`` любого воркера суммирует снимки всех процессов.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, Iterable
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[str, ...]
+
+
+class _ShardHolder:
+    """Держатель шарда в ``threading.local``: исчезает вместе с потоком."""
+
+    __slots__ = ("values", "__weakref__")
+
+    def __init__(self) -> None:
+        self.values: dict = {}
+
+
+class _Shards:
+    """Значения метрики по потокам; поток пишет только в свой словарь.
+
+    ``fold(target, shard)`` добавляет значения шарда в ``target``; им шард
+    завершившегося потока сливается в базовый накопитель.
+    """
+
+    def __init__(self, fold: Callable[[dict, dict], None]) -> None:
+        self._fold = fold
+        self._local = threading.local()
+        self._base: dict = {}
+        self._all: list[dict] = []
+        # RLock: финализатор может сработать в потоке, который уже держит блокировку.
+        self._lock = threading.RLock()
+
+    def local(self) -> dict:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _ShardHolder()
+            with self._lock:
+                self._all.append(holder.values)
+            weakref.finalize(holder, self._retire, holder.values)
+        return holder.values
+
+    def _retire(self, values: dict) -> None:
+        with self._lock:
+            self._all = [shard for shard in self._all if shard is not values]
+            self._fold(self._base, values)
+
+    def shards(self) -> list[dict]:
+        with self._lock:
+            # dict.copy выполняется под GIL целиком и не видит половинчатых изменений.
+            return [self._base.copy(), *(shard.copy() for shard in self._all)]
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._all)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._base.clear()
+            for shard in self._all:
+                shard.clear()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards(self._fold)
+
+    @staticmethod
+    def _fold(target: dict, shard: dict) -> None:
+        for labels, value in shard.items():
+            target[labels] = target.get(labels, 0.0) + value
+
+    def collect(self) -> dict[Labels, float]:
+        merged: dict[Labels, float] = {}
+        for shard in self._shards.shards():
+            self._fold(merged, shard)
+        return merged
+
+    def clear(self) -> None:
+        self._shards.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        values = self._shards.local()
+        values[labels] = values.get(labels, 0.0) + amount
+
+
+class Gauge(Counter):
+    """Gauge как сумма приращений: in-flight увеличивается на входе и уменьшается на выходе."""
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        values = self._shards.local()
+        state = values.get(labels)
+        if state is None:
+            # Счётчики по корзинам (не накопительные), затем сумма и количество.
+            state = values[labels] = [0.0] * (len(self.buckets) + 3)
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @staticmethod
+    def _fold(target: dict, shard: dict) -> None:
+        # Новый список вместо сложения на месте: копии базового накопителя, уже
+        # отданные в collect, не видят частично слитых состояний.
+        for labels, state in shard.items():
+            state = list(state)
+            current = target.get(labels)
+            target[labels] = state if current is None else [a + b for a, b in zip(current, state)]
+
+    def collect(self) -> dict[Labels, list[float]]:
+        merged: dict[Labels, list[float]] = {}
+        for shard in self._shards.shards():
+            self._fold(merged, shard)
+        return merged
+
+
+class CallbackMetric:
+    """Значения читаются в момент выгрузки, например статистика пула соединений."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str],
+        callback: Callable[[], dict[Labels, float]],
+        type: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.type = type
+
+    def collect(self) -> dict[Labels, float]:
+        return self.callback()
+
+    def clear(self) -> None:
+        pass
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric | CallbackMetric] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        """Снимок значений процесса в JSON-совместимом виде."""
+        snapshot = {}
+        for metric in self._metrics.values():
+            snapshot[metric.name] = {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(labels), value] for labels, value in metric.collect().items()],
+            }
+        return snapshot
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    merged: dict = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    current = target["samples"].setdefault(key, [0.0] * len(value))
+                    for index, item in enumerate(value):
+                        current[index] += item
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0.0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(merged: dict) -> str:
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    lines: list[str] = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0.0
+            bounds = [*metric["buckets"], math.inf]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                le = 'le="' + ("+Inf" if math.isinf(bound) else _format_value(bound)) + '"'
+                lines.append(
+                    f"{name}_bucket{_format_labels(labelnames, labels, le)} "
+                    f"{_format_value(cumulative)}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {value[-2]!r}")
+            lines.append(
+                f"{name}_count{_format_labels(labelnames, labels)} {_format_value(value[-1])}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_path(pid: int) -> Path:
+    return Path(METRICS_DIR) / f"metrics-{pid}.json"
+
+
+def flush_snapshot() -> None:
+    """Сохраняет снимок процесса в METRICS_DIR (атомарной заменой файла)."""
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(os.getpid())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(registry.snapshot()), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def collect_all() -> dict:
+    """Текущий процесс плюс последние снимки остальных воркеров.
+
+    Счётчики и гистограммы завершившихся воркеров продолжают учитываться, а их gauge —
+    нет, если снимок старше трёх интервалов сохранения.
+    """
+    snapshots = [registry.snapshot()]
+    if METRICS_DIR:
+        own = _snapshot_path(os.getpid()).name
+        stale_before = time.time() - 3 * METRICS_FLUSH_SECONDS
+        for path in Path(METRICS_DIR).glob("metrics-*.json"):
+            if path.name == own:
+                continue
+            try:
+                snapshot = json.loads(path.read_text(encoding="utf-8"))
+                stale = path.stat().st_mtime < stale_before
+            except (OSError, ValueError):
+                continue
+            if stale:
+                snapshot = {
+                    name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"
+                }
+            snapshots.append(snapshot)
+    return merge_snapshots(snapshots)
+
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP-запросы по маршруту и коду ответа", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Длительность обработки HTTP-запроса", ("method", "route")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP-запросы в обработке")
+RATE_LIMIT_REJECTIONS = registry.counter(
+    "rate_limit_rejections_total", "Запросы, отклонённые rate-limit", ("limit",)
+)
+AUTH_FAILURES = registry.counter(
+    "auth_failures_total", "Ошибки аутентификации и авторизации по коду APIError", ("code",)
+)
+PASSWORD_HASH_DURATION = registry.histogram(
+    "password_hash_duration_seconds",
+    "Время bcrypt без ожидания в очереди пула",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PASSWORD_HASH_QUEUE_WAIT = registry.histogram(
+    "password_hash_queue_wait_seconds",
+    "Ожидание свободного воркера хэширования",
+    ("operation",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+PASSWORD_HASH_PENDING = registry.gauge(
+    "password_hash_pending", "Операции bcrypt в очереди и в работе"
+)
+PASSWORD_HASH_REJECTIONS = registry.counter(
+    "password_hash_rejections_total",
+    "Операции, отклонённые с 503 из-за переполненной очереди",
+    ("operation",),
+)
+PASSWORD_REHASHES = registry.counter(
+    "password_rehashes_total", "Хеши, пересчитанные при входе после смены стоимости bcrypt"
+)
+JWT_CACHE_LOOKUPS = registry.counter(
+    "jwt_cache_lookups_total", "Проверки JWT: попадания и промахи кэша claims", ("result",)
+)
+PUBSUB_SUBSCRIBERS = registry.gauge(
+    "pubsub_subscribers", "Активные подписки на потоковые обновления"
+)
+PUBSUB_DROPPED = registry.counter(
+    "pubsub_dropped_subscribers_total", "Подписки, закрытые из-за переполненной очереди"
+)
@@ -0,0 +1,212 @@
+"""Версионированные миграции схемы SQLite.
+
+Текущая версия схемы хранится в ``PRAGMA user_version``. Каждая миграция
+применяется в отдельной транзакции ``BEGIN IMMEDIATE``, поэтому несколько
+процессов, стартующих одновременно, не применят один шаг дважды.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Callable, NamedTuple
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _statements(*sql: str) -> Callable[[sqlite3.Connection], None]:
+    def apply(conn: sqlite3.Connection) -> None:
+        for statement in sql:
+            conn.execute(statement)
+
+    return apply
+
+
+def _ensure_role_column(conn: sqlite3.Connection) -> None:
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(users)")}
+    if "role" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN role TEXT NOT NULL DEFAULT 'user'")
+
+
+def _unique_active_bookings(conn: sqlite3.Connection) -> None:
+    duplicates = conn.execute(
+        """
+        SELECT slot_id, booking_date FROM bookings
+        WHERE status != 'cancelled'
+        GROUP BY slot_id, booking_date
+        HAVING COUNT(1) > 1
+        LIMIT 5
+        """
+    ).fetchall()
+    if duplicates:
+        pairs = ", ".join(f"{row['slot_id']}@{row['booking_date']}" for row in duplicates)
+        raise RuntimeError(
+            f"Cannot enforce unique active bookings, resolve duplicates first: {pairs}"
+        )
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_bookings_active_slot_date
+        ON bookings(slot_id, booking_date) WHERE status != 'cancelled'
+        """
+    )
+
+
+def _bump(scope_sql: str, condition: str = "1") -> str:
+    return (
+        f"INSERT INTO data_versions (scope, version) SELECT {scope_sql}, 1 WHERE {condition}"
+        " ON CONFLICT(scope) DO UPDATE SET version = version + 1;"
+    )
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        1,
+        "base_schema",
+        _statements(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL UNIQUE,
+                full_name TEXT NOT NULL,
+                hashed_password TEXT NOT NULL,
+                role TEXT NOT NULL DEFAULT 'user',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS slots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code TEXT NOT NULL UNIQUE,
+                description TEXT,
+                owner_id INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(owner_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                slot_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                booking_date DATE NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(slot_id) REFERENCES slots(id) ON DELETE CASCADE,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                jti TEXT PRIMARY KEY,
+                expires_at TIMESTAMP NOT NULL
+            )
+            """,
+        ),
+    ),
+    Migration(2, "users_role_column", _ensure_role_column),
+    Migration(
+        3,
+        "hot_path_indexes",
+        _statements(
+            # Проверка конфликтов в create_booking/update_booking.
+            "CREATE INDEX IF NOT EXISTS ix_bookings_slot_date_status"
+            " ON bookings(slot_id, booking_date, status)",
+            # Дневной срез в get_availability — покрывающий индекс.
+            "CREATE INDEX IF NOT EXISTS ix_bookings_date_status_slot"
+            " ON bookings(booking_date, status, slot_id)",
+            # Фильтр по автору в list_bookings.
+            "CREATE INDEX IF NOT EXISTS ix_bookings_user ON bookings(user_id)",
+            # Фильтр по владельцу с сортировкой по коду в list_items/list_bookings.
+            "CREATE INDEX IF NOT EXISTS ix_slots_owner_code ON slots(owner_id, code)",
+        ),
+    ),
+    Migration(4, "unique_active_bookings", _unique_active_bookings),
+    Migration(
+        5,
+        "data_versions",
+        _statements(
+            # Счётчики изменений для инвалидации кэшей между воркерами:
+            # 'slots', 'bookings' и 'bookings:<дата>'.
+            """
+            CREATE TABLE IF NOT EXISTS data_versions (
+                scope TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """,
+            *(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_slots_{event.lower()}_version
+                AFTER {event} ON slots
+                BEGIN
+                    {_bump("'slots'")}
+                END
+                """
+                for event in ("INSERT", "UPDATE", "DELETE")
+            ),
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_insert_version
+            AFTER INSERT ON bookings
+            BEGIN
+                {_bump("'bookings'")}
+                {_bump("'bookings:' || NEW.booking_date")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_update_version
+            AFTER UPDATE ON bookings
+            BEGIN
+                {_bump("'bookings'")}
+                {_bump("'bookings:' || OLD.booking_date")}
+                {_bump("'bookings:' || NEW.booking_date", "OLD.booking_date != NEW.booking_date")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_delete_version
+            AFTER DELETE ON bookings
+            BEGIN
+                {_bump("'bookings'")}
+                {_bump("'bookings:' || OLD.booking_date")}
+            END
+            """,
+        ),
+    ),
+    Migration(
+        6,
+        "bookings_keyset_index",
+        # Keyset-пагинация list_bookings по (booking_date, id): rowid входит в индекс.
+        _statements("CREATE INDEX IF NOT EXISTS ix_bookings_date ON bookings(booking_date)"),
+    ),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int | None = None) -> list[int]:
+    """Применяет недостающие миграции и возвращает список применённых версий."""
+    target = LATEST_VERSION if target is None else target
+    applied: list[int] = []
+    for migration in MIGRATIONS:
+        if migration.version > target or migration.version <= current_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Версию перечитываем под блокировкой: другой процесс мог успеть раньше.
+            if migration.version <= current_version(conn):
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            conn.execute(f"PRAGMA user_version = {migration.version:d}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+    return applied
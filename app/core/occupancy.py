@@ -0,0 +1,174 @@
+"""Индекс занятости парковочных мест по датам.
+
+Для каждой даты хранится битовая маска над списком слотов, упорядоченным по
+коду. Актуальность проверяется одним запросом к ``data_versions``: счётчики
+``slots`` и ``bookings:<дата>`` увеличиваются триггерами при любой записи,
+поэтому кэш корректно инвалидируется и при изменениях из других воркеров.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import NamedTuple
+
+from app.core.models import BookingStatus
+from app.core.pubsub import Broker
+
+OCCUPANCY_CACHE_DATES = int(os.getenv("OCCUPANCY_CACHE_DATES", "64"))
+AVAILABILITY_STREAM_QUEUE_SIZE = int(os.getenv("AVAILABILITY_STREAM_QUEUE_SIZE", "256"))
+
+
+class SlotSnapshot(NamedTuple):
+    version: int
+    ids: tuple[int, ...]
+    codes: tuple[str, ...]
+    positions: dict[str, int]
+
+
+class DayOccupancy(NamedTuple):
+    slots_version: int
+    version: int
+    occupied: int
+    items: tuple[dict, ...]
+
+
+def read_versions(conn: sqlite3.Connection, *scopes: str) -> dict[str, int]:
+    placeholders = ", ".join("?" for _ in scopes)
+    rows = conn.execute(
+        f"SELECT scope, version FROM data_versions WHERE scope IN ({placeholders})",
+        scopes,
+    ).fetchall()
+    versions = dict.fromkeys(scopes, 0)
+    versions.update((row[0], row[1]) for row in rows)
+    return versions
+
+
+def date_scope(target_date: date) -> str:
+    return f"bookings:{target_date.isoformat()}"
+
+
+class OccupancyIndex:
+    def __init__(self, max_dates: int = OCCUPANCY_CACHE_DATES) -> None:
+        self.max_dates = max_dates
+        self._slots: SlotSnapshot | None = None
+        self._days: OrderedDict[date, DayOccupancy] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def availability(
+        self,
+        conn: sqlite3.Connection,
+        target_date: date,
+        code: str | None = None,
+        versions: dict[str, int] | None = None,
+    ) -> list[dict]:
+        """``versions`` — уже прочитанные счётчики ``slots`` и даты, если они есть у вызывающего."""
+        scope = date_scope(target_date)
+        if versions is None:
+            versions = read_versions(conn, "slots", scope)
+        slots = self._slot_snapshot(conn, versions["slots"])
+        day = self._day_occupancy(conn, target_date, slots, versions[scope])
+
+        if code is None:
+            return list(day.items)
+        position = slots.positions.get(code)
+        return [] if position is None else [day.items[position]]
+
+    def slot_snapshot(self, conn: sqlite3.Connection) -> SlotSnapshot:
+        return self._slot_snapshot(conn, read_versions(conn, "slots")["slots"])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots = None
+            self._days.clear()
+
+    def _slot_snapshot(self, conn: sqlite3.Connection, version: int) -> SlotSnapshot:
+        snapshot = self._slots
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        rows = conn.execute("SELECT id, code FROM slots ORDER BY code").fetchall()
+        ids = tuple(row[0] for row in rows)
+        codes = tuple(row[1] for row in rows)
+        snapshot = SlotSnapshot(version, ids, codes, {code: pos for pos, code in enumerate(codes)})
+        with self._lock:
+            self._slots = snapshot
+            # Позиции в масках сдвинулись — маски всех дат устарели.
+            self._days.clear()
+        return snapshot
+
+    def _day_occupancy(
+        self, conn: sqlite3.Connection, target_date: date, slots: SlotSnapshot, version: int
+    ) -> DayOccupancy:
+        with self._lock:
+            day = self._days.get(target_date)
+            if day is not None and day.slots_version == slots.version and day.version == version:
+                self._days.move_to_end(target_date)
+                return day
+
+        positions = {slot_id: pos for pos, slot_id in enumerate(slots.ids)}
+        occupied = 0
+        for row in conn.execute(
+            "SELECT slot_id FROM bookings WHERE booking_date = ? AND status != ?",
+            (target_date, BookingStatus.CANCELLED.value),
+        ):
+            pos = positions.get(row[0])
+            if pos is not None:
+                occupied |= 1 << pos
+
+        # Готовые строки ответа строятся один раз на версию и разделяются запросами.
+        items = tuple(
+            {"slot_id": slot_id, "code": code, "is_available": not (occupied >> pos) & 1}
+            for pos, (slot_id, code) in enumerate(zip(slots.ids, slots.codes))
+        )
+        day = DayOccupancy(slots.version, version, occupied, items)
+        with self._lock:
+            self._days[target_date] = day
+            self._days.move_to_end(target_date)
+            while len(self._days) > self.max_dates:
+                self._days.popitem(last=False)
+        return day
+
+
+def range_occupancy(conn: sqlite3.Connection, start: date, end: date) -> dict[int, int]:
+    """Маски занятости слотов за период одним сгруппированным запросом.
+
+    Бит ``i`` маски соответствует дню ``start + i``; слоты без бронирований
+    в ответ не попадают.
+    """
+    masks: dict[int, int] = {}
+    rows = conn.execute(
+        """
+        SELECT slot_id,
+               group_concat(CAST(julianday(booking_date) - julianday(?) AS INTEGER)) AS offsets
+        FROM bookings
+        WHERE booking_date BETWEEN ? AND ? AND status != ?
+        GROUP BY slot_id
+        """,
+        (start, start, end, BookingStatus.CANCELLED.value),
+    )
+    for slot_id, offsets in rows:
+        mask = 0
+        for offset in offsets.split(","):
+            mask |= 1 << int(offset)
+        masks[slot_id] = mask
+    return masks
+
+
+occupancy_index = OccupancyIndex()
+
+
+# Изменения занятости по датам для потоковых подписчиков (/availability/stream).
+availability_events = Broker(queue_size=AVAILABILITY_STREAM_QUEUE_SIZE)
+
+
+def publish_occupancy(booking_date: date | str, slot_id: int, status: str) -> None:
+    """Сообщает подписчикам даты, свободен ли слот; вызывается после commit.
+
+    Вызов идёт до возврата соединения-писателя, поэтому сообщения публикуются в
+    порядке коммитов.
+    """
+    day = booking_date.isoformat() if isinstance(booking_date, date) else str(booking_date)
+    availability_events.publish(day, (slot_id, status == BookingStatus.CANCELLED.value))
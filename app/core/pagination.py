@@ -0,0 +1,36 @@
+"""Непрозрачные курсоры для keyset-пагинации."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any
+
+from app.core.exceptions import APIError
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, *types: type) -> tuple:
+    """Разбирает курсор и приводит значения к ожидаемым типам."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor shape mismatch")
+        return tuple(
+            kind.fromisoformat(value) if hasattr(kind, "fromisoformat") else kind(value)
+            for kind, value in zip(types, values)
+        )
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise APIError(
+            status_code=422,
+            code="VALIDATION_ERROR",
+            title="Некорректный курсор пагинации",
+            detail="Параметр after должен быть значением next_cursor из предыдущего ответа",
+            errors={"query.after": "некорректный курсор"},
+        )
@@ -0,0 +1,229 @@
+"""Опциональный профилировщик SQL: длительность запросов по запросам HTTP и журнал медленных."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+SQL_PROFILE_MAX_STATEMENTS = int(os.getenv("SQL_PROFILE_MAX_STATEMENTS", "500"))
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+|\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+def normalize_statement(sql: str) -> str:
+    """Схлопывает пробелы и списки плейсхолдеров, чтобы `IN (?, ?, ?)` любой длины
+    попадал в одну строку статистики."""
+    text = _WHITESPACE.sub(" ", sql).strip()
+    text = _PLACEHOLDER_LIST.sub("?...", text)
+    return _VALUES_LIST.sub(lambda match: match.group(0).split(",", 1)[0] + ", ...", text)
+
+
+def parameters_shape(parameters: Any) -> str:
+    """Описывает параметры типами без значений: в журнал не попадают email и хеши."""
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    names = [type(value).__name__ for value in parameters]
+    if len(names) > 8:
+        return f"({', '.join(names[:8])}, ... +{len(names) - 8})"
+    return f"({', '.join(names)})"
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    shape: str
+    duration: float
+    rows: int = 0
+
+
+@dataclass
+class RequestProfile:
+    correlation_id: str
+    method: str
+    path: str
+    records: list[QueryRecord] = field(default_factory=list)
+
+
+@dataclass
+class StatementStats:
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    rows: int = 0
+    slow: int = 0
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("sql_profile", default=None)
+
+
+class SQLProfiler:
+    """Собирает записи о запросах и агрегирует их по нормализованному тексту."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = SQL_PROFILE,
+        slow_query_ms: float = SQL_SLOW_QUERY_MS,
+        max_statements: int = SQL_PROFILE_MAX_STATEMENTS,
+    ) -> None:
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.max_statements = max_statements
+        self._stats: dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, parameters: Any, duration: float) -> QueryRecord:
+        record = QueryRecord(normalize_statement(sql), parameters_shape(parameters), duration)
+        profile = current_profile.get()
+        if profile is not None:
+            profile.records.append(record)
+        return record
+
+    def finish(self, records: list[QueryRecord], profile: RequestProfile | None = None) -> None:
+        """Учитывает записи в статистике и пишет в журнал медленные."""
+        threshold = self.slow_query_ms / 1000
+        with self._lock:
+            for record in records:
+                stats = self._stats.get(record.statement)
+                if stats is None:
+                    if len(self._stats) >= self.max_statements:
+                        continue
+                    stats = self._stats[record.statement] = StatementStats()
+                stats.calls += 1
+                stats.total += record.duration
+                stats.max = max(stats.max, record.duration)
+                stats.rows += record.rows
+                if record.duration >= threshold:
+                    stats.slow += 1
+        for record in records:
+            if record.duration >= threshold:
+                logger.warning(
+                    "slow query %.1f ms rows=%d params=%s correlation_id=%s %s %s: %s",
+                    record.duration * 1000,
+                    record.rows,
+                    record.shape,
+                    profile.correlation_id if profile else "-",
+                    profile.method if profile else "-",
+                    profile.path if profile else "-",
+                    record.statement,
+                )
+
+    def snapshot(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1].total, reverse=True)
+            return [
+                {
+                    "statement": statement,
+                    "calls": stats.calls,
+                    "total_ms": round(stats.total * 1000, 3),
+                    "mean_ms": round(stats.total * 1000 / stats.calls, 3),
+                    "max_ms": round(stats.max * 1000, 3),
+                    "rows": stats.rows,
+                    "slow": stats.slow,
+                }
+                for statement, stats in items[:limit]
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+sql_profiler = SQLProfiler()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Курсор, измеряющий выполнение и выборку строк; используется только при SQL_PROFILE."""
+
+    _record: QueryRecord | None = None
+
+    def execute(self, sql: str, parameters: Any = ()) -> "ProfiledCursor":
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._start(sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]) -> "ProfiledCursor":
+        batch = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, batch)
+        finally:
+            self._start(sql, batch[0] if batch else (), time.perf_counter() - started)
+            if self._record is not None:
+                self._record.shape = f"{len(batch)} x {self._record.shape}"
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._account(started, 0)
+            raise
+        self._account(started, 1)
+        return row
+
+    def _start(self, sql: str, parameters: Any, duration: float) -> None:
+        record = sql_profiler.record(sql, parameters, duration)
+        if self.description is None:
+            record.rows = max(self.rowcount, 0)
+        self._record = record
+        # Вне HTTP-запроса (старт, фоновые задачи) учитываем только время выполнения.
+        if current_profile.get() is None:
+            sql_profiler.finish([record])
+
+    def _account(self, started: float, rows: int) -> None:
+        if self._record is not None:
+            self._record.duration += time.perf_counter() - started
+            self._record.rows += rows
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory: type[sqlite3.Cursor] = ProfiledCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    # Connection.execute в C вызывает выполнение курсора напрямую, минуя переопределения.
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory() -> type[sqlite3.Connection]:
+    """Класс соединения для sqlite3.connect: без профилирования — стандартный, без обёрток."""
+    return ProfiledConnection if sql_profiler.enabled else sqlite3.Connection
@@ -0,0 +1,101 @@
+"""Pub/sub внутри процесса: публикация из потоков обработчиков, доставка в event loop.
+
+У каждого подписчика ограниченная очередь. Если клиент не успевает читать и
+очередь переполнилась, подписка закрывается с меткой ``DROPPED``: медленный
+потребитель не копит память и не тормозит публикацию для остальных. Клиент
+переподключается и получает свежий снимок.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Hashable
+
+from app.core.metrics import PUBSUB_DROPPED, PUBSUB_SUBSCRIBERS
+
+DROPPED = object()
+
+
+class Subscription:
+    def __init__(
+        self, broker: "Broker", topic: Hashable, loop: asyncio.AbstractEventLoop, size: int
+    ) -> None:
+        self.broker = broker
+        self.topic = topic
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.dropped = False
+
+    def offer(self, message: Any) -> None:
+        """Потокобезопасная постановка сообщения в очередь подписчика."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Event loop уже закрыт: подписчик исчез без отписки.
+            self.broker.unsubscribe(self)
+
+    def _put(self, message: Any) -> None:
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            self.broker.unsubscribe(self)
+            PUBSUB_DROPPED.inc()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(DROPPED)
+
+    def drain(self) -> list[Any]:
+        """Забирает всё накопившееся без ожидания."""
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+
+class Broker:
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._topics: dict[Hashable, set[Subscription]] = defaultdict(set)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: Hashable, limit: int | None = None) -> Subscription | None:
+        """Подписывает текущий event loop на тему; вызывается из корутины.
+
+        Если подписчиков уже ``limit``, возвращает None: проверка и регистрация идут
+        под одной блокировкой, поэтому параллельные подписки не превышают лимит.
+        """
+        subscription = Subscription(self, topic, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if limit is not None and self._count >= limit:
+                return None
+            self._topics[topic].add(subscription)
+            self._count += 1
+        PUBSUB_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._topics[subscription.topic]
+            self._count -= 1
+        PUBSUB_SUBSCRIBERS.dec()
+
+    def publish(self, topic: Hashable, message: Any) -> int:
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        for subscription in subscribers:
+            subscription.offer(message)
+        return len(subscribers)
+
+    def subscriber_count(self) -> int:
+        return self._count
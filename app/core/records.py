@@ -0,0 +1,87 @@
+"""Компактные записи строк SQLite для горячих запросов.
+
+``sqlite3.Row`` держит кортеж значений и ссылку на описание курсора, а обработчики
+потом копировали его в ``dict`` — два объекта на строку. Записи здесь — именованные
+кортежи с ``__slots__ = ()``: один объект на строку, поля доступны и как атрибуты, и
+по ключу (``record["id"]``), как у ``sqlite3.Row``. Схемы ответов объявлены с
+``from_attributes``, поэтому FastAPI валидирует записи без промежуточных словарей.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from collections import namedtuple
+from typing import Any, Sequence, TypeVar
+
+R = TypeVar("R", bound="Record")
+
+
+class Record:
+    """Примесь к ``namedtuple``: доступ по имени колонки и фабрика строк для курсора."""
+
+    __slots__ = ()
+    _fields: tuple[str, ...]
+    _index: dict[str, int]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._index = {name: position for position, name in enumerate(cls._fields)}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._index[key]
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> tuple[str, ...]:
+        return self._fields
+
+    @classmethod
+    def query(cls: type[R], conn: sqlite3.Connection, sql: str, params: Sequence = ()):
+        """Выполняет запрос на курсоре, строки которого сразу становятся записями ``cls``.
+
+        Колонки сопоставляются по позиции, поэтому их имена сверяются с полями один
+        раз на запрос, а не на каждой строке.
+        """
+        cursor = conn.cursor()
+        cursor.row_factory = cls._from_row
+        cursor.execute(sql, params)
+        columns = tuple(column[0] for column in cursor.description)
+        if columns != cls._fields:
+            cursor.close()
+            raise TypeError(
+                f"{cls.__name__} expects columns {cls._fields}, query returns {columns}"
+            )
+        return cursor
+
+    @classmethod
+    def _from_row(cls: type[R], cursor: sqlite3.Cursor, row: tuple) -> R:
+        return tuple.__new__(cls, row)
+
+
+class UserRecord(Record, namedtuple("UserRecord", "id email full_name role")):
+    __slots__ = ()
+
+
+class SlotRecord(Record, namedtuple("SlotRecord", "id code description owner_id")):
+    __slots__ = ()
+
+
+class BookingRecord(Record, namedtuple("BookingRecord", "id slot_id user_id booking_date status")):
+    __slots__ = ()
+
+
+class OwnedBookingRecord(
+    Record,
+    namedtuple("OwnedBookingRecord", "id slot_id user_id booking_date status owner_id"),
+):
+    """Бронирование вместе с владельцем слота — для проверки прав на чтение."""
+
+    __slots__ = ()
+
+
+class BookingAccessRecord(
+    Record, namedtuple("BookingAccessRecord", "user_id slot_id booking_date owner_id")
+):
+    """Участники бронирования и его слот — для проверки прав на изменение."""
+
+    __slots__ = ()
@@ -0,0 +1,122 @@
+"""Быстрый путь сериализации ответов без повторной валидации строк Pydantic.
+
+Строки из нашей же схемы уже имеют нужные типы, поэтому при ``FAST_JSON=1``
+обработчики отдают готовые байты JSON, минуя ``response_model``. Соответствие
+колонок полям и преобразования значений вычисляются один раз на модель; вывод
+байт-в-байт совпадает с тем, что FastAPI строит по ``response_model``
+(проверяется контрактными тестами).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import types
+import typing
+from datetime import date
+from enum import Enum
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Mapping
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.core.records import Record
+
+try:  # orjson необязателен: без него используется json с теми же настройками.
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+
+def dumps(payload: Any) -> bytes:
+    """JSON как у ``fastapi.responses.JSONResponse``: компактно, UTF-8 без экранирования."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def _iso_date(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def _converter(annotation: Any) -> Callable[[Any], Any] | None:
+    """Преобразование значения колонки в JSON-тип поля; None — значение подходит как есть."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        (inner,) = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        convert = _converter(inner)
+        if convert is None:
+            return None
+        return lambda value: None if value is None else convert(value)
+    if annotation is bool:
+        return bool
+    if annotation in (int, str):
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, date):
+        return _iso_date
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return _enum_value
+    raise TypeError(f"unsupported field type for fast serialization: {annotation!r}")
+
+
+class RowEncoder:
+    """Строки ``sqlite3.Row``, словари или записи → словари в порядке и типах полей модели.
+
+    ``columns`` задаёт колонку для поля, если имена различаются. С ``record`` значения
+    берутся из записи по позиции, без поиска по имени.
+    """
+
+    def __init__(
+        self,
+        model: type[BaseModel],
+        columns: Mapping[str, str] | None = None,
+        record: type[Record] | None = None,
+    ) -> None:
+        columns = columns or {}
+        self.fields = tuple(model.model_fields)
+        keys = [columns.get(name, name) for name in self.fields]
+        if record is not None:
+            keys = [record._index[key] for key in keys]
+        self._getter = itemgetter(*keys)
+        self._converters = tuple(
+            (index, convert)
+            for index, info in enumerate(model.model_fields.values())
+            if (convert := _converter(info.annotation)) is not None
+        )
+
+    def row(self, row: Any) -> dict:
+        values = self._getter(row)
+        if len(self.fields) == 1:
+            values = (values,)
+        if self._converters:
+            values = list(values)
+            for index, convert in self._converters:
+                values[index] = convert(values[index])
+        return dict(zip(self.fields, values))
+
+    def rows(self, rows: Iterable[Any]) -> list[dict]:
+        return [self.row(row) for row in rows]
+
+    def prepare(self, rows: list) -> list:
+        """Словари для быстрого пути; иначе строки как есть — их проверит ``response_model``."""
+        return self.rows(rows) if FAST_JSON else rows
+
+
+def fast_response(payload: Any, response: Response | None = None, status_code: int = 200):
+    """При ``FAST_JSON`` возвращает готовый ответ с заголовками из ``response``,
+    иначе — ``payload`` для обычной обработки через ``response_model``."""
+    if not FAST_JSON:
+        return payload
+    result = Response(dumps(payload), status_code=status_code, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
@@ -0,0 +1,170 @@
+"""Массовый импорт парковочных мест из JSON/CSV с upsert по коду."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import sqlite3
+from typing import Iterable
+
+from app.schemas.validation import CODE_PATTERN
+
+SLOT_IMPORT_MAX_ROWS = int(os.getenv("SLOT_IMPORT_MAX_ROWS", "5000"))
+# Предел тела запроса: проверяется до разбора, пока файл ещё читается из сокета.
+SLOT_IMPORT_MAX_BYTES = int(os.getenv("SLOT_IMPORT_MAX_BYTES", str(2 * 1024 * 1024)))
+DESCRIPTION_MAX_LENGTH = 255
+
+SlotRow = tuple[str, str | None]
+
+
+class SlotImportError(ValueError):
+    """Файл импорта не удалось разобрать целиком."""
+
+
+def _normalize(raw_code: object, raw_description: object) -> SlotRow:
+    code = raw_code.strip() if isinstance(raw_code, str) else ""
+    if raw_description is None:
+        return code, None
+    description = str(raw_description).strip()
+    return code, description or None
+
+
+def parse_json(payload: bytes | str) -> list[SlotRow]:
+    """Принимает массив объектов `{code, description}` или `{"items": [...]}`."""
+    try:
+        data = json.loads(payload)
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise SlotImportError("некорректный JSON") from exc
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise SlotImportError("ожидается массив объектов")
+    rows = []
+    for entry in data:
+        if not isinstance(entry, dict):
+            raise SlotImportError("каждая запись должна быть объектом")
+        rows.append(_normalize(entry.get("code"), entry.get("description")))
+    return rows
+
+
+def parse_csv(payload: bytes | str) -> list[SlotRow]:
+    """Первая строка — заголовок с колонкой `code` и необязательной `description`."""
+    try:
+        text = payload.decode("utf-8-sig") if isinstance(payload, bytes) else payload
+    except UnicodeDecodeError as exc:
+        raise SlotImportError("файл должен быть в UTF-8") from exc
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or "code" not in reader.fieldnames:
+        raise SlotImportError("в заголовке CSV нет колонки code")
+    return [_normalize(record.get("code"), record.get("description")) for record in reader]
+
+
+def parse_payload(payload: bytes | str, fmt: str) -> list[SlotRow]:
+    if fmt == "json":
+        rows = parse_json(payload)
+    elif fmt == "csv":
+        rows = parse_csv(payload)
+    else:
+        raise SlotImportError(f"неподдерживаемый формат: {fmt}")
+    if not rows:
+        raise SlotImportError("файл не содержит записей")
+    if len(rows) > SLOT_IMPORT_MAX_ROWS:
+        raise SlotImportError(f"не больше {SLOT_IMPORT_MAX_ROWS} записей за один импорт")
+    return rows
+
+
+def _issue(row: int, code: str, reason: str, detail: str) -> dict:
+    return {"row": row, "code": code or None, "reason": reason, "detail": detail}
+
+
+def validate_rows(rows: Iterable[SlotRow]) -> tuple[list[tuple[int, str, str | None]], list[dict]]:
+    """Проверяет колонки целиком и отбрасывает повторы кода внутри файла.
+
+    Возвращает принятые строки `(номер, code, description)` и список проблем;
+    номер строки считается с единицы по порядку записей в файле.
+    """
+    rows = list(rows)
+    codes = [code for code, _ in rows]
+    # Один проход по колонке кодов вместо Pydantic-модели на каждую запись.
+    code_ok = [match is not None for match in map(CODE_PATTERN.fullmatch, codes)]
+    description_ok = [
+        description is None or len(description) <= DESCRIPTION_MAX_LENGTH for _, description in rows
+    ]
+
+    accepted: list[tuple[int, str, str | None]] = []
+    issues: list[dict] = []
+    seen: dict[str, int] = {}
+    for index, (code, description) in enumerate(rows, start=1):
+        if not code_ok[index - 1]:
+            issues.append(
+                _issue(index, code, "invalid", "код должен состоять из 2-10 символов A-Z или 0-9")
+            )
+        elif not description_ok[index - 1]:
+            issues.append(
+                _issue(index, code, "invalid", f"описание длиннее {DESCRIPTION_MAX_LENGTH}")
+            )
+        elif code in seen:
+            issues.append(_issue(index, code, "duplicate", f"повтор записи {seen[code]}"))
+        else:
+            seen[code] = index
+            accepted.append((index, code, description))
+    return accepted, issues
+
+
+def import_slots(
+    conn: sqlite3.Connection,
+    rows: Iterable[SlotRow],
+    *,
+    owner_id: int,
+    is_admin: bool = False,
+) -> dict:
+    """Создаёт новые места и обновляет описания существующих одной транзакцией.
+
+    Невалидные записи, повторы и чужие коды (для не-администратора) не прерывают
+    импорт: они пропускаются и попадают в `issues`.
+    """
+    rows = list(rows)
+    accepted, issues = validate_rows(rows)
+    report = {"received": len(rows), "created": 0, "updated": 0, "unchanged": 0}
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # json_each обходит лимит числа параметров для больших файлов.
+        existing = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute(
+                "SELECT code, owner_id, description FROM slots"
+                " WHERE code IN (SELECT value FROM json_each(?))",
+                (json.dumps([code for _, code, _ in accepted]),),
+            )
+        }
+        upserts = []
+        for index, code, description in accepted:
+            current = existing.get(code)
+            if current is None:
+                report["created"] += 1
+            elif current[0] != owner_id and not is_admin:
+                issues.append(_issue(index, code, "conflict", "код принадлежит другому владельцу"))
+                continue
+            elif current[1] == description:
+                report["unchanged"] += 1
+                continue
+            else:
+                report["updated"] += 1
+            upserts.append((code, description, owner_id))
+        conn.executemany(
+            """
+            INSERT INTO slots (code, description, owner_id) VALUES (?, ?, ?)
+            ON CONFLICT(code) DO UPDATE SET description = excluded.description
+            """,
+            upserts,
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    report["issues"] = sorted(issues, key=lambda issue: issue["row"])
+    return report
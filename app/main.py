@@ -1,9 +1,19 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import contextlib
+import hmac
+import os
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
-from app.api import auth, availability, bookings, items
+from app.api import admin, auth, availability, bookings, items
 from app.auth.bootstrap import ensure_default_admin
-from app.core.database import init_db
+from app.auth.cache import load_revocations, run_token_maintenance
+from app.auth.passwords import dummy_hash
+from app.core.concurrency import configure_threadpool, shutdown_hashing
+from app.core.database import close_pool, init_db
 from app.core.exceptions import (
     APIError,
     api_error_handler,
@@ -11,8 +21,13 @@ from app.core.exceptions import (
     unhandled_exception_handler,
     validation_exception_handler,
 )
+from app.core.metrics import METRICS_FLUSH_SECONDS, collect_all, flush_snapshot, render
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import SQLProfilingMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 exception_handlers = {
     APIError: api_error_handler,
     HTTPException: http_exception_handler,
@@ -24,17 +39,44 @@ app = FastAPI(title="Parking slots App", version="0.1.0", exception_handlers=exc
 
 
 @app.on_event("startup")
-def on_startup() -> None:
-    init_db()
-    ensure_default_admin()
+async def on_startup() -> None:
+    await configure_threadpool()
+    await run_in_threadpool(init_db)
+    await run_in_threadpool(ensure_default_admin)
+    await run_in_threadpool(load_revocations)
+    await run_in_threadpool(dummy_hash)
+    app.state.token_maintenance = asyncio.create_task(run_token_maintenance())
+    app.state.metrics_flush = asyncio.create_task(_flush_metrics_periodically())
+
+
+async def _flush_metrics_periodically() -> None:
+    while True:
+        await run_in_threadpool(flush_snapshot)
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    for name in ("token_maintenance", "metrics_flush"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    await run_in_threadpool(flush_snapshot)
+    shutdown_hashing()
+    close_pool()
 
 
 app.add_middleware(RateLimitMiddleware)
+app.add_middleware(SQLProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
 app.include_router(items.router, prefix="/api/v1", tags=["items"])
 app.include_router(bookings.router, prefix="/api/v1", tags=["bookings"])
 app.include_router(availability.router, prefix="/api/v1", tags=["availability"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
 
 
 @app.get("/")
@@ -45,3 +87,18 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "parking-slots-api"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            raise APIError(
+                status_code=401,
+                code="AUTHENTICATION_FAILED",
+                title="Unauthorized",
+                detail="Для /metrics нужен токен METRICS_TOKEN",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    return PlainTextResponse(render(collect_all()), media_type="text/plain; version=0.0.4")
@@ -1,13 +1,19 @@
-from fastapi import HTTPException, Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from ..auth.jwt_handler import verify_token
-from ..core.exceptions import ProblemDetailsException
+from ..core.exceptions import APIError, api_error_handler
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, exclude_paths: list = None):
-        super().__init__(app)
+class AuthMiddleware:
+    """ASGI-middleware, отклоняющая запросы без действительного Bearer-токена.
+
+    Полезная нагрузка токена сохраняется в ``request.state.user``.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: list = None):
+        self.app = app
         self.exclude_paths = exclude_paths or [
             "/docs",
             "/redoc",
@@ -17,34 +23,51 @@ class AuthMiddleware(BaseHTTPMiddleware):
             "/api/v1/auth/register",
         ]
 
-    async def dispatch(self, request: Request, call_next):
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._is_excluded(scope["path"]):
+            await self.app(scope, receive, send)
+            return
 
-        auth_header = request.headers.get("Authorization")
+        auth_header = Headers(scope=scope).get("Authorization")
         if not auth_header:
-            raise ProblemDetailsException(
-                status_code=401, detail="Требуется аутентификация", title="Unauthorized"
-            )
+            await self._reject(scope, receive, send, "Требуется аутентификация")
+            return
 
         parts = auth_header.split()
         if len(parts) != 2 or parts[0].lower() != "bearer":
-            raise ProblemDetailsException(
-                status_code=401,
-                detail="Неверный формат заголовка Authorization. Ожидается: Bearer <token>",
-                title="Unauthorized",
+            await self._reject(
+                scope,
+                receive,
+                send,
+                "Неверный формат заголовка Authorization. Ожидается: Bearer <token>",
             )
-
-        token = parts[1]
+            return
 
         try:
-            payload = verify_token(token)
-            request.state.user = payload
-        except HTTPException:
-            raise ProblemDetailsException(
+            payload = verify_token(parts[1])
+        except APIError:
+            await self._reject(scope, receive, send, "Невалидный или просроченный токен")
+            return
+
+        scope.setdefault("state", {})["user"] = payload
+        await self.app(scope, receive, send)
+
+    def _is_excluded(self, path: str) -> bool:
+        # "/" исключает только корень, остальные пути — по префиксу.
+        return any(
+            path == excluded or (excluded != "/" and path.startswith(excluded))
+            for excluded in self.exclude_paths
+        )
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, detail: str) -> None:
+        response = await api_error_handler(
+            Request(scope),
+            APIError(
                 status_code=401,
-                detail="Невалидный или просроченный токен",
+                code="AUTHENTICATION_FAILED",
                 title="Unauthorized",
-            )
-
-        return await call_next(request)
+                detail=detail,
+                headers={"WWW-Authenticate": "Bearer"},
+            ),
+        )
+        await response(scope, receive, send)
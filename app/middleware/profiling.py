@@ -0,0 +1,32 @@
+import uuid
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..core.profiling import RequestProfile, current_profile, sql_profiler
+
+
+class SQLProfilingMiddleware:
+    """ASGI-middleware, привязывающая SQL-запросы обработчика к ``correlation_id`` запроса.
+
+    При выключенном ``SQL_PROFILE`` пропускает запрос без каких-либо действий.
+    """
+
+    def __init__(self, app: ASGIApp, profiler=sql_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        # Тот же идентификатор попадёт в problem+json, если обработчик завершится ошибкой.
+        state = scope.setdefault("state", {})
+        correlation_id = state.setdefault("correlation_id", str(uuid.uuid4()))
+        profile = RequestProfile(correlation_id, scope["method"], scope["path"])
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profile.reset(token)
+            self.profiler.finish(profile.records, profile)
@@ -1,17 +1,30 @@
 import os
-import time
-from collections import defaultdict
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from ..core.exceptions import APIError
+from ..core.exceptions import APIError, api_error_handler
+from ..core.metrics import RATE_LIMIT_REJECTIONS
+from ..security.rate_limiter import RateLimitBackend, create_backend
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, limits: dict = None, disable: bool | None = None):
-        super().__init__(app)
-        self.requests = defaultdict(list)
+class RateLimitMiddleware:
+    """ASGI-middleware ограничения частоты запросов.
+
+    Реализована поверх чистого ASGI: в отличие от ``BaseHTTPMiddleware`` не
+    создаёт отдельную задачу и не оборачивает поток ответа, поэтому не мешает
+    потоковым ответам.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: dict = None,
+        disable: bool | None = None,
+        backend: RateLimitBackend | None = None,
+    ):
+        self.app = app
         if disable is None:
             self.disabled = os.getenv("DISABLE_RATE_LIMIT", "0") == "1"
         else:
@@ -21,53 +34,62 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "global": {"max_requests": 1000, "window": 3600},
             "auth": {"max_requests": 10, "window": 60},
             "bookings": {"max_requests": 10, "window": 60},
+            "bookings_batch": {"max_requests": 5, "window": 60},
             "availability": {"max_requests": 30, "window": 60},
         }
 
         if limits:
             self.default_limits.update(limits)
 
-    async def dispatch(self, request: Request, call_next):
-        if self.disabled:
-            return await call_next(request)
+        self.backend = None if self.disabled else backend or create_backend()
 
-        client_ip = request.client.host
-        current_time = time.time()
-        endpoint_type = self._get_endpoint_type(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.disabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        endpoint_type = self._get_endpoint_type(scope["path"], scope["method"])
         limits = self.default_limits.get(endpoint_type, self.default_limits["global"])
 
         max_requests = limits["max_requests"]
         window = limits["window"]
 
         key = f"{endpoint_type}:{client_ip}"
-
-        self.requests[key] = [
-            req_time for req_time in self.requests[key] if current_time - req_time < window
-        ]
-
-        if len(self.requests[key]) >= max_requests:
-            retry_after = int(window - (current_time - self.requests[key][0]))
-
-            raise APIError(
-                status_code=429,
-                code="RATE_LIMIT_EXCEEDED",
-                title="Превышен лимит запросов",
-                detail=f"Слишком много запросов. Лимит: {max_requests} в {window} секунд",
-                errors={"retry_after": retry_after},
-                headers={"Retry-After": str(retry_after)},
+        if self.backend.blocking:
+            decision = await run_in_threadpool(self.backend.hit, key, max_requests, window)
+        else:
+            decision = self.backend.hit(key, max_requests, window)
+
+        if not decision.allowed:
+            RATE_LIMIT_REJECTIONS.inc(endpoint_type)
+            retry_after = decision.retry_after
+            # Middleware работает снаружи ExceptionMiddleware, поэтому ответ
+            # в формате RFC 7807 формируем здесь, а не через raise.
+            response = await api_error_handler(
+                Request(scope),
+                APIError(
+                    status_code=429,
+                    code="RATE_LIMIT_EXCEEDED",
+                    title="Превышен лимит запросов",
+                    detail=f"Слишком много запросов. Лимит: {max_requests} в {window} секунд",
+                    errors={"retry_after": retry_after},
+                    headers={"Retry-After": str(retry_after)},
+                ),
             )
+            await response(scope, receive, send)
+            return
 
-        self.requests[key].append(current_time)
-
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
 
-    def _get_endpoint_type(self, request: Request) -> str:
+    def _get_endpoint_type(self, path: str, method: str) -> str:
         """Определяет тип эндпоинта для применения соответствующих лимитов"""
-        path = request.url.path
-        method = request.method.upper()
+        method = method.upper()
         if path.startswith("/api/v1/auth/login") or path.startswith("/api/v1/auth/register"):
             return "auth"
+        elif path.startswith("/api/v1/bookings/batch") and method == "POST":
+            return "bookings_batch"
         elif path.startswith("/api/v1/bookings") and method == "POST":
             return "bookings"
         elif path.startswith("/api/v1/availability"):
@@ -1,6 +1,7 @@
+import os
 import re
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, PositiveInt, field_validator
 
@@ -8,6 +9,7 @@ from app.core.models import BookingStatus
 
 CODE_PATTERN = re.compile(r"^[A-Z0-9]{2,10}$")
 PASSWORD_PATTERN = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).{8,64}$")
+BOOKING_BATCH_MAX_ITEMS = int(os.getenv("BOOKING_BATCH_MAX_ITEMS", "100"))
 
 
 class UserCreate(BaseModel):
@@ -78,9 +80,25 @@ class ItemRead(ItemBase):
 
 class ItemsPage(BaseModel):
     items: list[ItemRead]
-    total: int
+    total: Optional[int] = None
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
+
+
+class ItemImportIssue(BaseModel):
+    row: int
+    code: Optional[str] = None
+    reason: Literal["invalid", "duplicate", "conflict"]
+    detail: str
+
+
+class ItemImportReport(BaseModel):
+    received: int
+    created: int
+    updated: int
+    unchanged: int
+    issues: list[ItemImportIssue]
 
 
 class BookingBase(BaseModel):
@@ -99,6 +117,10 @@ class BookingCreate(BookingBase):
     pass
 
 
+class BookingBatchCreate(BaseModel):
+    items: list[BookingCreate] = Field(min_length=1, max_length=BOOKING_BATCH_MAX_ITEMS)
+
+
 class BookingUpdate(BaseModel):
     status: BookingStatus
 
@@ -113,6 +135,18 @@ class BookingRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BookingBatchResult(BaseModel):
+    slot_id: int
+    booking_date: date
+    result: Literal["created", "conflict", "not_found"]
+    booking: Optional[BookingRead] = None
+
+
+class BookingBatchResponse(BaseModel):
+    created: int
+    results: list[BookingBatchResult]
+
+
 class AvailabilityItem(BaseModel):
     slot_id: int
     code: str
@@ -122,3 +156,20 @@ class AvailabilityItem(BaseModel):
 class AvailabilityResponse(BaseModel):
     date: date
     slots: list[AvailabilityItem]
+
+
+class AvailabilityRangeRow(BaseModel):
+    slot_id: int
+    code: str
+    occupied: str = Field(
+        description="Битовая маска занятости в hex: бит i (младший — первый) — день from + i"
+    )
+
+
+class AvailabilityRangeResponse(BaseModel):
+    date_from: date = Field(alias="from")
+    date_to: date = Field(alias="to")
+    days: int
+    slots: list[AvailabilityRangeRow]
+
+    model_config = ConfigDict(populate_by_name=True)
@@ -1,30 +1,280 @@
+import math
+import os
+import sqlite3
+import tempfile
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Protocol
 
 from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
 
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv(
+    "RATE_LIMIT_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "parking-rate-limit.db")
+)
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    retry_after: int
+
+
+class WindowState(NamedTuple):
+    window_start: float
+    previous: int
+    current: int
+
+
+def advance_window(
+    state: WindowState | None, now: float, max_requests: int, window: int
+) -> tuple[WindowState, RateLimitDecision]:
+    """Один шаг скользящего окна на двух счётчиках.
+
+    Оценка числа запросов за последние ``window`` секунд — это счётчик текущего
+    окна плюс счётчик предыдущего, взвешенный долей, ещё попадающей в интервал.
+    Границы окон выровнены по эпохе, чтобы процессы с общим хранилищем
+    вычисляли их одинаково.
+    """
+    if state is None:
+        state = WindowState(now - now % window, 0, 0)
+    window_start, previous, current = state
+
+    elapsed_windows = int((now - window_start) // window)
+    if elapsed_windows >= 1:
+        previous = current if elapsed_windows == 1 else 0
+        current = 0
+        window_start += elapsed_windows * window
+    elapsed = now - window_start
+    estimate = previous * (window - elapsed) / window + current
+
+    if estimate + 1 > max_requests:
+        retry_after = _retry_after(max_requests, window, elapsed, previous, current)
+        return WindowState(window_start, previous, current), RateLimitDecision(False, retry_after)
+    return WindowState(window_start, previous, current + 1), RateLimitDecision(True, 0)
+
+
+def _retry_after(
+    max_requests: int, window: int, elapsed: float, previous: float, current: float
+) -> int:
+    """Секунды до момента, когда оценка опустится ниже лимита."""
+    if current + 1 > max_requests:
+        # Текущее окно заполнено: ждём его конца, после чего его вес начнёт убывать.
+        wait = window - elapsed + window * (1 - (max_requests - 1) / max(current, 1))
+    else:
+        wait = window * (1 - (max_requests - 1 - current) / previous) - elapsed
+    return max(1, math.ceil(wait))
+
+
+class RateLimitBackend(Protocol):
+    """Хранилище счётчиков лимитера.
+
+    ``blocking`` сообщает middleware, что ``hit`` выполняет ввод-вывод и его
+    нужно вызывать из пула потоков.
+    """
+
+    blocking: bool
+
+    def hit(self, key: str, max_requests: int, window: int) -> RateLimitDecision: ...
+
+    def clear(self) -> None: ...
+
+
+class SlidingWindowCounter:
+    """Счётчики в памяти процесса: фиксированная память на ключ.
+
+    Ключи хранятся в LRU-порядке отдельно для каждой длины окна: у ключей одного
+    окна срок простоя одинаков, поэтому голова очереди всегда истекает первой, и
+    недавний ключ с длинным окном не заслоняет простаивающие ключи с коротким.
+    Простаивающие дольше двух окон вытесняются при очередном обращении, общее
+    число ключей ограничено ``max_keys``. Подходит для запуска в один процесс.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_keys = max_keys
+        self._clock = clock
+        # window -> key -> (last_seen, state)
+        self._windows: dict[int, OrderedDict[str, tuple[float, WindowState]]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, max_requests: int, window: int) -> RateLimitDecision:
+        now = self._clock()
+        with self._lock:
+            self._evict_idle(now)
+            entries = self._windows.setdefault(window, OrderedDict())
+            entry = entries.get(key)
+            if entry is None:
+                # Ключ с другим окном начинает счёт заново.
+                self._forget(key)
+                self._size += 1
+            state, decision = advance_window(
+                entry[1] if entry is not None else None, now, max_requests, window
+            )
+            entries[key] = (now, state)
+            entries.move_to_end(key)
+            if self._size > self.max_keys:
+                self._evict_oldest()
+            return decision
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+            self._size = 0
+
+    def _forget(self, key: str) -> None:
+        for entries in self._windows.values():
+            if entries.pop(key, None) is not None:
+                self._size -= 1
+
+    def _evict_idle(self, now: float) -> None:
+        for window, entries in self._windows.items():
+            while entries:
+                last_seen, _ = next(iter(entries.values()))
+                if now - last_seen < 2 * window:
+                    break
+                entries.popitem(last=False)
+                self._size -= 1
+
+    def _evict_oldest(self) -> None:
+        """Вытесняет ключ, который раньше всех истёк бы по простою."""
+        window, entries = min(
+            ((window, entries) for window, entries in self._windows.items() if entries),
+            key=lambda item: next(iter(item[1].values()))[0] + 2 * item[0],
+        )
+        entries.popitem(last=False)
+        self._size -= 1
+
+
+class SQLiteRateLimitBackend:
+    """Счётчики в общем SQLite-файле для нескольких воркеров на одном хосте.
+
+    Чтение и обновление ключа выполняются в одной транзакции ``BEGIN IMMEDIATE``,
+    поэтому инкремент атомарен между процессами. Состояние лимитера не критично
+    к потере при сбое питания, поэтому файл работает с ``synchronous = OFF``.
+    """
+
+    blocking = True
+    cleanup_every = 1000
+
+    def __init__(
+        self,
+        path: str = RATE_LIMIT_SQLITE_PATH,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window INTEGER NOT NULL,
+                window_start REAL NOT NULL,
+                previous INTEGER NOT NULL,
+                current INTEGER NOT NULL,
+                last_seen REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_rate_limits_last_seen ON rate_limits(last_seen);
+            """
+        )
+
+    def hit(self, key: str, max_requests: int, window: int) -> RateLimitDecision:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._clock()
+                row = conn.execute(
+                    "SELECT window, window_start, previous, current FROM rate_limits"
+                    " WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                state = WindowState(*row[1:]) if row is not None and row[0] == window else None
+                state, decision = advance_window(state, now, max_requests, window)
+                conn.execute(
+                    """
+                    INSERT INTO rate_limits
+                        (key, window, window_start, previous, current, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        window = excluded.window,
+                        window_start = excluded.window_start,
+                        previous = excluded.previous,
+                        current = excluded.current,
+                        last_seen = excluded.last_seen
+                    """,
+                    (key, window, *state, now),
+                )
+                self._hits += 1
+                if self._hits % self.cleanup_every == 0:
+                    self._cleanup(now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return decision
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(1) FROM rate_limits").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limits")
+
+    def _cleanup(self, now: float) -> None:
+        self._conn.execute("DELETE FROM rate_limits WHERE last_seen < ? - 2 * window", (now,))
+        self._conn.execute(
+            """
+            DELETE FROM rate_limits WHERE key IN (
+                SELECT key FROM rate_limits ORDER BY last_seen
+                LIMIT max((SELECT COUNT(1) FROM rate_limits) - ?, 0)
+            )
+            """,
+            (self.max_keys,),
+        )
+
+
+def create_backend(name: str | None = None) -> RateLimitBackend:
+    name = (name or RATE_LIMIT_BACKEND).lower()
+    if name == "memory":
+        return SlidingWindowCounter()
+    if name == "sqlite":
+        return SQLiteRateLimitBackend()
+    raise ValueError(f"Unsupported RATE_LIMIT_BACKEND: {name}")
+
 
 class RateLimiter:
     def __init__(self):
-        self.requests = defaultdict(list)
+        self.counter = SlidingWindowCounter()
 
     async def check_rate_limit(self, request: Request, max_requests: int = 10, window: int = 60):
         client_ip = request.client.host
-        current_time = time.time()
-
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip] if current_time - req_time < window
-        ]
-
-        if len(self.requests[client_ip]) >= max_requests:
+        decision = self.counter.hit(client_ip, max_requests, window)
+        if not decision.allowed:
             raise HTTPException(
                 status_code=429,
                 detail=f"Слишком много запросов. Лимит: {max_requests} в {window} секунд",
             )
 
-        self.requests[client_ip].append(current_time)
-
 
 rate_limiter = RateLimiter()
 
@@ -0,0 +1,87 @@
+"""Латентность лёгких запросов во время шторма логинов.
+
+Сравнивает прежний путь (async-обработчик, sqlite3 и bcrypt прямо в event loop)
+с текущим (синхронный обработчик в пуле потоков, bcrypt в ограниченном пуле).
+
+    python -m benchmarks.bench_event_loop --logins 32 --probes 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import asgi_request, format_row, prepare_environment, summarize
+
+prepare_environment("event_loop.db")
+
+from app.auth.jwt_handler import pwd_context  # noqa: E402
+from app.core.database import connect  # noqa: E402
+from app.core.exceptions import APIError  # noqa: E402
+from app.main import app  # noqa: E402
+from app.schemas.validation import UserLogin  # noqa: E402
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "BenchPass1"
+
+
+async def _inline_login(credentials: UserLogin):
+    # Воспроизводит код до переноса блокирующей работы из event loop.
+    conn = connect()
+    try:
+        row = conn.execute(
+            "SELECT id, hashed_password FROM users WHERE email = ?", (credentials.email,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row or not pwd_context.verify(credentials.password, row["hashed_password"]):
+        raise APIError(status_code=401, code="INVALID_CREDENTIALS", title="invalid")
+    return {"ok": True}
+
+
+app.add_api_route("/bench/inline-login", _inline_login, methods=["POST"])
+
+
+async def _storm(login_path: str, logins: int, probes: int) -> dict:
+    payload = {"email": EMAIL, "password": PASSWORD}
+    probe_latencies: list[float] = []
+
+    async def probe() -> None:
+        for _ in range(probes):
+            started = time.perf_counter()
+            await asgi_request(app, "GET", "/health")
+            probe_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+
+    tasks = [asgi_request(app, "POST", login_path, json_body=payload) for _ in range(logins)]
+    started = time.perf_counter()
+    results = await asyncio.gather(probe(), *tasks)
+    elapsed = time.perf_counter() - started
+    statuses = {status for status, _ in results[1:]}
+    assert statuses == {200}, statuses
+    summary = summarize(probe_latencies)
+    summary["rps"] = logins / elapsed
+    return summary
+
+
+async def main(logins: int, probes: int) -> None:
+    await app.router.startup()
+    await asgi_request(
+        app,
+        "POST",
+        "/api/v1/auth/register",
+        json_body={"email": EMAIL, "full_name": "Bench", "password": PASSWORD},
+    )
+    print(f"/health latency during {logins} concurrent logins (rps = logins/sec)")
+    print(format_row("inline (before)", await _storm("/bench/inline-login", logins, probes)))
+    print(format_row("offloaded (after)", await _storm("/api/v1/auth/login", logins, probes)))
+    await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--probes", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.probes))
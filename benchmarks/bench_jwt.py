@@ -0,0 +1,64 @@
+"""Стоимость проверки JWT на запрос: python-jose против HMAC-бэкенда, с кэшем и без.
+
+Запрос с ``AuthMiddleware`` проверяет токен дважды (middleware и ``get_current_user``),
+клиенты повторяют один и тот же токен, поэтому замер идёт по пулу токенов с
+повторами и двумя проверками на запрос.
+
+    python -m benchmarks.bench_jwt --requests 20000 --tokens 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from benchmarks.common import format_row, prepare_environment, summarize
+
+prepare_environment("jwt.db")
+
+from app.auth import jwt_handler  # noqa: E402
+from app.auth.cache import TokenCache  # noqa: E402
+from app.auth.signers import create_signer  # noqa: E402
+
+VERIFICATIONS_PER_REQUEST = 2
+
+
+def _run(backend: str, cached: bool, tokens: list[str], requests: int, seed: int) -> dict:
+    jwt_handler.signer = create_signer(backend, jwt_handler.SECRET_KEY)
+    jwt_handler.token_cache = TokenCache(max_size=len(tokens) if cached else 0)
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        token = rng.choice(tokens)
+        request_started = time.perf_counter()
+        for _ in range(VERIFICATIONS_PER_REQUEST):
+            jwt_handler.verify_token(token)
+        latencies.append(time.perf_counter() - request_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def main(requests: int, token_count: int, seed: int) -> None:
+    tokens = [jwt_handler.create_access_token({"sub": str(i)}) for i in range(1, token_count + 1)]
+    print(f"{requests} requests x {VERIFICATIONS_PER_REQUEST} verify_token, {token_count} tokens")
+    for backend in ("jose", "hmac"):
+        for cached in (False, True):
+            name = f"{backend}{'+cache' if cached else ''}"
+            summary = _run(backend, cached, tokens, requests, seed)
+            # Проверка занимает микросекунды: миллисекунд format_row не хватает.
+            print(
+                format_row(name, {"count": summary["count"], "rps": summary["rps"]})
+                + f"  mean_us={summary['mean_ms'] * 1000:.1f}"
+                + f"  p50_us={summary['p50_ms'] * 1000:.1f}"
+                + f"  p99_us={summary['p99_ms'] * 1000:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.requests, args.tokens, args.seed)
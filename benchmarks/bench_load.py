@@ -0,0 +1,336 @@
+"""Смешанная нагрузка на API: логины, опрос доступности, всплески бронирований, списки admin.
+
+Данные готовит ``benchmarks.seed`` (по умолчанию 100k пользователей, 10k мест,
+1M бронирований; ``--scale`` уменьшает объёмы). Нагрузка подаётся либо прямо в
+ASGI-приложение в этом процессе, либо по HTTP в запущенный ``uvicorn --workers N``.
+
+    python -m benchmarks.bench_load --scale 0.1 --duration 20 --concurrency 32
+    python -m benchmarks.bench_load --target uvicorn --workers 4 --save-baseline uvicorn-4w
+    python -m benchmarks.bench_load --compare inprocess --max-regression 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from benchmarks.common import (
+    ROOT,
+    HTTPConnection,
+    asgi_request,
+    format_row,
+    prepare_environment,
+    summarize,
+)
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Доли сценариев в смеси; bcrypt-логины редки, как и в реальном трафике.
+SCENARIOS = {
+    "login": 2,
+    "availability_day": 10,
+    "availability_slot": 40,
+    "booking_burst": 30,
+    "admin_listing": 18,
+}
+EXPECTED_STATUSES = {
+    "login": {200},
+    "availability_day": {200},
+    "availability_slot": {200},
+    "booking_burst": {201, 409},
+    "admin_listing": {200},
+}
+TOKEN_POOL = 500
+
+Send = Callable[..., Awaitable[tuple[int, bytes]]]
+
+
+class Workload:
+    """Генерирует запросы сценариев по данным, которые создал seed."""
+
+    def __init__(self, counts: dict[str, int], tokens: dict[int, str], rng: random.Random):
+        from app.core.pagination import encode_cursor
+        from benchmarks.seed import PASSWORD, booking_window
+
+        self.counts = counts
+        self.rng = rng
+        self.tokens = tokens
+        self.driver_ids = [user_id for user_id in tokens if user_id != 1]
+        self.first_day, self.days = booking_window(counts["slots"], counts["bookings"])
+        self.encode_cursor = encode_cursor
+        self.password = PASSWORD
+
+    def pick(self) -> str:
+        return self.rng.choices(list(SCENARIOS), weights=list(SCENARIOS.values()))[0]
+
+    def _auth(self, user_id: int) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def request(self, scenario: str) -> tuple[str, str, dict, object, str]:
+        """Возвращает (method, path, headers, json_body, query_string)."""
+        rng = self.rng
+        driver = self._auth(rng.choice(self.driver_ids))
+        if scenario == "login":
+            user_id = rng.randint(2, self.counts["users"])
+            body = {"email": f"driver{user_id}@example.com", "password": self.password}
+            return "POST", "/api/v1/auth/login", {}, body, ""
+        if scenario in ("availability_day", "availability_slot"):
+            day = date.today() + timedelta(days=rng.randint(0, 13))
+            query = f"target_date={day.isoformat()}"
+            if scenario == "availability_slot":
+                query += f"&code=B{rng.randint(1, self.counts['slots']):06d}"
+            return "GET", "/api/v1/availability", driver, None, query
+        if scenario == "booking_burst":
+            day = date.today() + timedelta(days=rng.randint(1, 30))
+            body = {
+                "slot_id": rng.randint(1, self.counts["slots"]),
+                "booking_date": day.isoformat(),
+            }
+            return "POST", "/api/v1/bookings", driver, body, ""
+        if scenario == "admin_listing":
+            day = self.first_day + timedelta(days=rng.randrange(self.days))
+            cursor = self.encode_cursor(day.isoformat(), 0)
+            return "GET", "/api/v1/bookings", self._auth(1), None, f"limit=100&after={cursor}"
+        raise ValueError(scenario)
+
+
+def mint_tokens(user_count: int, rng: random.Random) -> dict[int, str]:
+    """Токены выпускаются напрямую: логин через bcrypt для сотен пользователей только
+    удлинил бы подготовку. Сам логин измеряется отдельным сценарием."""
+    from app.auth.jwt_handler import create_access_token
+
+    ids = {1, *rng.sample(range(2, user_count + 1), min(TOKEN_POOL, user_count - 1))}
+    return {user_id: create_access_token({"sub": str(user_id)}) for user_id in ids}
+
+
+async def drive(
+    make_sender: Callable[[], Awaitable[Send]],
+    workload: Workload,
+    *,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+) -> tuple[dict[str, list[float]], dict[str, int], float]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    async def user() -> None:
+        send = await make_sender()
+        while True:
+            scenario = workload.pick()
+            method, path, headers, body, query = workload.request(scenario)
+            started = time.perf_counter()
+            if started >= deadline:
+                return
+            try:
+                status, _ = await send(
+                    method, path, headers=headers, json_body=body, query_string=query
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                status = 0
+            finished = time.perf_counter()
+            if started < measure_from:
+                continue
+            latencies[scenario].append(finished - started)
+            if status not in EXPECTED_STATUSES[scenario]:
+                errors[scenario] += 1
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors, duration
+
+
+def report(latencies: dict[str, list[float]], errors: dict[str, int], elapsed: float) -> dict:
+    results = {}
+    for scenario in SCENARIOS:
+        summary = summarize(latencies.get(scenario, []), elapsed)
+        summary["errors"] = float(errors.get(scenario, 0))
+        results[scenario] = summary
+        print(format_row(scenario, summary) + f"  errors={errors.get(scenario, 0)}")
+    everything = [value for samples in latencies.values() for value in samples]
+    results["total"] = summarize(everything, elapsed)
+    results["total"]["errors"] = float(sum(errors.values()))
+    print(format_row("total", results["total"]) + f"  errors={sum(errors.values())}")
+    return results
+
+
+async def run_inprocess(workload: Workload, args: argparse.Namespace) -> dict:
+    from app.main import app
+
+    await app.router.startup()
+    try:
+
+        async def make_sender() -> Send:
+            async def send(method, path, **kwargs):
+                return await asgi_request(app, method, path, **kwargs)
+
+            return send
+
+        return report(
+            *await drive(
+                make_sender,
+                workload,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+            )
+        )
+    finally:
+        await app.router.shutdown()
+
+
+def start_uvicorn(port: int, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=os.environ.copy())
+
+
+async def wait_ready(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _ = await HTTPConnection("127.0.0.1", port).request("GET", "/health")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready")
+
+
+async def run_uvicorn(workload: Workload, args: argparse.Namespace) -> dict:
+    server = start_uvicorn(args.port, args.workers)
+    connections: list[HTTPConnection] = []
+    try:
+        await wait_ready(args.port)
+
+        async def make_sender() -> Send:
+            connection = HTTPConnection("127.0.0.1", args.port)
+            connections.append(connection)
+            return connection.request
+
+        return report(
+            *await drive(
+                make_sender,
+                workload,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+            )
+        )
+    finally:
+        for connection in connections:
+            await connection.close()
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def save_baseline(name: str, meta: dict, results: dict) -> Path:
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    rounded = {
+        scenario: {key: round(value, 2) for key, value in summary.items()}
+        for scenario, summary in results.items()
+    }
+    path.write_text(json.dumps({"meta": meta, "results": rounded}, indent=2) + "\n")
+    return path
+
+
+def compare(name: str, results: dict, max_regression: float) -> list[str]:
+    """Сравнивает с сохранённой базой: рост p95 или падение rps больше порога — регрессия."""
+    baseline = json.loads((BASELINE_DIR / f"{name}.json").read_text())["results"]
+    regressions = []
+    for scenario, current in results.items():
+        before = baseline.get(scenario)
+        if not before or not before.get("count"):
+            continue
+        p95_change = current["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps_change = 1 - current.get("rps", 0) / before["rps"] if before.get("rps") else 0.0
+        print(
+            f"{scenario:<28}  p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms"
+            f" ({p95_change:+.0%})  rps {before.get('rps', 0):.1f} ->"
+            f" {current.get('rps', 0):.1f} ({-rps_change:+.0%})"
+        )
+        if p95_change > max_regression or rps_change > max_regression:
+            regressions.append(scenario)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=2, help="процессы uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--scale", type=float, default=1.0, help="доля от 100k/10k/1M")
+    parser.add_argument("--db", help="файл SQLite; повторно используется между прогонами")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from benchmarks.seed import default_db_path, ensure_seeded
+
+    prepare_environment(path=args.db or default_db_path(args.scale))
+
+    counts = ensure_seeded(args.scale)
+    rng = random.Random(args.seed)
+    workload = Workload(counts, mint_tokens(counts["users"], rng), rng)
+
+    print(
+        f"target={args.target} workers={args.workers if args.target == 'uvicorn' else 1}"
+        f" concurrency={args.concurrency} duration={args.duration}s data={counts}"
+    )
+    runner = run_uvicorn if args.target == "uvicorn" else run_inprocess
+    results = asyncio.run(runner(workload, args))
+
+    meta = {
+        "target": args.target,
+        "workers": args.workers if args.target == "uvicorn" else 1,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "data": counts,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} cpus={os.cpu_count()}",
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if args.save_baseline:
+        print(f"baseline saved to {save_baseline(args.save_baseline, meta, results)}")
+    if args.compare:
+        regressions = compare(args.compare, results, args.max_regression)
+        if regressions:
+            print(f"regressions over {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Пропускная способность стека middleware: BaseHTTPMiddleware против чистого ASGI.
+
+Оба варианта используют один и тот же бэкенд лимитера, поэтому разница — это
+накладные расходы самой обёртки.
+
+    python -m benchmarks.bench_middleware --requests 5000 --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import asgi_request, format_row, prepare_environment, summarize
+
+prepare_environment("middleware.db")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.security.rate_limiter import SlidingWindowCounter  # noqa: E402
+
+UNLIMITED = {"global": {"max_requests": 10**9, "window": 3600}}
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Прежняя обёртка на BaseHTTPMiddleware с тем же лимитером."""
+
+    def __init__(self, app, backend):
+        super().__init__(app)
+        self.backend = backend
+
+    async def dispatch(self, request: Request, call_next):
+        self.backend.hit(f"global:{request.client.host}", 10**9, 3600)
+        return await call_next(request)
+
+
+def _build(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if variant == "base_http":
+        app.add_middleware(LegacyRateLimitMiddleware, backend=SlidingWindowCounter())
+    elif variant == "pure_asgi":
+        app.add_middleware(
+            RateLimitMiddleware, disable=False, limits=UNLIMITED, backend=SlidingWindowCounter()
+        )
+    return app
+
+
+async def _run(app: FastAPI, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, "GET", "/ping")
+            latencies.append(time.perf_counter() - started)
+            assert status == 200, status
+
+    await _warmup(app)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def _warmup(app: FastAPI) -> None:
+    for _ in range(100):
+        await asgi_request(app, "GET", "/ping")
+
+
+async def main(requests: int, concurrency: int) -> None:
+    print(f"{requests} GET /ping, concurrency={concurrency}")
+    for variant in ("no_middleware", "base_http", "pure_asgi"):
+        print(format_row(variant, await _run(_build(variant), requests, concurrency)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
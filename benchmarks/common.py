@@ -0,0 +1,186 @@
+"""Общие утилиты бенчмарков: окружение, in-process ASGI-клиент, HTTP-клиент и перцентили."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def prepare_environment(db_name: str = "bench.db", path: str | None = None) -> Path:
+    """Настраивает переменные окружения до импорта приложения."""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    if path:
+        db_path = Path(path).expanduser().resolve()
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    else:
+        bench_dir = os.getenv("BENCH_DB_DIR", tempfile.mkdtemp(prefix="parking-bench-"))
+        db_path = Path(bench_dir) / db_name
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{db_path}")
+    os.environ.setdefault("DISABLE_RATE_LIMIT", "1")
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key-0123456789abcdef0123456789")
+    return db_path
+
+
+async def asgi_request(
+    app,
+    method: str,
+    path: str,
+    *,
+    headers: Dict[str, str] | None = None,
+    json_body: Any = None,
+    query_string: str = "",
+) -> Tuple[int, bytes]:
+    body = b""
+    raw_headers = [
+        (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()
+    ]
+    if json_body is not None:
+        body = json.dumps(json_body).encode("utf-8")
+        raw_headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query_string.encode("latin-1"),
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+        "scheme": "http",
+    }
+    sent = False
+    result: Dict[str, Any] = {"status": 500, "body": b""}
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return result["status"], result["body"]
+
+
+class HTTPConnection:
+    """Минимальный HTTP/1.1 клиент с keep-alive для нагрузки на настоящий uvicorn.
+
+    Поддерживает ровно то, что отдаёт приложение: Content-Length и chunked-ответы.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        headers: Dict[str, str] | None = None,
+        json_body: Any = None,
+        query_string: str = "",
+    ) -> Tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if json_body is None else json.dumps(json_body).encode("utf-8")
+        target = f"{path}?{query_string}" if query_string else path
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{key}: {value}" for key, value in (headers or {}).items()]
+        if json_body is not None:
+            lines.append("Content-Type: application/json")
+        lines.append(f"Content-Length: {len(body)}")
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).strip(), 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            payload = b"".join(chunks)
+        else:
+            payload = await self._reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, payload
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: Sequence[float], elapsed: float | None = None) -> Dict[str, float]:
+    summary = {
+        "count": float(len(samples)),
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+    if elapsed:
+        summary["rps"] = len(samples) / elapsed
+    return summary
+
+
+def format_row(name: str, summary: Dict[str, float]) -> str:
+    parts = [f"{name:<28}"]
+    for key in ("count", "rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms"):
+        if key in summary:
+            parts.append(f"{key}={summary[key]:.1f}")
+    return "  ".join(parts)
+
+
+class Timer:
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.started
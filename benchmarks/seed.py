@@ -0,0 +1,157 @@
+"""Наполнение базы реалистичными объёмами данных для нагрузочных прогонов.
+
+По умолчанию: 100k пользователей, 10k мест и 1M бронирований за 100 дней вокруг
+сегодняшней даты. ``--scale`` пропорционально уменьшает все объёмы.
+
+    python -m benchmarks.seed --scale 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator
+
+USERS = 100_000
+SLOTS = 10_000
+BOOKINGS = 1_000_000
+PASSWORD = "BenchPass1"
+ADMIN_EMAIL = "bench-admin@example.com"
+BATCH = 50_000
+
+# Сдвиг первого дня бронирований: примерно 80% истории в прошлом, остальное впереди.
+HISTORY_SHARE = 0.8
+
+
+def volumes(scale: float) -> dict[str, int]:
+    return {
+        "users": max(int(USERS * scale), 10),
+        "slots": max(int(SLOTS * scale), 10),
+        "bookings": max(int(BOOKINGS * scale), 10),
+    }
+
+
+def default_db_path(scale: float) -> str:
+    """Общий для прогонов файл: повторное наполнение миллиона строк не нужно."""
+    return str(Path(tempfile.gettempdir()) / "parking-bench" / f"load-{scale:g}.db")
+
+
+def booking_window(slots: int, bookings: int) -> tuple[date, int]:
+    """Первый день и число дней, на которые раскладываются бронирования (слот × день)."""
+    days = math.ceil(bookings / slots)
+    return date.today() - timedelta(days=int(days * HISTORY_SHARE)), days
+
+
+def _batched(rows: Iterator[tuple], size: int = BATCH) -> Iterator[list[tuple]]:
+    batch: list[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def is_seeded(conn: sqlite3.Connection, counts: dict[str, int]) -> bool:
+    users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    slots = conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+    bookings = conn.execute(
+        "SELECT COUNT(*) FROM bookings WHERE id <= ?", (counts["bookings"],)
+    ).fetchone()[0]
+    return (users, slots, bookings) == (counts["users"], counts["slots"], counts["bookings"])
+
+
+def reset_workload_rows(conn: sqlite3.Connection, counts: dict[str, int]) -> None:
+    """Удаляет бронирования, созданные прошлыми прогонами, чтобы каждый начинался с
+    одинаковых данных: сид занимает идентификаторы 1..N."""
+    conn.execute("DELETE FROM bookings WHERE id > ?", (counts["bookings"],))
+    conn.commit()
+
+
+def seed(conn: sqlite3.Connection, counts: dict[str, int], *, hashed_password: str) -> None:
+    """Заполняет пустую базу. Все пользователи получают один хеш пароля PASSWORD:
+    bcrypt для 100k учётных записей занял бы часы и ничего не добавил бы к замеру."""
+    rng = random.Random(20240601)
+    users, slots, bookings = counts["users"], counts["slots"], counts["bookings"]
+
+    conn.execute("DELETE FROM bookings")
+    conn.execute("DELETE FROM slots")
+    conn.execute("DELETE FROM users")
+    conn.execute(
+        "INSERT INTO users (id, email, full_name, hashed_password, role)"
+        " VALUES (1, ?, 'Bench Admin', ?, 'admin')",
+        (ADMIN_EMAIL, hashed_password),
+    )
+    for batch in _batched(
+        (index, f"driver{index}@example.com", f"Driver {index}", hashed_password)
+        for index in range(2, users + 1)
+    ):
+        conn.executemany(
+            "INSERT INTO users (id, email, full_name, hashed_password, role)"
+            " VALUES (?, ?, ?, ?, 'user')",
+            batch,
+        )
+
+    conn.executemany(
+        "INSERT INTO slots (id, code, description, owner_id) VALUES (?, ?, ?, 1)",
+        [(index, f"B{index:06d}", f"Level {index % 10}") for index in range(1, slots + 1)],
+    )
+
+    first_day, _ = booking_window(slots, bookings)
+    statuses = ("confirmed",) * 7 + ("pending",) * 2 + ("cancelled",)
+    for batch in _batched(
+        (
+            index + 1,
+            index % slots + 1,
+            rng.randint(2, users),
+            first_day + timedelta(days=index // slots),
+            rng.choice(statuses),
+        )
+        for index in range(bookings)
+    ):
+        conn.executemany(
+            "INSERT INTO bookings (id, slot_id, user_id, booking_date, status)"
+            " VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def ensure_seeded(scale: float) -> dict[str, int]:
+    """Создаёт схему и наполняет базу из DATABASE_URL, если объёмы не совпадают."""
+    from app.auth.jwt_handler import pwd_context
+    from app.core.database import connect
+
+    counts = volumes(scale)
+    conn = connect()
+    try:
+        if is_seeded(conn, counts):
+            reset_workload_rows(conn, counts)
+            return counts
+        started = time.perf_counter()
+        print(f"seeding {counts} ...", flush=True)
+        seed(conn, counts, hashed_password=pwd_context.hash(PASSWORD))
+        print(f"seeded in {time.perf_counter() - started:.1f}s", flush=True)
+    finally:
+        conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    from benchmarks.common import prepare_environment
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", help="путь к файлу SQLite")
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+    db_path = prepare_environment(path=args.db or default_db_path(args.scale))
+    print(db_path)
+    ensure_seeded(args.scale)
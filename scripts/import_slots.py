@@ -0,0 +1,59 @@
+"""Bulk import of parking slots from a JSON or CSV file straight into the database.
+
+Usage: python scripts/import_slots.py slots.csv --owner admin@example.com
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Import parking slots from JSON or CSV")
+    parser.add_argument("path", type=Path, help="file with slots (.json or .csv)")
+    parser.add_argument("--owner", required=True, help="email of the user who will own new slots")
+    parser.add_argument(
+        "--format",
+        choices=("json", "csv"),
+        help="file format; detected from the extension by default",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+    from app.core.database import connect
+    from app.core.slot_import import SlotImportError, import_slots, parse_payload
+
+    fmt = args.format or args.path.suffix.lstrip(".").lower()
+    try:
+        rows = parse_payload(args.path.read_bytes(), fmt)
+    except (OSError, SlotImportError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    conn = connect()
+    try:
+        owner = conn.execute("SELECT id, role FROM users WHERE email = ?", (args.owner,)).fetchone()
+        if owner is None:
+            print(f"error: user {args.owner} not found", file=sys.stderr)
+            return 2
+        report = import_slots(conn, rows, owner_id=owner["id"], is_admin=owner["role"] == "admin")
+    finally:
+        conn.close()
+
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if report["issues"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
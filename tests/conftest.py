@@ -2,6 +2,7 @@ import asyncio
 import json
 import os
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Dict, Iterable, Tuple
 from urllib.parse import urlencode
@@ -15,11 +16,13 @@ if str(ROOT) not in sys.path:
 TEST_DATABASE_URL = "sqlite:///./test_app.db"
 os.environ.setdefault("DATABASE_URL", TEST_DATABASE_URL)
 os.environ.setdefault("DISABLE_RATE_LIMIT", "1")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
 os.environ.setdefault(
     "JWT_SECRET_KEY",
     "test-secret-key-0123456789abcdef0123456789",
 )
 
+from app.auth.cache import revocation_list, token_cache, user_cache  # noqa: E402
 from app.core import database as db  # noqa: E402
 from app.core.database import get_db, init_db  # noqa: E402
 from app.main import app  # noqa: E402
@@ -89,6 +92,7 @@ class SimpleASGITestClient:
         }
 
         body_sent = False
+        response_complete = asyncio.Event()
         response_data: Dict[str, Any] = {"body": b"", "headers": []}
 
         async def receive() -> Dict[str, Any]:
@@ -96,6 +100,9 @@ class SimpleASGITestClient:
             if not body_sent:
                 body_sent = True
                 return {"type": "http.request", "body": body, "more_body": False}
+            # Как и настоящий сервер, сообщаем об отключении только после ответа,
+            # иначе потоковые ответы будут прерваны.
+            await response_complete.wait()
             return {"type": "http.disconnect"}
 
         async def send(message: Dict[str, Any]) -> None:
@@ -104,6 +111,8 @@ class SimpleASGITestClient:
                 response_data["headers"] = message.get("headers", [])
             elif message["type"] == "http.response.body":
                 response_data["body"] += message.get("body", b"")
+                if not message.get("more_body", False):
+                    response_complete.set()
 
         await self.app(scope, receive, send)
 
@@ -151,6 +160,9 @@ def reset_database() -> None:
         conn.execute("DELETE FROM users")
         conn.execute("DELETE FROM revoked_tokens")
         conn.commit()
+    revocation_list.clear()
+    token_cache.clear()
+    user_cache.clear()
 
 
 app.dependency_overrides[get_db] = get_db
@@ -201,3 +213,48 @@ def user_factory(client):
         return {"Authorization": f"Bearer {token}"}
 
     return _create_user
+
+
+_TRANSACTION_CONTROL = {"BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "PRAGMA"}
+
+
+@pytest.fixture()
+def assert_num_queries(monkeypatch):
+    """Проверяет число SQL-запросов, выполненных через пулы соединений внутри блока.
+
+    Управление транзакциями не считается. Срабатывания триггеров sqlite3 передаёт
+    в trace как повтор текста родительского запроса, поэтому подряд идущие
+    одинаковые строки схлопываются.
+    """
+
+    @contextmanager
+    def _assert(expected: int):
+        statements: list[str] = []
+
+        def trace(sql: str) -> None:
+            keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+            if keyword in _TRANSACTION_CONTROL or (statements and statements[-1] == sql):
+                return
+            statements.append(sql)
+
+        original_acquire = db.ConnectionPool.acquire
+        original_release = db.ConnectionPool.release
+
+        def acquire(self, timeout=None):
+            conn = original_acquire(self, timeout)
+            conn.set_trace_callback(trace)
+            return conn
+
+        def release(self, conn):
+            conn.set_trace_callback(None)
+            original_release(self, conn)
+
+        with monkeypatch.context() as patch:
+            patch.setattr(db.ConnectionPool, "acquire", acquire)
+            patch.setattr(db.ConnectionPool, "release", release)
+            yield statements
+        assert len(statements) == expected, "\n".join(
+            [f"ожидалось {expected} SQL-запросов, выполнено {len(statements)}:", *statements]
+        )
+
+    return _assert
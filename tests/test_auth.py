@@ -24,6 +24,19 @@ def test_register_and_login_success(client):
     assert token_body["token_type"] == "bearer"
 
 
+def test_register_checks_then_inserts_with_returning(client, assert_num_queries):
+    payload = {
+        "email": "returning@example.com",
+        "full_name": "Returning User",
+        "password": "StrongPass1",
+    }
+    # Проверка email до хеширования и сама вставка, без повторного чтения строки.
+    with assert_num_queries(2):
+        response = client.post("/api/v1/auth/register", json=payload)
+    assert response.status_code == HTTPStatus.CREATED
+    assert response.json()["email"] == payload["email"]
+
+
 def test_register_duplicate_email(client):
     payload = {
         "email": "bob@example.com",
@@ -81,3 +94,191 @@ def test_logout_revokes_token(client, user_factory):
     body = after_logout.json()
     assert body["code"] == "AUTHENTICATION_FAILED"
     assert body["type"].endswith("/authentication_failed")
+
+
+def test_password_hashing_runs_in_bounded_worker_pool(monkeypatch):
+    import threading
+
+    from app.auth import jwt_handler
+
+    threads: list[str] = []
+    original_hash = jwt_handler.pwd_context.hash
+
+    def recording_hash(secret: str) -> str:
+        threads.append(threading.current_thread().name)
+        return original_hash(secret)
+
+    monkeypatch.setattr(jwt_handler.pwd_context, "hash", recording_hash)
+    hashed = jwt_handler.get_password_hash("SecurePass1")
+
+    assert jwt_handler.verify_password("SecurePass1", hashed)
+    assert threads and threads[0].startswith("password-hash")
+
+
+def test_login_rehashes_password_when_cost_changes(client):
+    import bcrypt
+
+    from app.auth import passwords
+    from app.core import database as db
+
+    old_hash = bcrypt.hashpw(b"SecurePass1", bcrypt.gensalt(5)).decode()
+    with db.connect() as conn:
+        conn.execute(
+            "INSERT INTO users (email, full_name, hashed_password, role)"
+            " VALUES ('rehash@example.com', 'Rehash', ?, 'user')",
+            (old_hash,),
+        )
+        conn.commit()
+
+    payload = {"email": "rehash@example.com", "password": "SecurePass1"}
+    assert client.post("/api/v1/auth/login", json=payload).status_code == HTTPStatus.OK
+
+    with db.connect() as conn:
+        (new_hash,) = conn.execute(
+            "SELECT hashed_password FROM users WHERE email = 'rehash@example.com'"
+        ).fetchone()
+    assert new_hash != old_hash
+    assert new_hash.startswith(f"$2b${passwords.PASSWORD_HASH_ROUNDS:02d}$")
+    assert client.post("/api/v1/auth/login", json=payload).status_code == HTTPStatus.OK
+
+
+def test_login_with_unknown_email_checks_dummy_hash(client, monkeypatch):
+    from app.auth import passwords
+
+    checked: list[str] = []
+    original_verify = passwords._verify
+
+    def recording_verify(password: str, hashed_password: str) -> bool:
+        checked.append(hashed_password)
+        return original_verify(password, hashed_password)
+
+    monkeypatch.setattr(passwords, "_verify", recording_verify)
+    response = client.post(
+        "/api/v1/auth/login", json={"email": "nobody@example.com", "password": "SecurePass1"}
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json()["code"] == "INVALID_CREDENTIALS"
+    assert checked == [passwords.dummy_hash()]
+
+
+def test_login_is_rejected_fast_when_hash_queue_is_full(client, monkeypatch):
+    from app.core import concurrency
+
+    monkeypatch.setattr(concurrency, "PASSWORD_HASH_MAX_PENDING", 0)
+    response = client.post(
+        "/api/v1/auth/login", json={"email": "busy@example.com", "password": "SecurePass1"}
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json()["code"] == "HASHING_OVERLOADED"
+    assert response.headers["retry-after"] == "1"
+
+
+def test_authenticated_requests_reuse_cached_user(client, user_factory, monkeypatch):
+    from app.auth import dependencies
+
+    headers = user_factory("cached@example.com")
+    assert client.get("/api/v1/items", headers=headers).status_code == HTTPStatus.OK
+
+    def fail_read_scope():
+        raise AssertionError("user lookup must be served from cache")
+
+    monkeypatch.setattr(dependencies, "read_scope", fail_read_scope)
+    assert client.get("/api/v1/items", headers=headers).status_code == HTTPStatus.OK
+
+
+def test_revocations_from_other_workers_are_synced(client, user_factory):
+    from app.auth import cache
+    from app.auth.jwt_handler import verify_token
+    from app.core import database as db
+
+    headers = user_factory("synced@example.com")
+    payload = verify_token(headers["Authorization"].split()[1])
+    with db.connect() as conn:
+        conn.execute(
+            "INSERT INTO revoked_tokens (jti, expires_at) VALUES (?, datetime(?, 'unixepoch'))",
+            (payload["jti"], payload["exp"]),
+        )
+        conn.execute(
+            "INSERT INTO revoked_tokens (jti, expires_at) VALUES ('old', '2000-01-01 00:00:00')"
+        )
+        conn.execute(
+            "INSERT INTO revoked_tokens (jti, expires_at) VALUES ('last', '2000-01-01 00:00:00')"
+        )
+        conn.commit()
+
+    assert client.get("/api/v1/items", headers=headers).status_code == HTTPStatus.OK
+    cache.load_revocations()
+    assert client.get("/api/v1/items", headers=headers).status_code == HTTPStatus.UNAUTHORIZED
+
+    assert cache.cleanup_revoked_tokens() == 1
+    with db.connect() as conn:
+        remaining = {row["jti"] for row in conn.execute("SELECT jti FROM revoked_tokens")}
+    assert remaining == {payload["jti"], "last"}
+
+
+def test_verify_token_caches_claims_until_expiry(monkeypatch):
+    from datetime import timedelta
+
+    import pytest
+
+    from app.auth import jwt_handler
+    from app.auth.cache import token_cache
+    from app.core.exceptions import APIError
+
+    decoded: list[str] = []
+    original_decode = jwt_handler.signer.decode
+
+    def recording_decode(token: str) -> dict:
+        decoded.append(token)
+        return original_decode(token)
+
+    monkeypatch.setattr(jwt_handler.signer, "decode", recording_decode)
+    token = jwt_handler.create_access_token({"sub": "7"})
+    assert jwt_handler.verify_token(token)["sub"] == "7"
+    assert jwt_handler.verify_token(token)["sub"] == "7"
+    assert decoded == [token]
+
+    expired = jwt_handler.create_access_token({"sub": "7"}, expires_delta=timedelta(seconds=-1))
+    for _ in range(2):
+        with pytest.raises(APIError):
+            jwt_handler.verify_token(expired)
+    assert decoded.count(expired) == 2
+
+    token_cache.put("stale", {"sub": "7", "exp": 1})
+    assert token_cache.get("stale") is None
+
+
+def test_signer_backends_issue_interchangeable_tokens():
+    import base64
+    import json
+    from datetime import datetime, timedelta, timezone
+
+    import pytest
+
+    from app.auth.signers import HMACSigner, InvalidTokenError, JoseSigner
+
+    secret = "signer-secret-0123456789abcdef0123456789"
+    jose_signer, hmac_signer = JoseSigner(secret), HMACSigner(secret)
+    claims = {"sub": "1", "jti": "abc", "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+
+    for issuer, verifier in ((jose_signer, hmac_signer), (hmac_signer, jose_signer)):
+        assert verifier.decode(issuer.encode(claims))["sub"] == "1"
+
+    token = hmac_signer.encode(claims)
+    header, payload, signature = token.split(".")
+    forged_payload = hmac_signer.encode({**claims, "sub": "2"}).split(".")[1]
+    none_header = base64.urlsafe_b64encode(json.dumps({"alg": "none"}).encode()).rstrip(b"=")
+    expired = {**claims, "exp": datetime.now(timezone.utc) - timedelta(seconds=5)}
+    rejected = [
+        f"{header}.{forged_payload}.{signature}",
+        f"{none_header.decode()}.{payload}.",
+        HMACSigner("other-secret-0123456789abcdef0123456789").encode(claims),
+        hmac_signer.encode(expired),
+        "not-a-token",
+    ]
+    for bad_token in rejected:
+        for signer in (jose_signer, hmac_signer):
+            with pytest.raises(InvalidTokenError):
+                signer.decode(bad_token)
@@ -42,3 +42,301 @@ def test_availability_reflects_bookings(client, user_factory):
     assert payload["code"] == "VALIDATION_ERROR"
     assert payload["status"] == HTTPStatus.UNPROCESSABLE_ENTITY
     assert payload["errors"]["query.code"][0] == "некорректный формат"
+
+
+def test_availability_index_invalidates_on_booking_changes(client, user_factory):
+    from app.core import database as db
+
+    owner_headers = user_factory("owner8@example.com")
+    first = client.post("/api/v1/items", json={"code": "Q1"}, headers=owner_headers).json()
+    user_headers = user_factory("poller@example.com")
+    target_date = date.today() + timedelta(days=5)
+    params = {"target_date": target_date.isoformat()}
+
+    def occupancy() -> dict[str, bool]:
+        body = client.get("/api/v1/availability", params=params, headers=user_headers).json()
+        return {slot["code"]: slot["is_available"] for slot in body["slots"]}
+
+    assert occupancy() == {"Q1": True}
+
+    booking = client.post(
+        "/api/v1/bookings",
+        json={"slot_id": first["id"], "booking_date": target_date.isoformat()},
+        headers=user_headers,
+    ).json()
+    assert occupancy() == {"Q1": False}
+
+    client.delete(f"/api/v1/bookings/{booking['id']}", headers=user_headers)
+    assert occupancy() == {"Q1": True}
+
+    second = client.post("/api/v1/items", json={"code": "Q0"}, headers=owner_headers).json()
+    assert occupancy() == {"Q0": True, "Q1": True}
+
+    # Запись в обход API (например, другим воркером) тоже инвалидирует индекс.
+    with db.connect() as conn:
+        conn.execute(
+            "INSERT INTO bookings (slot_id, user_id, booking_date) VALUES (?, ?, ?)",
+            (second["id"], booking["user_id"], target_date),
+        )
+        conn.commit()
+    assert occupancy() == {"Q0": False, "Q1": True}
+
+
+def test_availability_range_returns_bitmask_rows(client, user_factory):
+    owner_headers = user_factory("owner9@example.com")
+    first = client.post("/api/v1/items", json={"code": "R1"}, headers=owner_headers).json()
+    client.post("/api/v1/items", json={"code": "R2"}, headers=owner_headers)
+    user_headers = user_factory("planner@example.com")
+    start = date.today() + timedelta(days=1)
+
+    for offset in (0, 2, 6):
+        client.post(
+            "/api/v1/bookings",
+            json={
+                "slot_id": first["id"],
+                "booking_date": (start + timedelta(days=offset)).isoformat(),
+            },
+            headers=user_headers,
+        )
+
+    params = {"from": start.isoformat(), "to": (start + timedelta(days=6)).isoformat()}
+    response = client.get("/api/v1/availability/range", params=params, headers=user_headers)
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body["from"] == start.isoformat()
+    assert body["days"] == 7
+    rows = {row["code"]: int(row["occupied"], 16) for row in body["slots"]}
+    assert rows == {"R1": 0b1000101, "R2": 0}
+
+    filtered = client.get(
+        "/api/v1/availability/range", params={**params, "code": "r2"}, headers=user_headers
+    )
+    assert [row["code"] for row in filtered.json()["slots"]] == ["R2"]
+
+    too_long = client.get(
+        "/api/v1/availability/range",
+        params={"from": start.isoformat(), "to": (start + timedelta(days=400)).isoformat()},
+        headers=user_headers,
+    )
+    assert too_long.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert too_long.json()["errors"]["query.to"][0] == "некорректный период"
+
+
+def test_availability_etag_changes_only_with_that_date(client, user_factory, assert_num_queries):
+    headers = user_factory("etag-availability@example.com")
+    slot = client.post("/api/v1/items", json={"code": "E1"}, headers=headers).json()
+    target_date = date.today() + timedelta(days=2)
+    params = {"target_date": target_date.isoformat()}
+
+    first = client.get("/api/v1/availability", params=params, headers=headers)
+    assert first.status_code == HTTPStatus.OK
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    conditional = {**headers, "If-None-Match": etag}
+    with assert_num_queries(1):
+        cached = client.get("/api/v1/availability", params=params, headers=conditional)
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+    assert cached.headers["etag"] == etag
+    assert cached.text() == ""
+
+    other_day = (target_date + timedelta(days=1)).isoformat()
+    client.post(
+        "/api/v1/bookings", json={"slot_id": slot["id"], "booking_date": other_day}, headers=headers
+    )
+    unrelated = client.get("/api/v1/availability", params=params, headers=conditional)
+    assert unrelated.status_code == HTTPStatus.NOT_MODIFIED
+
+    client.post(
+        "/api/v1/bookings",
+        json={"slot_id": slot["id"], "booking_date": params["target_date"]},
+        headers=headers,
+    )
+    changed = client.get("/api/v1/availability", params=params, headers=conditional)
+    assert changed.status_code == HTTPStatus.OK
+    assert changed.headers["etag"] != etag
+    assert changed.json()["slots"][0]["is_available"] is False
+
+
+def _seed_stream_slots() -> tuple[dict, dict[str, int]]:
+    from app.core import database as db
+
+    with db.connect() as conn:
+        owner_id = conn.execute(
+            "INSERT INTO users (email, full_name, hashed_password, role)"
+            " VALUES ('stream@example.com', 'Stream', 'x', 'user') RETURNING id"
+        ).fetchone()[0]
+        slots = {
+            code: conn.execute(
+                "INSERT INTO slots (code, owner_id) VALUES (?, ?) RETURNING id", (code, owner_id)
+            ).fetchone()[0]
+            for code in ("A1", "A2", "B1")
+        }
+        conn.commit()
+    return {"id": owner_id, "role": "user"}, slots
+
+
+def test_availability_stream_sends_snapshot_then_diffs(monkeypatch):
+    import asyncio
+    import json
+    import time
+
+    from app.api import availability
+    from app.api.bookings import create_booking
+    from app.core import database as db
+    from app.core.occupancy import availability_events
+    from app.schemas.validation import BookingCreate
+
+    # Сначала сверка не успевает сработать: изменения должны прийти от обработчиков.
+    monkeypatch.setattr(availability, "AVAILABILITY_STREAM_RESYNC_SECONDS", 60)
+    user, slots = _seed_stream_slots()
+    day = date.today() + timedelta(days=1)
+
+    def book(code: str) -> None:
+        with db.get_writer_pool().connection() as conn:
+            create_booking(
+                BookingCreate(slot_id=slots[code], booking_date=day), current_user=user, conn=conn
+            )
+
+    def parse(chunk: bytes) -> tuple[str, list]:
+        lines = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if ": " in line)
+        return lines["event"], json.loads(lines["data"])["slots"]
+
+    async def next_event(events) -> bytes:
+        while True:
+            chunk = await asyncio.wait_for(events.__anext__(), 2)
+            if not chunk.startswith(b":"):
+                return chunk
+
+    async def scenario() -> None:
+        subscription = availability_events.subscribe(day.isoformat())
+        events = availability._availability_events(
+            subscription, day, "A", "stream-jti", time.time() + 3600
+        )
+        event, snapshot = parse(await next_event(events))
+        assert event == "snapshot"
+        assert [(s["code"], s["is_available"]) for s in snapshot] == [("A1", True), ("A2", True)]
+
+        await asyncio.to_thread(book, "B1")
+        await asyncio.to_thread(book, "A1")
+        event, diff = parse(await next_event(events))
+        assert (event, [(s["code"], s["is_available"]) for s in diff]) == ("diff", [("A1", False)])
+
+        # Запись мимо обработчиков (другой воркер) находит сверка по data_versions.
+        monkeypatch.setattr(availability, "AVAILABILITY_STREAM_RESYNC_SECONDS", 0.05)
+        with db.connect() as conn:
+            conn.execute(
+                "INSERT INTO bookings (slot_id, user_id, booking_date, status)"
+                " VALUES (?, ?, ?, 'confirmed')",
+                (slots["A2"], user["id"], day),
+            )
+            conn.commit()
+        event, diff = parse(await next_event(events))
+        assert (event, [(s["code"], s["is_available"]) for s in diff]) == ("diff", [("A2", False)])
+
+        await events.aclose()
+        assert availability_events.subscriber_count() == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_closes_when_token_is_revoked_or_expires(monkeypatch):
+    import asyncio
+    import json
+    import time
+
+    import pytest
+
+    from app.api import availability
+    from app.auth.cache import revocation_list
+    from app.core.occupancy import availability_events
+
+    monkeypatch.setattr(availability, "AVAILABILITY_STREAM_RESYNC_SECONDS", 60)
+    _seed_stream_slots()
+    day = date.today() + timedelta(days=1)
+
+    async def close_reason(jti: str, expires_at: float, revoke: bool) -> str:
+        subscription = availability_events.subscribe(day.isoformat())
+        events = availability._availability_events(subscription, day, None, jti, expires_at)
+        assert (await asyncio.wait_for(events.__anext__(), 2)).startswith(b"retry:")
+        if revoke:
+            revocation_list.revoke(jti, time.time() + 3600)
+            availability_events.publish(day.isoformat(), (0, True))
+        chunk = await asyncio.wait_for(events.__anext__(), 2)
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        assert availability_events.subscriber_count() == 0
+        assert chunk.startswith(b"event: unauthorized\n")
+        return json.loads(chunk.decode().split("data: ", 1)[1])["reason"]
+
+    try:
+        revoked = asyncio.run(close_reason("revoked-jti", time.time() + 3600, revoke=True))
+    finally:
+        revocation_list.clear()
+    # Срок токена обрывает ожидание раньше минутной сверки.
+    expired = asyncio.run(close_reason("expiring-jti", time.time() + 0.2, revoke=False))
+    assert (revoked, expired) == ("token_revoked", "token_expired")
+
+
+def test_slow_stream_subscriber_is_dropped():
+    import asyncio
+    import threading
+
+    from app.core.pubsub import DROPPED, Broker
+
+    broker = Broker(queue_size=2)
+
+    async def scenario() -> None:
+        subscription = broker.subscribe("2030-01-01")
+        publisher = threading.Thread(
+            target=lambda: [broker.publish("2030-01-01", (1, index % 2 == 0)) for index in range(3)]
+        )
+        publisher.start()
+        publisher.join()
+        await asyncio.sleep(0.01)
+
+        assert subscription.dropped
+        assert subscription.drain() == [DROPPED]
+        assert broker.subscriber_count() == 0
+        assert broker.publish("2030-01-01", (1, True)) == 0
+
+    asyncio.run(scenario())
+
+
+def test_broker_reserves_subscriber_slots_atomically():
+    import asyncio
+
+    from app.core.pubsub import Broker
+
+    broker = Broker(queue_size=2)
+
+    async def scenario() -> None:
+        async def try_subscribe():
+            await asyncio.sleep(0)
+            return broker.subscribe("2030-01-01", limit=3)
+
+        results = await asyncio.gather(*(try_subscribe() for _ in range(10)))
+        accepted = [subscription for subscription in results if subscription is not None]
+        assert len(accepted) == broker.subscriber_count() == 3
+
+        broker.unsubscribe(accepted[0])
+        assert broker.subscribe("2030-01-01", limit=3) is not None
+        assert broker.subscribe("2030-01-01", limit=3) is None
+
+    asyncio.run(scenario())
+
+
+def test_availability_stream_rejects_when_subscriber_limit_reached(
+    client, user_factory, monkeypatch
+):
+    from app.api import availability
+
+    headers = user_factory("stream-limit@example.com")
+    monkeypatch.setattr(availability, "AVAILABILITY_STREAM_MAX_SUBSCRIBERS", 0)
+    response = client.get(
+        "/api/v1/availability/stream",
+        params={"target_date": (date.today() + timedelta(days=1)).isoformat()},
+        headers=headers,
+    )
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json()["code"] == "STREAM_LIMIT_REACHED"
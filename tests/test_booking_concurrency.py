@@ -0,0 +1,116 @@
+"""Гонки бронирований: параллельные писатели на отдельных соединениях, как воркеры uvicorn."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from app.api.bookings import create_booking, update_booking
+from app.core import database as db
+from app.core.exceptions import APIError
+from app.core.models import BookingStatus
+from app.schemas.validation import BookingCreate, BookingUpdate
+
+DRIVERS = 8
+
+
+def _seed(slot_count: int) -> tuple[dict, list[dict], list[int]]:
+    with db.connect() as conn:
+        users = []
+        for index in range(DRIVERS + 1):
+            row = conn.execute(
+                "INSERT INTO users (email, full_name, hashed_password, role)"
+                " VALUES (?, 'Race', 'x', 'user') RETURNING id, role",
+                (f"race{index}@example.com",),
+            ).fetchone()
+            users.append(dict(row))
+        owner, drivers = users[0], users[1:]
+        slot_ids = [
+            conn.execute(
+                "INSERT INTO slots (code, owner_id) VALUES (?, ?) RETURNING id",
+                (f"R{index}", owner["id"]),
+            ).fetchone()[0]
+            for index in range(slot_count)
+        ]
+        conn.commit()
+    return owner, drivers, slot_ids
+
+
+def _run_concurrently(calls) -> list[str]:
+    """Запускает вызовы одновременно, каждый на собственном соединении-писателе."""
+    barrier = threading.Barrier(len(calls))
+
+    def run(call) -> str:
+        conn = db._new_writer_connection()
+        try:
+            barrier.wait()
+            call(conn)
+            return "ok"
+        except APIError as exc:
+            conn.rollback()
+            return exc.code
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        return list(executor.map(run, calls))
+
+
+def _active_counts(conn) -> list[int]:
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT COUNT(*) FROM bookings WHERE status != 'cancelled'"
+            " GROUP BY slot_id, booking_date"
+        )
+    ]
+
+
+def test_concurrent_creation_never_double_books():
+    _, drivers, slot_ids = _seed(slot_count=4)
+    dates = [date.today() + timedelta(days=offset) for offset in (1, 2, 3)]
+    targets = [(slot_id, day) for slot_id in slot_ids for day in dates]
+
+    calls = [
+        lambda conn, slot_id=slot_id, day=day, driver=driver: create_booking(
+            BookingCreate(slot_id=slot_id, booking_date=day), current_user=driver, conn=conn
+        )
+        for slot_id, day in targets
+        for driver in drivers
+    ]
+    outcomes = _run_concurrently(calls)
+
+    assert outcomes.count("ok") == len(targets)
+    assert outcomes.count("BOOKING_CONFLICT") == len(calls) - len(targets)
+    with db.connect() as conn:
+        assert _active_counts(conn) == [1] * len(targets)
+
+
+def test_concurrent_reactivation_keeps_single_active_booking():
+    owner, drivers, (slot_id,) = _seed(slot_count=1)
+    day = date.today() + timedelta(days=1)
+    with db.connect() as conn:
+        booking_ids = [
+            conn.execute(
+                "INSERT INTO bookings (slot_id, user_id, booking_date, status)"
+                " VALUES (?, ?, ?, 'cancelled') RETURNING id",
+                (slot_id, driver["id"], day),
+            ).fetchone()[0]
+            for driver in drivers
+        ]
+        conn.commit()
+
+    calls = [
+        lambda conn, booking_id=booking_id: update_booking(
+            booking_id,
+            BookingUpdate(status=BookingStatus.CONFIRMED),
+            current_user=owner,
+            conn=conn,
+        )
+        for booking_id in booking_ids
+    ]
+    outcomes = _run_concurrently(calls)
+
+    assert outcomes.count("ok") == 1
+    assert outcomes.count("BOOKING_CONFLICT") == len(calls) - 1
+    with db.connect() as conn:
+        assert _active_counts(conn) == [1]
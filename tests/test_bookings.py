@@ -98,3 +98,316 @@ def test_booking_validation_rejects_past_date(client, user_factory):
     payload = response.json()
     assert payload["code"] == "VALIDATION_ERROR"
     assert any("Дата бронирования" in message for message in payload["errors"]["body.booking_date"])
+
+
+def test_reactivating_cancelled_booking_conflicts_with_active_one(client, user_factory):
+    owner_headers = user_factory("owner7@example.com")
+    item = _create_item(client, owner_headers, code="S13")
+    user_headers = user_factory("driver4@example.com")
+    booking_date = date.today() + timedelta(days=4)
+    payload = {"slot_id": item["id"], "booking_date": booking_date.isoformat()}
+
+    first = client.post("/api/v1/bookings", json=payload, headers=user_headers).json()
+    client.delete(f"/api/v1/bookings/{first['id']}", headers=user_headers)
+    second = client.post("/api/v1/bookings", json=payload, headers=user_headers)
+    assert second.status_code == HTTPStatus.CREATED
+
+    reactivate = client.put(
+        f"/api/v1/bookings/{first['id']}",
+        json={"status": "pending"},
+        headers=owner_headers,
+    )
+    assert reactivate.status_code == HTTPStatus.CONFLICT
+    body = reactivate.json()
+    assert body["code"] == "BOOKING_CONFLICT"
+    assert body["errors"]["booking_id"][0] == "конфликт"
+
+
+def test_recancelling_does_not_announce_slot_taken_by_another_booking(
+    client, user_factory, monkeypatch
+):
+    from app.api import bookings
+
+    published = []
+    monkeypatch.setattr(
+        bookings, "publish_occupancy", lambda *args: published.append(tuple(map(str, args)))
+    )
+    owner_headers = user_factory("owner-recancel@example.com")
+    item = _create_item(client, owner_headers, code="S19")
+    user_headers = user_factory("driver-recancel@example.com")
+    other_headers = user_factory("stranger-recancel@example.com")
+    booking_date = (date.today() + timedelta(days=5)).isoformat()
+    payload = {"slot_id": item["id"], "booking_date": booking_date}
+
+    first = client.post("/api/v1/bookings", json=payload, headers=user_headers).json()
+    cancelled = client.delete(f"/api/v1/bookings/{first['id']}", headers=user_headers)
+    assert cancelled.status_code == HTTPStatus.NO_CONTENT
+    assert client.post("/api/v1/bookings", json=payload, headers=user_headers).status_code == 201
+    published.clear()
+
+    again = client.delete(f"/api/v1/bookings/{first['id']}", headers=user_headers)
+    assert again.status_code == HTTPStatus.NO_CONTENT
+    via_put = client.put(
+        f"/api/v1/bookings/{first['id']}", json={"status": "cancelled"}, headers=owner_headers
+    )
+    assert via_put.status_code == HTTPStatus.OK
+    assert via_put.json()["status"] == "cancelled"
+    assert published == []
+
+    forbidden = client.delete(f"/api/v1/bookings/{first['id']}", headers=other_headers)
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+    missing = client.delete("/api/v1/bookings/999999", headers=user_headers)
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_list_bookings_cursor_pagination(client, user_factory):
+    owner_headers = user_factory("owner10@example.com")
+    item = _create_item(client, owner_headers, code="S14")
+    user_headers = user_factory("driver5@example.com")
+    created = []
+    for offset in (3, 1, 2, 5, 4):
+        booking_date = date.today() + timedelta(days=offset)
+        created.append(
+            client.post(
+                "/api/v1/bookings",
+                json={"slot_id": item["id"], "booking_date": booking_date.isoformat()},
+                headers=user_headers,
+            ).json()
+        )
+    expected = [booking["id"] for booking in sorted(created, key=lambda b: b["booking_date"])]
+
+    first = client.get(
+        "/api/v1/bookings", params={"limit": 3, "with_total": "true"}, headers=owner_headers
+    )
+    assert first.headers["x-total-count"] == "5"
+    second = client.get(
+        "/api/v1/bookings",
+        params={"limit": 3, "after": first.headers["x-next-cursor"]},
+        headers=owner_headers,
+    )
+    assert "x-next-cursor" not in second.headers
+    ids = [booking["id"] for booking in first.json() + second.json()]
+    assert ids == expected
+
+
+def test_list_bookings_without_limit_or_cursor_is_not_truncated(client, user_factory, monkeypatch):
+    from app.api import bookings
+
+    monkeypatch.setattr(bookings, "BOOKINGS_PAGE_SIZE", 2)
+    owner_headers = user_factory("owner-unpaged@example.com")
+    item = _create_item(client, owner_headers, code="S21")
+    for offset in range(1, 6):
+        client.post(
+            "/api/v1/bookings",
+            json={
+                "slot_id": item["id"],
+                "booking_date": (date.today() + timedelta(days=offset)).isoformat(),
+            },
+            headers=owner_headers,
+        )
+
+    everything = client.get("/api/v1/bookings", headers=owner_headers)
+    assert len(everything.json()) == 5
+    assert "x-next-cursor" not in everything.headers
+
+    first = client.get("/api/v1/bookings", params={"limit": 1}, headers=owner_headers)
+    rest = client.get(
+        "/api/v1/bookings", params={"after": first.headers["x-next-cursor"]}, headers=owner_headers
+    )
+    assert len(rest.json()) == 2
+    assert "x-next-cursor" in rest.headers
+
+
+def test_admin_can_stream_bookings_export(client, user_factory):
+    import json
+
+    owner_headers = user_factory("owner11@example.com")
+    item = _create_item(client, owner_headers, code="S15")
+    user_headers = user_factory("driver6@example.com")
+    admin_headers = user_factory("exporter@example.com", role="admin")
+    dates = [date.today() + timedelta(days=offset) for offset in (1, 2, 3)]
+    for booking_date in dates:
+        client.post(
+            "/api/v1/bookings",
+            json={"slot_id": item["id"], "booking_date": booking_date.isoformat()},
+            headers=user_headers,
+        )
+
+    forbidden = client.get("/api/v1/bookings/export", headers=user_headers)
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+
+    ndjson = client.get(
+        "/api/v1/bookings/export",
+        params={"from": dates[1].isoformat(), "slot_id": item["id"]},
+        headers=admin_headers,
+    )
+    assert ndjson.status_code == HTTPStatus.OK
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in ndjson.text().splitlines()]
+    assert [record["booking_date"] for record in records] == [d.isoformat() for d in dates[1:]]
+    assert records[0]["status"] == "pending"
+
+    csv_export = client.get(
+        "/api/v1/bookings/export",
+        params={"format": "csv", "status": "pending"},
+        headers=admin_headers,
+    )
+    assert csv_export.status_code == HTTPStatus.OK
+    lines = csv_export.text().splitlines()
+    assert lines[0] == "id,slot_id,user_id,booking_date,status,created_at,updated_at"
+    assert len(lines) == 4
+
+
+def test_export_reads_chunks_without_holding_pooled_connections(client, user_factory, monkeypatch):
+    from app.api import bookings
+    from app.core.database import get_pool
+
+    owner_headers = user_factory("owner-export@example.com")
+    item = _create_item(client, owner_headers, code="S20")
+    user_headers = user_factory("driver-export@example.com")
+    for offset in (3, 1, 2, 5, 4):
+        client.post(
+            "/api/v1/bookings",
+            json={
+                "slot_id": item["id"],
+                "booking_date": (date.today() + timedelta(days=offset)).isoformat(),
+            },
+            headers=user_headers,
+        )
+    monkeypatch.setattr(bookings, "EXPORT_CHUNK_SIZE", 2)
+
+    chunks = bookings._export_rows(["slot_id = ?"], [item["id"]])
+    first = next(chunks)
+    # Клиент ещё читает выгрузку, а пул читателей свободен.
+    assert get_pool().stats()["in_use"] == 0
+    rows = first + [row for chunk in chunks for row in chunk]
+    assert [row[3] for row in rows] == [
+        (date.today() + timedelta(days=offset)).isoformat() for offset in range(1, 6)
+    ]
+
+
+def test_batch_booking_reports_per_item_results(client, user_factory, assert_num_queries):
+    owner_headers = user_factory("owner12@example.com")
+    item = _create_item(client, owner_headers, code="S16")
+    user_headers = user_factory("driver7@example.com")
+    days = [(date.today() + timedelta(days=offset)).isoformat() for offset in (1, 2, 3)]
+
+    taken = client.post(
+        "/api/v1/bookings",
+        json={"slot_id": item["id"], "booking_date": days[1]},
+        headers=owner_headers,
+    )
+    assert taken.status_code == HTTPStatus.CREATED
+    client.get("/api/v1/bookings", params={"limit": 1}, headers=user_headers)
+
+    # Слоты, занятые пары и один INSERT ... RETURNING — без чтения после commit.
+    with assert_num_queries(3):
+        response = client.post(
+            "/api/v1/bookings/batch",
+            json={
+                "items": [
+                    {"slot_id": item["id"], "booking_date": days[0]},
+                    {"slot_id": item["id"], "booking_date": days[1]},
+                    {"slot_id": item["id"], "booking_date": days[2]},
+                    {"slot_id": item["id"], "booking_date": days[2]},
+                    {"slot_id": 999999, "booking_date": days[0]},
+                ]
+            },
+            headers=user_headers,
+        )
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body["created"] == 2
+    assert [result["result"] for result in body["results"]] == [
+        "created",
+        "conflict",
+        "created",
+        "conflict",
+        "not_found",
+    ]
+    created = body["results"][0]["booking"]
+    assert created["status"] == "pending"
+    assert created["booking_date"] == days[0]
+    assert client.get(f"/api/v1/bookings/{created['id']}", headers=user_headers).status_code == 200
+
+
+def test_booking_mutations_take_single_statement(client, user_factory, assert_num_queries):
+    owner_headers = user_factory("owner13@example.com")
+    item = _create_item(client, owner_headers, code="S17")
+    user_headers = user_factory("driver8@example.com")
+    client.get("/api/v1/bookings", headers=user_headers)
+    booking_date = (date.today() + timedelta(days=1)).isoformat()
+
+    with assert_num_queries(1):
+        created = client.post(
+            "/api/v1/bookings",
+            json={"slot_id": item["id"], "booking_date": booking_date},
+            headers=user_headers,
+        )
+    assert created.status_code == HTTPStatus.CREATED
+    booking = created.json()
+
+    with assert_num_queries(1):
+        conflict = client.post(
+            "/api/v1/bookings",
+            json={"slot_id": item["id"], "booking_date": booking_date},
+            headers=user_headers,
+        )
+    assert conflict.status_code == HTTPStatus.CONFLICT
+
+    with assert_num_queries(1):
+        confirmed = client.put(
+            f"/api/v1/bookings/{booking['id']}",
+            json={"status": "confirmed"},
+            headers=owner_headers,
+        )
+    assert confirmed.status_code == HTTPStatus.OK
+    assert confirmed.json()["status"] == "confirmed"
+
+    with assert_num_queries(1):
+        cancelled = client.delete(f"/api/v1/bookings/{booking['id']}", headers=user_headers)
+    assert cancelled.status_code == HTTPStatus.NO_CONTENT
+
+    missing_slot = client.post(
+        "/api/v1/bookings",
+        json={"slot_id": 999999, "booking_date": booking_date},
+        headers=user_headers,
+    )
+    assert missing_slot.status_code == HTTPStatus.NOT_FOUND
+    assert missing_slot.json()["errors"] == {"slot_id": ["не существует"]}
+
+
+def test_list_bookings_returns_304_until_bookings_change(client, user_factory):
+    headers = user_factory("etag-bookings@example.com")
+    item = _create_item(client, headers, code="ET2")
+    day = date.today() + timedelta(days=4)
+    client.post(
+        "/api/v1/bookings",
+        json={"slot_id": item["id"], "booking_date": day.isoformat()},
+        headers=headers,
+    )
+
+    first = client.get("/api/v1/bookings", headers=headers)
+    etag = first.headers["etag"]
+    conditional = {**headers, "If-None-Match": f'W/{etag}, "other"'}
+    assert (
+        client.get("/api/v1/bookings", headers=conditional).status_code == HTTPStatus.NOT_MODIFIED
+    )
+    other_page = client.get("/api/v1/bookings", params={"limit": 1}, headers=conditional)
+    assert other_page.status_code == HTTPStatus.OK
+
+    booking_url = f"/api/v1/bookings/{first.json()[0]['id']}"
+    wildcard = {"If-None-Match": "*"}
+    stranger = user_factory("etag-bookings-stranger@example.com")
+    assert client.get(booking_url, headers={**headers, **wildcard}).status_code == 304
+    assert client.get(booking_url, headers={**stranger, **wildcard}).status_code == 403
+    assert client.get("/api/v1/bookings/999999", headers={**headers, **wildcard}).status_code == 404
+
+    client.post(
+        "/api/v1/bookings",
+        json={"slot_id": item["id"], "booking_date": (day + timedelta(days=1)).isoformat()},
+        headers=headers,
+    )
+    changed = client.get("/api/v1/bookings", headers=conditional)
+    assert changed.status_code == HTTPStatus.OK
+    assert len(changed.json()) == 2
@@ -0,0 +1,229 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.core import database as db
+from app.core import profiling
+from app.core.exceptions import APIError
+from app.core.records import SlotRecord
+
+
+def _pool(**kwargs) -> db.ConnectionPool:
+    return db.ConnectionPool(lambda: db._configure(db._raw_connect()), **kwargs)
+
+
+def test_pool_reuses_connections_and_applies_pragmas_once():
+    created: list[sqlite3.Connection] = []
+
+    def factory() -> sqlite3.Connection:
+        conn = db._configure(db._raw_connect())
+        created.append(conn)
+        return conn
+
+    pool = db.ConnectionPool(factory, max_size=2)
+    for _ in range(5):
+        with pool.connection() as conn:
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["size"] == 1
+    assert stats["idle"] == 1
+    assert stats["checkouts"] == 5
+    pool.close()
+
+
+def test_pool_checkout_times_out_when_exhausted():
+    pool = _pool(max_size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(APIError) as exc_info:
+        pool.acquire()
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.code == "DATABASE_UNAVAILABLE"
+    assert pool.stats()["timeouts"] == 1
+
+    released = threading.Timer(0.05, pool.release, args=(held,))
+    released.start()
+    with pool.connection(timeout=1) as conn:
+        assert conn is held
+    assert pool.stats()["wait_seconds_max"] > 0
+    pool.close()
+
+
+def test_pool_discards_broken_and_dirty_connections():
+    pool = _pool(max_size=1, ping_interval=0)
+    conn = pool.acquire()
+    conn.execute("DELETE FROM revoked_tokens")
+    assert conn.in_transaction
+    pool.release(conn)
+    assert not conn.in_transaction
+
+    conn.close()
+    with pool.connection() as fresh:
+        assert fresh is not conn
+        assert fresh.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.stats()["discarded"] == 1
+    pool.close()
+
+
+def test_storage_profile_enables_wal_and_tuned_pragmas():
+    with db.get_pool().connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db.DB_BUSY_TIMEOUT_MS
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == db.DB_CACHE_SIZE
+
+
+def test_concurrent_writes_serialize_through_single_writer():
+    with db.session_scope() as conn:
+        owner_id = conn.execute(
+            "INSERT INTO users (email, full_name, hashed_password) VALUES (?, ?, ?)",
+            ("writer@example.com", "Writer", "x"),
+        ).lastrowid
+
+    errors: list[Exception] = []
+
+    def write_slots(worker: int) -> None:
+        try:
+            for idx in range(10):
+                with db.session_scope() as conn:
+                    conn.execute(
+                        "INSERT INTO slots (code, owner_id) VALUES (?, ?)",
+                        (f"W{worker}X{idx}", owner_id),
+                    )
+        except Exception as exc:  # pragma: no cover - фиксируем ошибку для assert
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write_slots, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert db.get_writer_pool().stats()["size"] == 1
+    with db.get_pool().connection() as conn:
+        assert conn.execute("SELECT COUNT(1) FROM slots").fetchone()[0] == 80
+
+
+def test_migrations_upgrade_legacy_schema(tmp_path):
+    from app.core import migrations
+
+    legacy = sqlite3.connect(tmp_path / "legacy.db")
+    legacy.row_factory = sqlite3.Row
+    legacy.executescript(
+        """
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL UNIQUE,
+            full_name TEXT NOT NULL,
+            hashed_password TEXT NOT NULL
+        );
+        """
+    )
+
+    assert migrations.migrate(legacy) == [m.version for m in migrations.MIGRATIONS]
+    assert migrations.current_version(legacy) == migrations.LATEST_VERSION
+    columns = {row["name"] for row in legacy.execute("PRAGMA table_info(users)")}
+    assert "role" in columns
+    assert migrations.migrate(legacy) == []
+    legacy.close()
+
+
+def test_hot_queries_use_indexes():
+    with db.get_pool().connection() as conn:
+        plans = {
+            "conflict": "SELECT id FROM bookings WHERE slot_id = ? AND booking_date = ?"
+            " AND status != 'cancelled'",
+            "availability": "SELECT slot_id FROM bookings WHERE booking_date = ? AND status != ?",
+            "owner": "SELECT id FROM slots WHERE owner_id = ? ORDER BY code",
+            "user": "SELECT id FROM bookings WHERE user_id = ?",
+        }
+        for name, sql in plans.items():
+            detail = " ".join(
+                row["detail"]
+                for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (1, 2)[: sql.count("?")])
+            )
+            assert "USING" in detail and "INDEX" in detail, (name, detail)
+            assert "SCAN bookings" not in detail and "SCAN slots" not in detail, (name, detail)
+
+
+def test_normalize_statement_collapses_placeholder_lists():
+    assert (
+        profiling.normalize_statement("SELECT id FROM slots\n  WHERE id IN (?, ?, ?)")
+        == "SELECT id FROM slots WHERE id IN (?...)"
+    )
+    assert profiling.normalize_statement("VALUES (?, ?), (?, ?), (?, ?)") == "VALUES (?...), ..."
+    assert profiling.parameters_shape(("a@example.com", 3)) == "(str, int)"
+
+
+def test_sql_profiler_tags_requests_and_logs_slow_queries(
+    client, user_factory, monkeypatch, caplog
+):
+    headers = user_factory("admin-profile@example.com", role="admin")
+    monkeypatch.setattr(profiling.sql_profiler, "enabled", True)
+    monkeypatch.setattr(profiling.sql_profiler, "slow_query_ms", 0)
+    profiling.sql_profiler.reset()
+    db.close_pool()
+    try:
+        with caplog.at_level("WARNING", logger="app.core.profiling"):
+            assert (
+                client.post("/api/v1/items", json={"code": "P1"}, headers=headers).status_code
+                == 201
+            )
+            conflict = client.post("/api/v1/items", json={"code": "P1"}, headers=headers)
+        assert conflict.status_code == 409
+
+        correlation_id = conflict.json()["correlation_id"]
+        assert any(
+            f"correlation_id={correlation_id} POST /api/v1/items" in message
+            and "INSERT INTO slots" in message
+            for message in caplog.messages
+        )
+        assert not any("P1" in message for message in caplog.messages)
+
+        report = client.get("/api/v1/admin/sql-profile", headers=headers).json()
+        assert report["enabled"] is True
+        insert = next(s for s in report["statements"] if s["statement"].startswith("INSERT"))
+        assert insert["calls"] == 2
+        assert insert["rows"] == 1
+    finally:
+        monkeypatch.undo()
+        db.close_pool()
+        profiling.sql_profiler.reset()
+
+    # После теста пул снова следует окружению: при SQL_PROFILE=1 обёртка остаётся.
+    with db.get_pool().connection() as conn:
+        assert type(conn) is profiling.connection_factory()
+
+
+def test_records_replace_rows_and_check_query_columns():
+    with db.connect() as conn:
+        owner_id = conn.execute(
+            "INSERT INTO users (email, full_name, hashed_password)"
+            " VALUES ('rec@example.com', 'R', 'x') RETURNING id"
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO slots (code, description, owner_id) VALUES ('R1', NULL, ?)",
+            (owner_id,),
+        )
+        (record,) = SlotRecord.query(
+            conn, "SELECT id, code, description, owner_id FROM slots WHERE code = 'R1'"
+        ).fetchall()
+        # Курсоры соединения по умолчанию по-прежнему отдают sqlite3.Row.
+        assert isinstance(conn.execute("SELECT 1").fetchone(), sqlite3.Row)
+
+        with pytest.raises(TypeError):
+            SlotRecord.query(conn, "SELECT id, code, owner_id, description FROM slots")
+
+    assert type(record) is SlotRecord and not hasattr(record, "__dict__")
+    assert record.code == record["code"] == record[1] == "R1"
+    assert dict(record) == {
+        "id": record.id,
+        "code": "R1",
+        "description": None,
+        "owner_id": owner_id,
+    }
+    with pytest.raises(KeyError):
+        record["missing"]
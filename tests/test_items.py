@@ -85,3 +85,192 @@ def test_item_access_restricted_to_owner_or_admin(client, user_factory):
 
     delete_response = client.delete(f"/api/v1/items/{item['id']}", headers=admin_headers)
     assert delete_response.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_list_items_cursor_pagination(client, user_factory):
+    headers = user_factory("cursor@example.com")
+    for code in ("C3", "C1", "C2", "C4", "C5"):
+        client.post("/api/v1/items", json={"code": code}, headers=headers)
+
+    seen: list[str] = []
+    params = {"limit": 2, "with_total": "false"}
+    while True:
+        page = client.get("/api/v1/items", headers=headers, params=params).json()
+        assert page["total"] is None
+        seen.extend(item["code"] for item in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params = {**params, "after": page["next_cursor"]}
+    assert seen == ["C1", "C2", "C3", "C4", "C5"]
+
+    invalid = client.get("/api/v1/items", headers=headers, params={"after": "!!"})
+    assert invalid.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert invalid.json()["errors"]["query.after"][0] == "некорректный курсор"
+
+
+def test_bulk_import_upserts_and_reports_issues(client, user_factory):
+    headers = user_factory("importer@example.com")
+    other_headers = user_factory("neighbour@example.com")
+    assert (
+        client.post(
+            "/api/v1/items", json={"code": "N1", "description": "чужое"}, headers=other_headers
+        ).status_code
+        == HTTPStatus.CREATED
+    )
+
+    first = client.post(
+        "/api/v1/items/import",
+        data="code,description\nG1,Level 1\nG2,Level 1\n".encode(),
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert first.status_code == HTTPStatus.OK
+    assert first.json()["created"] == 2
+
+    response = client.post(
+        "/api/v1/items/import",
+        json=[
+            {"code": "G1", "description": "Level 1"},
+            {"code": "G2", "description": "Level 2"},
+            {"code": "G3"},
+            {"code": "G3", "description": "повтор"},
+            {"code": "bad code"},
+            {"code": "N1", "description": "захват"},
+        ],
+        headers=headers,
+    )
+    assert response.status_code == HTTPStatus.OK
+    report = response.json()
+    assert (report["received"], report["created"], report["updated"], report["unchanged"]) == (
+        6,
+        1,
+        1,
+        1,
+    )
+    assert [(issue["row"], issue["reason"]) for issue in report["issues"]] == [
+        (4, "duplicate"),
+        (5, "invalid"),
+        (6, "conflict"),
+    ]
+
+    items = client.get("/api/v1/items", headers=headers).json()["items"]
+    assert {item["code"]: item["description"] for item in items} == {
+        "G1": "Level 1",
+        "G2": "Level 2",
+        "G3": None,
+    }
+
+    rejected = client.post(
+        "/api/v1/items/import",
+        data=b"G4",
+        headers={**headers, "Content-Type": "text/plain"},
+    )
+    assert rejected.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+
+
+def test_bulk_import_rejects_oversized_body_before_parsing(client, user_factory, monkeypatch):
+    import asyncio
+
+    import pytest
+    from starlette.requests import Request
+
+    from app.api import items
+    from app.core.exceptions import APIError
+
+    headers = user_factory("big-import@example.com")
+    monkeypatch.setattr(items, "SLOT_IMPORT_MAX_BYTES", 32)
+    payload = "code,description\n" + "".join(f"B{i},x\n" for i in range(10))
+    response = client.post(
+        "/api/v1/items/import",
+        data=payload.encode(),
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert response.json()["code"] == "PAYLOAD_TOO_LARGE"
+
+    # Без Content-Length чтение обрывается на первой порции сверх предела.
+    chunks = [b"x" * 20, b"x" * 20, b"never read"]
+    received = []
+
+    async def receive():
+        received.append(chunks[len(received)])
+        more = len(received) < len(chunks)
+        return {"type": "http.request", "body": received[-1], "more_body": more}
+
+    request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+    with pytest.raises(APIError) as exc_info:
+        asyncio.run(items._read_import_body(request))
+    assert exc_info.value.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert len(received) == 2
+
+
+def test_item_mutations_take_single_statement(client, user_factory, assert_num_queries):
+    headers = user_factory("single@example.com")
+    other_headers = user_factory("other-single@example.com")
+    # Прогреваем кэш пользователей, чтобы считать только запросы обработчика.
+    client.get("/api/v1/items", headers=headers, params={"with_total": "false"})
+    client.get("/api/v1/items", headers=other_headers, params={"with_total": "false"})
+
+    with assert_num_queries(1):
+        created = client.post(
+            "/api/v1/items", json={"code": "Q1", "description": "one"}, headers=headers
+        )
+    assert created.status_code == HTTPStatus.CREATED
+    item_id = created.json()["id"]
+
+    with assert_num_queries(1):
+        duplicate = client.post("/api/v1/items", json={"code": "Q1"}, headers=other_headers)
+    assert duplicate.status_code == HTTPStatus.CONFLICT
+
+    with assert_num_queries(1):
+        updated = client.patch(
+            f"/api/v1/items/{item_id}", json={"description": "two"}, headers=headers
+        )
+    assert updated.status_code == HTTPStatus.OK
+    assert updated.json()["description"] == "two"
+
+    forbidden = client.patch(
+        f"/api/v1/items/{item_id}", json={"description": "mine"}, headers=other_headers
+    )
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+    missing = client.patch("/api/v1/items/999999", json={"description": "x"}, headers=headers)
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_delete_item_checks_rights_in_single_statement(client, user_factory, assert_num_queries):
+    owner = user_factory("delete-owner@example.com")
+    stranger = user_factory("delete-stranger@example.com")
+    item = client.post("/api/v1/items", json={"code": "DL1"}, headers=owner).json()
+    url = f"/api/v1/items/{item['id']}"
+
+    assert client.delete(url, headers=stranger).status_code == HTTPStatus.FORBIDDEN
+    with assert_num_queries(1):
+        assert client.delete(url, headers=owner).status_code == HTTPStatus.NO_CONTENT
+    assert client.delete(url, headers=owner).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_get_item_supports_conditional_requests(client, user_factory):
+    owner = user_factory("etag-owner@example.com")
+    stranger = user_factory("etag-stranger@example.com")
+    item = client.post("/api/v1/items", json={"code": "ET1"}, headers=owner).json()
+    url = f"/api/v1/items/{item['id']}"
+
+    etag = client.get(url, headers=owner).headers["etag"]
+    assert (
+        client.get(url, headers={**owner, "If-None-Match": etag}).status_code
+        == HTTPStatus.NOT_MODIFIED
+    )
+    # ETag привязан к пользователю: чужой ETag не обходит проверку прав.
+    forbidden = client.get(url, headers={**stranger, "If-None-Match": etag})
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+    # «*» совпадает только с существующим и доступным представлением.
+    wildcard = {"If-None-Match": "*"}
+    assert client.get(url, headers={**owner, **wildcard}).status_code == HTTPStatus.NOT_MODIFIED
+    assert client.get(url, headers={**stranger, **wildcard}).status_code == HTTPStatus.FORBIDDEN
+    missing = client.get("/api/v1/items/999999", headers={**owner, **wildcard})
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+    client.patch(url, json={"description": "Updated"}, headers=owner)
+    refreshed = client.get(url, headers={**owner, "If-None-Match": etag})
+    assert refreshed.status_code == HTTPStatus.OK
+    assert refreshed.json()["description"] == "Updated"
+    assert refreshed.headers["etag"] != etag
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+from http import HTTPStatus
+
+from app.core import metrics
+
+
+def _sample(body: str, prefix: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found in /metrics")
+
+
+def test_metrics_endpoint_exposes_http_auth_pool_and_hash_metrics(client, user_factory):
+    metrics.registry.clear()
+    headers = user_factory("metrics@example.com")
+    assert client.get("/api/v1/items/999999", headers=headers).status_code == 404
+    assert client.get("/api/v1/items").status_code == 401
+
+    response = client.get("/metrics")
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text()
+
+    assert (
+        _sample(
+            body,
+            'http_requests_total{method="GET",route="/api/v1/items/{item_id}",status="404"}',
+        )
+        == 1
+    )
+    assert (
+        _sample(
+            body,
+            'http_request_duration_seconds_bucket{method="GET",route="/api/v1/items/{item_id}",'
+            'le="+Inf"}',
+        )
+        == 1
+    )
+    assert _sample(body, "http_requests_in_flight") == 0
+    assert _sample(body, 'auth_failures_total{code="AUTHENTICATION_FAILED"}') == 1
+    assert _sample(body, 'password_hash_duration_seconds_count{operation="hash"}') == 1
+    assert _sample(body, 'password_hash_duration_seconds_count{operation="verify"}') == 1
+    assert _sample(body, 'db_pool_checkouts_total{pool="reader"}') >= 1
+    assert "# TYPE http_request_duration_seconds histogram" in body
+
+
+def test_counters_do_not_lose_increments_across_threads():
+    counter = metrics.Counter("test_threads_total", "test")
+
+    def work() -> None:
+        for _ in range(10_000):
+            counter.inc("x")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.collect() == {("x",): 80_000}
+
+
+def test_finished_threads_fold_their_shards_into_the_base():
+    counter = metrics.Counter("test_short_threads_total", "test")
+    histogram = metrics.Histogram("test_short_threads_seconds", "test", buckets=(1.0,))
+
+    def work() -> None:
+        counter.inc("x")
+        histogram.observe(0.5)
+
+    for _ in range(200):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    assert counter._shards.count() <= 1
+    assert histogram._shards.count() <= 1
+    assert counter.collect() == {("x",): 200}
+    assert histogram.collect() == {(): [200.0, 0.0, 100.0, 200.0]}
+
+
+def test_collect_all_aggregates_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.registry.clear()
+    metrics.AUTH_FAILURES.inc("INVALID_TOKEN")
+    metrics.HTTP_IN_FLIGHT.inc()
+
+    worker = {
+        "auth_failures_total": {
+            "type": "counter",
+            "help": "",
+            "labelnames": ["code"],
+            "buckets": [],
+            "samples": [[["INVALID_TOKEN"], 2.0]],
+        },
+        "http_requests_in_flight": {
+            "type": "gauge",
+            "help": "",
+            "labelnames": [],
+            "buckets": [],
+            "samples": [[[], 3.0]],
+        },
+    }
+    live = tmp_path / "metrics-1.json"
+    live.write_text(json.dumps(worker))
+    stopped = tmp_path / "metrics-2.json"
+    stopped.write_text(json.dumps(worker))
+    old = time.time() - 10 * metrics.METRICS_FLUSH_SECONDS
+    os.utime(stopped, (old, old))
+
+    merged = metrics.collect_all()
+    assert merged["auth_failures_total"]["samples"][("INVALID_TOKEN",)] == 5
+    # gauge остановленного воркера не учитывается, счётчики — учитываются.
+    assert merged["http_requests_in_flight"]["samples"][()] == 4
+
+    metrics.flush_snapshot()
+    own = json.loads((tmp_path / f"metrics-{os.getpid()}.json").read_text())
+    assert own["auth_failures_total"]["samples"] == [[["INVALID_TOKEN"], 1.0]]
+    metrics.HTTP_IN_FLIGHT.dec()
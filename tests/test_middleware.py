@@ -0,0 +1,64 @@
+from http import HTTPStatus
+
+from conftest import SimpleASGITestClient
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.auth.jwt_handler import create_access_token
+from app.middleware.auth import AuthMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(AuthMiddleware)
+    app.add_middleware(RateLimitMiddleware, disable=False)
+
+    @app.get("/")
+    async def root():
+        return {"ok": True}
+
+    @app.get("/api/v1/me")
+    async def me(request: Request):
+        return {"sub": request.state.user["sub"]}
+
+    @app.get("/api/v1/stream")
+    async def stream():
+        async def chunks():
+            for idx in range(3):
+                yield f"{idx}\n".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+def test_auth_middleware_rejects_missing_and_malformed_tokens():
+    with SimpleASGITestClient(_build_app()) as client:
+        assert client.get("/").status_code == HTTPStatus.OK
+
+        missing = client.get("/api/v1/me")
+        assert missing.status_code == HTTPStatus.UNAUTHORIZED
+        assert missing.json()["code"] == "AUTHENTICATION_FAILED"
+        assert missing.headers["www-authenticate"] == "Bearer"
+
+        malformed = client.get("/api/v1/me", headers={"Authorization": "Token abc"})
+        assert malformed.status_code == HTTPStatus.UNAUTHORIZED
+        assert "Bearer <token>" in malformed.json()["detail"]
+
+        invalid = client.get("/api/v1/me", headers={"Authorization": "Bearer abc"})
+        assert invalid.status_code == HTTPStatus.UNAUTHORIZED
+        assert invalid.json()["detail"] == "Невалидный или просроченный токен"
+
+
+def test_middleware_stack_passes_state_and_streaming_responses():
+    token = create_access_token({"sub": "42"})
+    headers = {"Authorization": f"Bearer {token}"}
+    with SimpleASGITestClient(_build_app()) as client:
+        me = client.get("/api/v1/me", headers=headers)
+        assert me.status_code == HTTPStatus.OK
+        assert me.json() == {"sub": "42"}
+
+        streamed = client.get("/api/v1/stream", headers=headers)
+        assert streamed.status_code == HTTPStatus.OK
+        assert streamed.text() == "0\n1\n2\n"
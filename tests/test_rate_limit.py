@@ -0,0 +1,119 @@
+from http import HTTPStatus
+
+from conftest import SimpleASGITestClient
+from fastapi import FastAPI
+
+from app.core.exceptions import APIError, api_error_handler
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.security.rate_limiter import SlidingWindowCounter, SQLiteRateLimitBackend
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_sliding_window_limits_and_reports_retry_after():
+    clock = FakeClock()
+    counter = SlidingWindowCounter(clock=clock)
+
+    assert all(counter.hit("auth:1.1.1.1", 3, 60).allowed for _ in range(3))
+    rejected = counter.hit("auth:1.1.1.1", 3, 60)
+    assert not rejected.allowed
+    assert 1 <= rejected.retry_after <= 120
+
+    clock.now += rejected.retry_after
+    assert counter.hit("auth:1.1.1.1", 3, 60).allowed
+    assert counter.hit("auth:2.2.2.2", 3, 60).allowed
+
+
+def test_sliding_window_state_is_bounded():
+    clock = FakeClock()
+    counter = SlidingWindowCounter(max_keys=100, clock=clock)
+    for idx in range(1000):
+        counter.hit(f"global:10.0.{idx // 256}.{idx % 256}", 5, 60)
+    assert len(counter) == 100
+
+    clock.now += 121
+    counter.hit("global:fresh", 5, 60)
+    assert len(counter) == 1
+
+
+def test_idle_short_window_keys_expire_behind_busy_long_window_key():
+    clock = FakeClock()
+    counter = SlidingWindowCounter(max_keys=1000, clock=clock)
+    counter.hit("global:10.0.0.1", 100, 3600)
+    for idx in range(50):
+        counter.hit(f"auth:10.0.1.{idx}", 5, 60)
+    assert len(counter) == 51
+
+    # Ключ с часовым окном используется снова, короткие простаивают дольше двух окон.
+    clock.now += 121
+    counter.hit("global:10.0.0.1", 100, 3600)
+    assert len(counter) == 1
+
+    # При переполнении первым уходит ключ, который раньше всех истёк бы сам.
+    counter = SlidingWindowCounter(max_keys=2, clock=clock)
+    counter.hit("global:long", 100, 3600)
+    counter.hit("auth:short", 5, 60)
+    counter.hit("auth:new", 5, 60)
+    assert len(counter) == 2
+    assert not counter.hit("global:long", 1, 3600).allowed
+
+
+def test_sqlite_backend_shares_limit_between_workers(tmp_path):
+    import threading
+
+    path = str(tmp_path / "limits.db")
+    workers = [SQLiteRateLimitBackend(path=path) for _ in range(4)]
+    allowed: list[bool] = []
+
+    def burst(backend: SQLiteRateLimitBackend) -> None:
+        for _ in range(25):
+            allowed.append(backend.hit("bookings:10.0.0.1", 30, 60).allowed)
+
+    threads = [threading.Thread(target=burst, args=(backend,)) for backend in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert allowed.count(True) == 30
+    assert len(workers[0]) == 1
+
+
+def test_middleware_returns_problem_details_with_retry_after():
+    app = FastAPI(exception_handlers={APIError: api_error_handler})
+    app.add_middleware(
+        RateLimitMiddleware,
+        disable=False,
+        limits={"auth": {"max_requests": 2, "window": 60}},
+    )
+
+    @app.post("/api/v1/auth/login")
+    async def login():
+        return {"ok": True}
+
+    rejected_before = RATE_LIMIT_REJECTIONS.collect().get(("auth",), 0)
+    with SimpleASGITestClient(app) as client:
+        assert client.post("/api/v1/auth/login").status_code == HTTPStatus.OK
+        assert client.post("/api/v1/auth/login").status_code == HTTPStatus.OK
+        limited = client.post("/api/v1/auth/login")
+
+    assert limited.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    body = limited.json()
+    assert body["code"] == "RATE_LIMIT_EXCEEDED"
+    assert body["errors"]["retry_after"] == [limited.headers["retry-after"]]
+    assert int(limited.headers["retry-after"]) >= 1
+    assert RATE_LIMIT_REJECTIONS.collect()[("auth",)] == rejected_before + 1
+
+
+def test_batch_bookings_have_own_rate_limit_class():
+    middleware = RateLimitMiddleware(None, disable=True)
+    assert middleware._get_endpoint_type("/api/v1/bookings/batch", "POST") == "bookings_batch"
+    assert middleware._get_endpoint_type("/api/v1/bookings", "POST") == "bookings"
+    assert middleware._get_endpoint_type("/api/v1/bookings", "GET") == "global"
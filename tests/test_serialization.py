@@ -0,0 +1,125 @@
+"""Контракт быстрого пути: байты ответа совпадают с сериализацией по response_model."""
+
+import json
+from datetime import date, timedelta
+
+import pytest
+from pydantic import BaseModel, TypeAdapter
+
+from app.core import database as db
+from app.core import serialization
+from app.core.models import BookingStatus
+from app.core.records import BookingRecord, SlotRecord
+from app.schemas.validation import AvailabilityItem, BookingRead, ItemRead
+
+TRICKY_DESCRIPTIONS = [
+    None,
+    "Уровень -1, «у лифта»",
+    'quote " back\\slash / tab\t',
+    "ctl\x1f\x7f😀",
+]
+
+
+def _reference_json(model, rows) -> bytes:
+    """Как FastAPI: валидация response_model, затем JSONResponse.render."""
+    adapter = TypeAdapter(list[model])
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _seed(owner_id: int) -> None:
+    day = date.today() + timedelta(days=1)
+    with db.connect() as conn:
+        for index, description in enumerate(TRICKY_DESCRIPTIONS):
+            slot_id = conn.execute(
+                "INSERT INTO slots (code, description, owner_id) VALUES (?, ?, ?) RETURNING id",
+                (f"F{index}", description, owner_id),
+            ).fetchone()[0]
+            for offset, status in enumerate(BookingStatus):
+                conn.execute(
+                    "INSERT INTO bookings (slot_id, user_id, booking_date, status)"
+                    " VALUES (?, ?, ?, ?)",
+                    (slot_id, owner_id, day + timedelta(days=offset), status.value),
+                )
+        conn.commit()
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_path_is_byte_compatible_with_response_models(
+    client, user_factory, monkeypatch, use_orjson
+):
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    headers = user_factory("fast-json@example.com")
+    with db.connect() as conn:
+        owner_id = conn.execute(
+            "SELECT id FROM users WHERE email = 'fast-json@example.com'"
+        ).fetchone()[0]
+    _seed(owner_id)
+    day = (date.today() + timedelta(days=1)).isoformat()
+    requests = [
+        ("/api/v1/items", {}),
+        ("/api/v1/items", {"limit": 2, "with_total": False}),
+        ("/api/v1/bookings", {}),
+        ("/api/v1/bookings", {"limit": 5, "with_total": True}),
+        ("/api/v1/availability", {"target_date": day}),
+        ("/api/v1/availability", {"target_date": day, "code": "F1"}),
+    ]
+    for url, params in requests:
+        monkeypatch.setattr(serialization, "FAST_JSON", False)
+        expected = client.get(url, params=params, headers=headers)
+        monkeypatch.setattr(serialization, "FAST_JSON", True)
+        actual = client.get(url, params=params, headers=headers)
+
+        assert actual.status_code == expected.status_code == 200
+        assert actual.text() == expected.text(), url
+        for header in ("content-type", "etag", "x-next-cursor", "x-total-count"):
+            assert actual.headers.get(header) == expected.headers.get(header), header
+
+
+def test_row_encoder_matches_pydantic_dump():
+    with db.connect() as conn:
+        owner_id = conn.execute(
+            "INSERT INTO users (email, full_name, hashed_password)"
+            " VALUES ('enc@example.com', 'E', 'x') RETURNING id"
+        ).fetchone()[0]
+        conn.commit()
+    _seed(owner_id)
+    with db.connect() as conn:
+        slots = conn.execute("SELECT id, code, description, owner_id FROM slots").fetchall()
+        bookings = conn.execute(
+            "SELECT id, slot_id, user_id, booking_date, status FROM bookings"
+        ).fetchall()
+    availability = [{"slot_id": 1, "code": "F0", "is_available": 1}]
+
+    for model, rows in (
+        (ItemRead, slots),
+        (BookingRead, bookings),
+        (AvailabilityItem, availability),
+    ):
+        encoded = serialization.RowEncoder(model).rows(rows)
+        assert serialization.dumps(encoded) == _reference_json(model, [dict(row) for row in rows])
+
+    with db.connect() as conn:
+        for model, record, sql in (
+            (ItemRead, SlotRecord, "SELECT id, code, description, owner_id FROM slots"),
+            (
+                BookingRead,
+                BookingRecord,
+                "SELECT id, slot_id, user_id, booking_date, status FROM bookings",
+            ),
+        ):
+            records = record.query(conn, sql).fetchall()
+            encoded = serialization.RowEncoder(model, record=record).rows(records)
+            # Записи валидируются response_model напрямую, через from_attributes.
+            assert serialization.dumps(encoded) == _reference_json(model, records)
+
+
+def test_row_encoder_rejects_unsupported_field_types():
+    class WithList(BaseModel):
+        values: list[int]
+
+    with pytest.raises(TypeError):
+        serialization.RowEncoder(WithList)